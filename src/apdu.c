@@ -25,6 +25,7 @@
 #include "apdu_reset.h"
 #include "apdu_setup.h"
 #include "apdu_sign.h"
+#include "debug_stats.h"
 #include "globals.h"
 #include "to_string.h"
 #include "version.h"
@@ -85,6 +86,7 @@ static int handle_git(void) {
 #define P1_FIRST       0x00u  /// First packet
 #define P1_NEXT        0x01u  /// Other packet
 #define P1_LAST_MARKER 0x80u  /// Last packet
+#define P1_HWM_MARKER  0x40u  /// Main HWM requested after the signature
 
 int apdu_dispatcher(const command_t* cmd) {
     tz_exc exc = SW_OK;
@@ -122,6 +124,8 @@ int apdu_dispatcher(const command_t* cmd) {
         buf.offset = 0u;     \
     } while (0)
 
+    debug_stats_start_ins(cmd->ins);
+
     switch (cmd->ins) {
         case INS_VERSION:
 
@@ -222,9 +226,10 @@ int apdu_dispatcher(const command_t* cmd) {
         case INS_SIGN_WITH_HASH:
             TZ_ASSERT(os_global_pin_is_validated() == BOLOS_UX_OK, EXC_SECURITY);
 
-            switch (cmd->p1 & ~P1_LAST_MARKER) {
+            switch (cmd->p1 & ~(P1_LAST_MARKER | P1_HWM_MARKER)) {
                 case P1_FIRST:
 
+                    TZ_ASSERT((cmd->p1 & P1_HWM_MARKER) == 0u, EXC_WRONG_PARAM);
                     READ_P2_DERIVATION_TYPE;
                     READ_DATA;
 
@@ -237,8 +242,11 @@ int apdu_dispatcher(const command_t* cmd) {
 
                     bool with_hash = cmd->ins == INS_SIGN_WITH_HASH;
                     bool last = (cmd->p1 & P1_LAST_MARKER) != 0;
+                    bool with_hwm = (cmd->p1 & P1_HWM_MARKER) != 0;
+                    // The HWM is only sent after the signature
+                    TZ_ASSERT(!with_hwm || last, EXC_WRONG_PARAM);
 
-                    result = handle_sign(&buf, last, with_hash);
+                    result = handle_sign(&buf, last, with_hash, with_hwm);
 
                     break;
                 default:
@@ -255,6 +263,30 @@ int apdu_dispatcher(const command_t* cmd) {
             result = handle_hmac(&buf, derivation_type);
 
             break;
+#ifdef HAVE_DEBUG_STATS
+        case INS_QUERY_DEBUG_STATS:
+
+            ASSERT_NO_DATA;
+
+            switch (cmd->p1) {
+                case DEBUG_STATS_NVRAM:
+                    TZ_ASSERT(cmd->p2 <= 1u, EXC_WRONG_PARAM);
+                    result = handle_query_nvram_stats(cmd->p2 == 1u);
+                    break;
+                case DEBUG_STATS_STACK:
+                    TZ_ASSERT(cmd->p2 <= 1u, EXC_WRONG_PARAM);
+                    result = handle_query_stack_stats(cmd->p2 == 1u);
+                    break;
+                case DEBUG_STATS_SIGN:
+                    TZ_ASSERT(cmd->p2 < (uint8_t) SIGN_PHASE_COUNT, EXC_WRONG_PARAM);
+                    result = handle_query_sign_phases((sign_phase_t) cmd->p2);
+                    break;
+                default:
+                    TZ_FAIL(EXC_WRONG_PARAM);
+            }
+
+            break;
+#endif  // HAVE_DEBUG_STATS
         default:
             TZ_FAIL(EXC_INVALID_INS);
     }
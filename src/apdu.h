@@ -55,6 +55,7 @@
 #define INS_QUERY_AUTH_KEY_WITH_CURVE 0x0Du
 #define INS_HMAC                      0x0Eu
 #define INS_SIGN_WITH_HASH            0x0Fu
+#define INS_QUERY_DEBUG_STATS         0x10u  /// Only in debug stats builds
 
 /**
  * @brief Dispatch APDU command received to the right handler
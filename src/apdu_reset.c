@@ -24,6 +24,7 @@
 #include "apdu.h"
 #include "baking_auth.h"
 #include "globals.h"
+#include "keys.h"
 #include "ui_reset.h"
 
 #define G global.apdu.u.baking
@@ -45,6 +46,8 @@ static bool ok(void) {
 
     UPDATE_NVRAM;
 
+    wipe_baking_key_cache();
+
     // Send back the response, do not restart the event loop
     io_send_sw(SW_OK);
     return true;
@@ -55,6 +55,9 @@ static bool ok(void) {
 
     UPDATE_NVRAM;
 
+    // Ignore derivation errors, the signatures derive the key again
+    cache_baking_key();
+
     provide_pubkey(&global.path_with_curve);
 
     return true;
@@ -91,6 +94,7 @@ end:
 int handle_deauthorize(void) {
     memset(&(g_hwm.baking_key), 0, sizeof(g_hwm.baking_key));
     UPDATE_NVRAM_VAR(baking_key);
+    wipe_baking_key_cache();
 #ifdef HAVE_BAGL
     // Ignore calculation errors
     calculate_idle_screen_authorized_key();
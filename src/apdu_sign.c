@@ -29,6 +29,7 @@
 #include "to_string.h"
 #include "ui.h"
 #include "ui_delegation.h"
+#include "write.h"
 
 #include "cx.h"
 
@@ -152,6 +153,22 @@ static inline void clear_data(void) {
     memset(&G, 0, sizeof(G));
 }
 
+/**
+ * @brief Stops the signing after `phase` when requested by the debug
+ *        statistics, answering without data
+ *
+ *        See `QUERY_DEBUG_STATS`
+ *
+ * @param phase: phase done
+ */
+#define STOP_AFTER_SIGN_PHASE(phase)              \
+    do {                                          \
+        if (debug_stats_sign_phase_done(phase)) { \
+            clear_data();                         \
+            return io_send_sw(SW_OK);             \
+        }                                         \
+    } while (0)
+
 /**
  * @brief Sends asynchronously the signature of the read message
  *
@@ -199,6 +216,7 @@ static int baking_sign_complete(bool const send_hash) {
         case MAGIC_BYTE_BLOCK:
         case MAGIC_BYTE_PREATTESTATION:
         case MAGIC_BYTE_ATTESTATION:
+            // Already checked in `handle_sign`, checked again right before signing
             TZ_CHECK(guard_baking_authorized(&G.parsed_baking_data, &global.path_with_curve));
 #ifdef TARGET_NANOS
             // To be efficient, the signing needs a low-cost display
@@ -206,11 +224,15 @@ static int baking_sign_complete(bool const send_hash) {
 #endif
             result = perform_signature(send_hash);
 #ifdef HAVE_BAGL
-            // Ignore calculation errors
-            calculate_idle_screen_hwm();
-            // The HWM screen is not updated to avoid slowing down the
-            // application. Updating the HWM screen may slow down the
-            // next signing.
+            // The HWM may have been written, even when the signature has
+            // been stopped. The HWM of the idle screens is only recomputed
+            // when its screen is next displayed, to keep it off the signing
+            // path. The HWM screen is not updated either: updating it may
+            // slow down the next signing.
+            invalidate_idle_screen_hwm();
+            if (!debug_stats_sign_stopped()) {
+                (void) debug_stats_sign_phase_done(SIGN_PHASE_UI);
+            }
 #endif
             break;
 
@@ -281,45 +303,65 @@ end:
  * Cdata:
  *   + (max-size) uint8 *: message
  */
-int handle_sign(buffer_t *cdata, const bool last, const bool with_hash) {
+int handle_sign(buffer_t *cdata, const bool last, const bool with_hash, const bool with_hwm) {
     tz_exc exc = SW_OK;
 
+    // Forget the phases of the previous SIGN instruction, never stopped before any phase
+    (void) debug_stats_sign_phase_done(SIGN_PHASE_NONE);
+
     TZ_ASSERT_NOT_NULL(cdata);
 
     TZ_ASSERT(global.path_with_curve.bip32_path.length != 0u, EXC_WRONG_LENGTH_FOR_INS);
 
+    STOP_AFTER_SIGN_PHASE(SIGN_PHASE_RECEIVE);
+
     // Guard against overflow
     TZ_ASSERT(G.packet_index < 0xFFu, EXC_PARSE_ERROR);
     G.packet_index++;
 
-    // Only parse a single packet when baking
-    TZ_ASSERT(G.packet_index == 1u, EXC_PARSE_ERROR);
-
-    TZ_ASSERT(buffer_read_u8(cdata, &G.magic_byte), EXC_PARSE_ERROR);
-    bool is_attestation = false;
+    if (G.packet_index == 1u) {
+        TZ_ASSERT(buffer_read_u8(cdata, &G.magic_byte), EXC_PARSE_ERROR);
+        bool is_attestation = false;
+
+        switch (G.magic_byte) {
+            case MAGIC_BYTE_PREATTESTATION:
+                is_attestation = false;
+                TZ_ASSERT(parse_consensus_operation(cdata, &G.parsed_baking_data, is_attestation),
+                          EXC_PARSE_ERROR);
+                break;
+            case MAGIC_BYTE_ATTESTATION:
+                is_attestation = true;
+                TZ_ASSERT(parse_consensus_operation(cdata, &G.parsed_baking_data, is_attestation),
+                          EXC_PARSE_ERROR);
+                break;
+            case MAGIC_BYTE_BLOCK:
+                TZ_ASSERT(parse_block(cdata, &G.parsed_baking_data), EXC_PARSE_ERROR);
+                break;
+            case MAGIC_BYTE_UNSAFE_OP:
+                // Parse the operation. It will be verified in `baking_sign_complete`.
+                TZ_CHECK(
+                    parse_operations_init(&G.maybe_ops.v, &global.path_with_curve, &G.parse_state));
+                TZ_CHECK(parse_operations(cdata, &G.parse_state, &G.maybe_ops.v));
+                break;
+            default:
+                TZ_FAIL(EXC_PARSE_ERROR);
+        }
 
-    switch (G.magic_byte) {
-        case MAGIC_BYTE_PREATTESTATION:
-            is_attestation = false;
-            TZ_ASSERT(parse_consensus_operation(cdata, &G.parsed_baking_data, is_attestation),
-                      EXC_PARSE_ERROR);
-            break;
-        case MAGIC_BYTE_ATTESTATION:
-            is_attestation = true;
-            TZ_ASSERT(parse_consensus_operation(cdata, &G.parsed_baking_data, is_attestation),
-                      EXC_PARSE_ERROR);
-            break;
-        case MAGIC_BYTE_BLOCK:
-            TZ_ASSERT(parse_block(cdata, &G.parsed_baking_data), EXC_PARSE_ERROR);
-            break;
-        case MAGIC_BYTE_UNSAFE_OP:
-            // Parse the operation. It will be verified in `baking_sign_complete`.
-            TZ_CHECK(parse_operations(cdata, &G.maybe_ops.v, &global.path_with_curve));
-            break;
-        default:
-            TZ_FAIL(EXC_PARSE_ERROR);
+        if (G.magic_byte != MAGIC_BYTE_UNSAFE_OP) {
+            // Reject the unauthorized baking messages, e.g. stale retries,
+            // before spending time hashing them
+            TZ_CHECK(guard_baking_authorized(&G.parsed_baking_data, &global.path_with_curve));
+        }
+    } else {
+        // Only parse a single packet when baking. The unsafe operations
+        // are parsed as their packets arrive, so the RAM needed does not
+        // depend on their size.
+        TZ_ASSERT(G.magic_byte == MAGIC_BYTE_UNSAFE_OP, EXC_PARSE_ERROR);
+        TZ_CHECK(parse_operations(cdata, &G.parse_state, &G.maybe_ops.v));
     }
 
+    STOP_AFTER_SIGN_PHASE(SIGN_PHASE_PARSE);
+
     // Hash contents of *previous* message (which may be empty).
     TZ_CHECK(blake2b_incremental_hash(G.message_data,
                                       sizeof(G.message_data),
@@ -347,7 +389,10 @@ int handle_sign(buffer_t *cdata, const bool last, const bool with_hash) {
                                      &G.message_data_length,
                                      &G.hash_state));
 
+        STOP_AFTER_SIGN_PHASE(SIGN_PHASE_HASH);
+
         G.maybe_ops.is_valid = parse_operations_final(&G.parse_state, &G.maybe_ops.v);
+        G.send_hwm = with_hwm;
 
         return baking_sign_complete(with_hash);
     } else {
@@ -365,6 +410,8 @@ end:
  *
  *        Precedes the signature with the message hash if requested
  *
+ *        Follows the signature with the main HWM if requested
+ *
  * @param send_hash: if the message hash is requested
  * @return int: zero or positive integer if success, negative integer otherwise.
  */
@@ -376,7 +423,9 @@ static int perform_signature(bool const send_hash) {
 
     TZ_CHECK(write_high_water_mark(&G.parsed_baking_data));
 
-    uint8_t resp[SIGN_HASH_SIZE + MAX_SIGNATURE_SIZE] = {0};
+    STOP_AFTER_SIGN_PHASE(SIGN_PHASE_NVRAM);
+
+    uint8_t resp[SIGN_HASH_SIZE + MAX_SIGNATURE_SIZE + (2u * sizeof(uint32_t))] = {0};
     size_t offset = 0;
 
     if (send_hash) {
@@ -386,14 +435,33 @@ static int perform_signature(bool const send_hash) {
 
     size_t signature_size = MAX_SIGNATURE_SIZE;
 
-    CX_CHECK(sign(resp + offset,
-                  &signature_size,
-                  &global.path_with_curve,
-                  G.final_hash,
-                  sizeof(G.final_hash)));
+    if (G.magic_byte == MAGIC_BYTE_UNSAFE_OP) {
+        CX_CHECK(sign(resp + offset,
+                      &signature_size,
+                      &global.path_with_curve,
+                      G.final_hash,
+                      sizeof(G.final_hash)));
+    } else {
+        CX_CHECK(sign_consensus(resp + offset,
+                                &signature_size,
+                                &global.path_with_curve,
+                                G.final_hash,
+                                sizeof(G.final_hash)));
+    }
+
+    // The signature is still sent when stopping after signing
+    (void) debug_stats_sign_phase_done(SIGN_PHASE_SIGN);
 
     offset += signature_size;
 
+    if (G.send_hwm) {
+        write_u32_be(resp, offset, g_hwm.hwm.main.highest_level);
+        offset += sizeof(uint32_t);
+
+        write_u32_be(resp, offset, g_hwm.hwm.main.highest_round);
+        offset += sizeof(uint32_t);
+    }
+
     clear_data();
 
     return io_send_response_pointer(resp, offset, SW_OK);
@@ -38,6 +38,7 @@ int select_signing_key(buffer_t *cdata, derivation_type_t derivation_type);
  * @param cdata: data containing the message to sign
  * @param last: whether the part of the message is the last one or not
  * @param with_hash: whether the hash of the message is requested or not
+ * @param with_hwm: whether the main HWM is requested after the signature or not
  * @return int: zero or positive integer if success, negative integer otherwise.
  */
-int handle_sign(buffer_t *cdata, bool last, bool with_hash);
+int handle_sign(buffer_t *cdata, bool last, bool with_hash, bool with_hwm);
@@ -24,6 +24,7 @@
 
 #include "apdu.h"
 #include "globals.h"
+#include "hwm_journal.h"
 #include "keys.h"
 #include "memory.h"
 #include "to_string.h"
@@ -57,7 +58,7 @@ tz_exc write_high_water_mark(parsed_baking_data_t const *const in) {
     dest->had_attestation |= in->type == BAKING_TYPE_ATTESTATION;
     dest->had_preattestation |= in->type == BAKING_TYPE_PREATTESTATION;
 
-    UPDATE_NVRAM_VAR(hwm);
+    write_hwm_journal(dest);
 
 end:
     return exc;
@@ -76,6 +77,8 @@ tz_exc authorize_baking(derivation_type_t const derivation_type,
         g_hwm.baking_key.derivation_type = derivation_type;
         copy_bip32_path(&g_hwm.baking_key.bip32_path, bip32_path);
         UPDATE_NVRAM_VAR(baking_key);
+        // Ignore derivation errors, the signatures derive the key again
+        cache_baking_key();
     }
 
 end:
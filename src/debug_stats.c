@@ -0,0 +1,200 @@
+/* Tezos Ledger application - Debug statistics
+
+   Copyright 2024 TriliTech <contact@trili.tech>
+   Copyright 2024 Functori <contact@functori.com>
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+*/
+
+#ifdef HAVE_DEBUG_STATS
+
+#include "debug_stats.h"
+
+#include "apdu.h"
+#include "globals.h"
+#include "write.h"
+
+#include <string.h>
+
+/// Pattern painted on the free stack
+#define STACK_PAINT_PATTERN 0xA5A5A5A5u
+
+/// Number of words left unpainted below the current stack pointer
+#define STACK_PAINT_MARGIN 16u
+
+// Bounds of the stack, defined by the linker script of the SDK: the
+// stack grows down from `_estack` to the canary word `app_stack_canary`
+extern uint32_t app_stack_canary;
+extern uint32_t _estack;
+
+/**
+ * @brief Returns the lowest word of the stack usable by the app
+ *
+ * @return uint32_t*: lowest word of the stack
+ */
+static uint32_t *stack_bottom(void) {
+    return &app_stack_canary + 1;
+}
+
+/**
+ * @brief Returns the size of the stack
+ *
+ * @return size_t: size of the stack in bytes
+ */
+static size_t stack_size(void) {
+    return (uintptr_t) &_estack - (uintptr_t) stack_bottom();
+}
+
+/**
+ * @brief Paints the free stack, below the frame of the caller
+ *
+ */
+static void __attribute__((noinline)) paint_stack(void) {
+    volatile uint32_t marker = 0u;
+    volatile uint32_t *word = stack_bottom();
+    uint32_t const *const limit = ((uint32_t const *) &marker) - STACK_PAINT_MARGIN;
+
+    while (word < limit) {
+        *word = STACK_PAINT_PATTERN;
+        word++;
+    }
+}
+
+/**
+ * @brief Measures the peak stack usage since the last painting
+ *
+ * @return size_t: peak stack usage in bytes
+ */
+static size_t measure_stack_peak(void) {
+    uint32_t const *word = stack_bottom();
+
+    while ((word < &_estack) && (*word == STACK_PAINT_PATTERN)) {
+        word++;
+    }
+
+    return (uintptr_t) &_estack - (uintptr_t) word;
+}
+
+void debug_stats_start_ins(uint8_t ins) {
+    uint8_t const previous_ins = global.debug_stats.current_ins;
+
+    if (global.debug_stats.stack_painted && (previous_ins < DEBUG_STATS_INS_COUNT)) {
+        size_t const peak = measure_stack_peak();
+        if (peak > global.debug_stats.stack_peak[previous_ins]) {
+            global.debug_stats.stack_peak[previous_ins] = (uint16_t) peak;
+        }
+    }
+
+    paint_stack();
+    global.debug_stats.stack_painted = true;
+
+    global.debug_stats.current_ins = ins;
+}
+
+void debug_stats_count_nvram_write(size_t size) {
+    if (global.debug_stats.current_ins < DEBUG_STATS_INS_COUNT) {
+        global.debug_stats.nvram[global.debug_stats.current_ins].writes++;
+        global.debug_stats.nvram[global.debug_stats.current_ins].bytes += size;
+    }
+}
+
+bool debug_stats_sign_phase_done(sign_phase_t phase) {
+    global.debug_stats.sign_phase = phase;
+    return debug_stats_sign_stopped();
+}
+
+bool debug_stats_sign_stopped(void) {
+    return (global.debug_stats.sign_stop_phase != SIGN_PHASE_NONE) &&
+           (global.debug_stats.sign_phase >= global.debug_stats.sign_stop_phase);
+}
+
+/**
+ * Data:
+ *   + list:
+ *     + (1 byte)  uint8:  instruction code
+ *     + (4 bytes) uint32: number of writes
+ *     + (4 bytes) uint32: number of bytes written
+ */
+int handle_query_nvram_stats(bool reset) {
+    uint8_t resp[DEBUG_STATS_INS_COUNT * (1u + (2u * sizeof(uint32_t)))] = {0};
+    size_t offset = 0;
+
+    for (uint8_t ins = 0u; ins < DEBUG_STATS_INS_COUNT; ins++) {
+        if (global.debug_stats.nvram[ins].writes == 0u) {
+            continue;
+        }
+
+        resp[offset] = ins;
+        offset++;
+
+        write_u32_be(resp, offset, global.debug_stats.nvram[ins].writes);
+        offset += sizeof(uint32_t);
+
+        write_u32_be(resp, offset, global.debug_stats.nvram[ins].bytes);
+        offset += sizeof(uint32_t);
+    }
+
+    if (reset) {
+        memset(&global.debug_stats.nvram, 0, sizeof(global.debug_stats.nvram));
+    }
+
+    return io_send_response_pointer(resp, offset, SW_OK);
+}
+
+/**
+ * Data:
+ *   + (2 bytes) uint16: size of the stack
+ *   + list:
+ *     + (1 byte)  uint8:  instruction code
+ *     + (2 bytes) uint16: peak stack usage
+ */
+int handle_query_stack_stats(bool reset) {
+    uint8_t resp[sizeof(uint16_t) + (DEBUG_STATS_INS_COUNT * (1u + sizeof(uint16_t)))] = {0};
+    size_t offset = 0;
+
+    write_u16_be(resp, offset, (uint16_t) stack_size());
+    offset += sizeof(uint16_t);
+
+    for (uint8_t ins = 0u; ins < DEBUG_STATS_INS_COUNT; ins++) {
+        if (global.debug_stats.stack_peak[ins] == 0u) {
+            continue;
+        }
+
+        resp[offset] = ins;
+        offset++;
+
+        write_u16_be(resp, offset, global.debug_stats.stack_peak[ins]);
+        offset += sizeof(uint16_t);
+    }
+
+    if (reset) {
+        memset(&global.debug_stats.stack_peak, 0, sizeof(global.debug_stats.stack_peak));
+    }
+
+    return io_send_response_pointer(resp, offset, SW_OK);
+}
+
+/**
+ * Data:
+ *   + (1 byte) uint8: last phase done by the last SIGN
+ */
+int handle_query_sign_phases(sign_phase_t stop_phase) {
+    uint8_t resp[1u] = {(uint8_t) global.debug_stats.sign_phase};
+
+    global.debug_stats.sign_stop_phase = stop_phase;
+
+    return io_send_response_pointer(resp, sizeof(resp), SW_OK);
+}
+
+#endif  // HAVE_DEBUG_STATS
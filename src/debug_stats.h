@@ -0,0 +1,159 @@
+/* Tezos Ledger application - Debug statistics
+
+   Copyright 2024 TriliTech <contact@trili.tech>
+   Copyright 2024 Functori <contact@functori.com>
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+*/
+
+#pragma once
+
+#include <stdbool.h>
+#include <stddef.h>
+#include <stdint.h>
+
+/// Number of instruction codes tracked by the debug statistics
+#define DEBUG_STATS_INS_COUNT 0x20u
+
+/// Kinds of debug statistics, in P1 of `QUERY_DEBUG_STATS`
+#define DEBUG_STATS_NVRAM 0x00u  /// NVRAM writes of each instruction
+#define DEBUG_STATS_STACK 0x01u  /// Peak stack usage of each instruction
+#define DEBUG_STATS_SIGN  0x02u  /// Phases of the last SIGN
+
+/**
+ * @brief Phases of the SIGN instruction, in order
+ *
+ *        Builds with debug statistics can stop the SIGN instructions
+ *        after one of them, see `QUERY_DEBUG_STATS`
+ *
+ */
+typedef enum {
+    SIGN_PHASE_NONE = 0,  ///< no phase
+    SIGN_PHASE_RECEIVE,   ///< packet received and dispatched
+    SIGN_PHASE_PARSE,     ///< message parsed and checked
+    SIGN_PHASE_HASH,      ///< message hashed
+    SIGN_PHASE_NVRAM,     ///< HWM written in NVRAM
+    SIGN_PHASE_SIGN,      ///< key derived and message signed
+    SIGN_PHASE_UI,        ///< idle screen HWM marked outdated
+    SIGN_PHASE_COUNT
+} sign_phase_t;
+
+#ifdef HAVE_DEBUG_STATS
+
+/**
+ * @brief This structure represents the NVRAM writes of an instruction
+ *
+ */
+typedef struct {
+    uint32_t writes;  ///< number of writes
+    uint32_t bytes;   ///< number of bytes written
+} nvram_stats_t;
+
+/**
+ * @brief This structure holds the debug statistics
+ *
+ */
+typedef struct {
+    uint8_t current_ins;                         ///< instruction being handled
+    nvram_stats_t nvram[DEBUG_STATS_INS_COUNT];  ///< NVRAM writes by instruction
+    bool stack_painted;                          ///< if the free stack has been painted
+    uint16_t stack_peak[DEBUG_STATS_INS_COUNT];  ///< peak stack usage by instruction
+    sign_phase_t sign_phase;                     ///< last phase done by the SIGN instructions
+    sign_phase_t sign_stop_phase;                ///< phase after which the SIGN instructions stop
+} debug_stats_t;
+
+/**
+ * @brief Attributes the next statistics to an instruction
+ *
+ *        Records the peak stack usage of the previous instruction,
+ *        including the screens it has displayed, then paints the free
+ *        stack to measure the peak stack usage of `ins`
+ *
+ * @param ins: instruction code
+ */
+void debug_stats_start_ins(uint8_t ins);
+
+/**
+ * @brief Counts an NVRAM write of the current instruction
+ *
+ * @param size: number of bytes written
+ */
+void debug_stats_count_nvram_write(size_t size);
+
+/**
+ * @brief Records that the current SIGN instruction has done a phase
+ *
+ * @param phase: phase done
+ * @return bool: whether the SIGN instruction must stop after `phase`
+ */
+bool debug_stats_sign_phase_done(sign_phase_t phase);
+
+/**
+ * @brief Returns whether the current SIGN instruction has been stopped
+ *
+ * @return bool: whether a phase after which it must stop has been done
+ */
+bool debug_stats_sign_stopped(void);
+
+/**
+ * @brief Sends the NVRAM writes of the instructions
+ *
+ *        Only the instructions having written are sent
+ *
+ * @param reset: if the statistics are reset once sent
+ * @return int: zero or positive integer if success, negative integer otherwise.
+ */
+int handle_query_nvram_stats(bool reset);
+
+/**
+ * @brief Sends the size of the stack and the peak stack usage of the instructions
+ *
+ *        Only the instructions having been handled are sent
+ *
+ * @param reset: if the statistics are reset once sent
+ * @return int: zero or positive integer if success, negative integer otherwise.
+ */
+int handle_query_stack_stats(bool reset);
+
+/**
+ * @brief Sends the last phase done by the last SIGN instruction
+ *
+ *        The SIGN instructions are then stopped after `stop_phase`
+ *
+ * @param stop_phase: phase after which the next SIGN instructions stop,
+ *                    `SIGN_PHASE_NONE` to not stop them
+ * @return int: zero or positive integer if success, negative integer otherwise.
+ */
+int handle_query_sign_phases(sign_phase_t stop_phase);
+
+#else
+
+static inline void debug_stats_start_ins(uint8_t ins) {
+    (void) ins;
+}
+
+static inline void debug_stats_count_nvram_write(size_t size) {
+    (void) size;
+}
+
+static inline bool debug_stats_sign_phase_done(sign_phase_t phase) {
+    (void) phase;
+    return false;
+}
+
+static inline bool debug_stats_sign_stopped(void) {
+    return false;
+}
+
+#endif  // HAVE_DEBUG_STATS
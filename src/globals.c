@@ -23,6 +23,8 @@
 #include "globals.h"
 
 #include "exception.h"
+#include "hwm_journal.h"
+#include "keys.h"
 #include "to_string.h"
 
 #include "ux.h"
@@ -45,6 +47,8 @@ void clear_apdu_globals(void) {
 void init_globals(void) {
     memset(&global, 0, sizeof(global));
     memcpy(&g_hwm, (const void *) (&N_data), sizeof(g_hwm));
+    restore_hwm_journal();
+    wipe_baking_key_cache();
 }
 
 void toggle_hwm(void) {
@@ -52,6 +56,18 @@ void toggle_hwm(void) {
     UPDATE_NVRAM;  // Update the NVRAM data.
 }
 
+void update_nvram(void) {
+    // The journaled HWMs are now older than the written ones
+    global.hwm_journal.sequence++;
+    g_hwm.hwm_journal_base = global.hwm_journal.sequence;
+    write_nvram((void *) &(N_data), &global.hwm_data, sizeof(global.hwm_data));
+}
+
+void write_nvram(void *dst, void const *src, size_t size) {
+    debug_stats_count_nvram_write(size);
+    nvm_write(dst, (void *) src, size);
+}
+
 // DO NOT TRY TO INIT THIS. This can only be written via an system call.
 // The "N_" is *significant*. It tells the linker to put this in NVRAM.
 baking_data const N_data_real;
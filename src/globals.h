@@ -22,13 +22,18 @@
 
 #pragma once
 
+#include "debug_stats.h"
 #include "types.h"
 
 #include "bolos_target.h"
 
 #include "operations.h"
 #include "ui.h"
+#include "ui_delegation.h"
+#include "ui_pubkey.h"
+#include "ui_reset.h"
 #include "ui_screensaver.h"
+#include "ui_setup.h"
 
 /**
  * @brief Zeros out all globals that can keep track of APDU instruction state
@@ -108,6 +113,8 @@ typedef struct {
 
     magic_byte_t magic_byte;         ///< current magic byte read
     struct parse_state parse_state;  ///< current parser state
+
+    bool send_hwm;  ///< if the main HWM is requested after the signature
 } apdu_sign_state_t;
 
 /**
@@ -126,6 +133,17 @@ typedef struct {
         bool low_cost_display_mode;
         /// Screensaver context
         ux_screensaver_state_t screensaver_state;
+        /// If the HWM of the idle screens must be recomputed before being displayed
+        bool idle_screen_hwm_dirty;
+        /// Contexts of the screens, only one flow being displayed at a time.
+        /// The idle screens must be recomputed once another context is used.
+        union {
+            HomeContext_t home;              ///< home screens context
+            AddressContext_t address;        ///< public key screens context
+            DelegationContext_t delegation;  ///< delegation screens context
+            ResetContext_t reset;            ///< reset screens context
+            SetupContext_t setup;            ///< setup screens context
+        } screen_context;
 #endif  // TARGET_NANOS
     } dynamic_display;
 
@@ -156,6 +174,17 @@ typedef struct {
     } apdu;
 
     baking_data hwm_data;  ///< baking HWM data in RAM
+
+    /// HWM journal state
+    struct {
+        uint32_t sequence;  ///< last sequence number used
+        uint8_t main_slot;  ///< next slot of the main HWM journal
+        uint8_t test_slot;  ///< next slot of the test HWM journal
+    } hwm_journal;
+
+#ifdef HAVE_DEBUG_STATS
+    debug_stats_t debug_stats;  ///< debug statistics
+#endif                          // HAVE_DEBUG_STATS
 } globals_t;
 
 extern globals_t global;
@@ -177,20 +206,35 @@ extern baking_data const N_data_real;
  */
 high_watermark_t *select_hwm_by_chain(chain_id_t const chain_id);
 
+/**
+ * @brief Writes in NVRAM, counting the write in the debug statistics
+ *
+ * @param dst: destination in NVRAM
+ * @param src: source in RAM
+ * @param size: number of bytes to write
+ */
+void write_nvram(void *dst, void const *src, size_t size);
+
 /**
  * @brief Updates a single variable in NVRAM baking_data.
  *
  * @param variable: defines the name of the variable to be updated in NVRAM
  */
-#define UPDATE_NVRAM_VAR(variable)                   \
-    if (!N_data_real.hwm_disabled) {                 \
-        nvm_write((void *) &(N_data.variable),       \
-                  &global.hwm_data.variable,         \
-                  sizeof(global.hwm_data.variable)); \
+#define UPDATE_NVRAM_VAR(variable)                     \
+    if (!N_data_real.hwm_disabled) {                   \
+        write_nvram((void *) &(N_data.variable),       \
+                    &global.hwm_data.variable,         \
+                    sizeof(global.hwm_data.variable)); \
     }
 
+/**
+ * @brief Writes the entire NVRAM struct, superseding the HWM journal
+ *
+ */
+void update_nvram(void);
+
 /**
  * @brief Properly updates an entire NVRAM struct to prevent any clobbering of data
  *
  */
-#define UPDATE_NVRAM nvm_write((void *) &(N_data), &global.hwm_data, sizeof(global.hwm_data));
+#define UPDATE_NVRAM update_nvram();
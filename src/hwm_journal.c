@@ -0,0 +1,138 @@
+/* Tezos Ledger application - HWM journal
+
+   Copyright 2024 TriliTech <contact@trili.tech>
+   Copyright 2024 Functori <contact@functori.com>
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+*/
+
+#include "hwm_journal.h"
+
+#include "globals.h"
+#include "memory.h"
+
+#include <string.h>
+
+// DO NOT TRY TO INIT THIS. This can only be written via an system call.
+// The "N_" is *significant*. It tells the linker to put this in NVRAM.
+hwm_journal_t const N_hwm_journal_real;
+#define N_hwm_journal (*(volatile hwm_journal_t *) PIC(&N_hwm_journal_real))
+
+#define FNV_OFFSET_BASIS 2166136261u
+#define FNV_PRIME        16777619u
+
+/**
+ * @brief Mixes the bytes of a value in a FNV-1a hash
+ *
+ * @param hash: current hash
+ * @param value: value to mix
+ * @return uint32_t: new hash
+ */
+static uint32_t fnv1a_mix(uint32_t hash, uint32_t const value) {
+    for (uint8_t i = 0u; i < sizeof(value); i++) {
+        hash ^= (value >> (8u * i)) & 0xFFu;
+        hash *= FNV_PRIME;
+    }
+    return hash;
+}
+
+/**
+ * @brief Computes the checksum of a journal entry
+ *
+ *        Detects the entries torn by a power loss during their write.
+ *        The fields are mixed one by one to ignore the padding.
+ *
+ * @param entry: journal entry
+ * @return uint32_t: checksum
+ */
+static uint32_t entry_checksum(hwm_journal_entry_t const *const entry) {
+    uint32_t hash = FNV_OFFSET_BASIS;
+    hash = fnv1a_mix(hash, entry->sequence);
+    hash = fnv1a_mix(hash, entry->hwm.highest_level);
+    hash = fnv1a_mix(hash, entry->hwm.highest_round);
+    hash = fnv1a_mix(hash, entry->hwm.had_attestation ? 1u : 0u);
+    hash = fnv1a_mix(hash, entry->hwm.had_preattestation ? 1u : 0u);
+    return hash;
+}
+
+/**
+ * @brief Finds the newest valid entry of a HWM journal
+ *
+ *        Only the entries newer than the HWMs of the NVRAM data are considered
+ *
+ * @param journal: HWM journal in NVRAM
+ * @param out: newest entry output
+ * @param slot_out: slot of the newest entry output
+ * @return bool: whether a valid entry was found
+ */
+static bool find_newest_entry(volatile hwm_journal_entry_t const *const journal,
+                              hwm_journal_entry_t *const out,
+                              uint8_t *const slot_out) {
+    bool found = false;
+    hwm_journal_entry_t entry;
+
+    for (uint8_t slot = 0u; slot < HWM_JOURNAL_SLOTS; slot++) {
+        memcpy(&entry, (const void *) &journal[slot], sizeof(entry));
+        if ((entry.sequence > g_hwm.hwm_journal_base) &&
+            (entry.checksum == entry_checksum(&entry)) &&
+            (!found || (entry.sequence > out->sequence))) {
+            memcpy(out, &entry, sizeof(*out));
+            *slot_out = slot;
+            found = true;
+        }
+    }
+    return found;
+}
+
+void restore_hwm_journal(void) {
+    hwm_journal_entry_t entry;
+    uint8_t slot;
+
+    global.hwm_journal.sequence = g_hwm.hwm_journal_base;
+    global.hwm_journal.main_slot = 0u;
+    global.hwm_journal.test_slot = 0u;
+
+    if (find_newest_entry(N_hwm_journal.main, &entry, &slot)) {
+        memcpy(&g_hwm.hwm.main, &entry.hwm, sizeof(g_hwm.hwm.main));
+        global.hwm_journal.sequence = CUSTOM_MAX(global.hwm_journal.sequence, entry.sequence);
+        global.hwm_journal.main_slot = (slot + 1u) % HWM_JOURNAL_SLOTS;
+    }
+
+    if (find_newest_entry(N_hwm_journal.test, &entry, &slot)) {
+        memcpy(&g_hwm.hwm.test, &entry.hwm, sizeof(g_hwm.hwm.test));
+        global.hwm_journal.sequence = CUSTOM_MAX(global.hwm_journal.sequence, entry.sequence);
+        global.hwm_journal.test_slot = (slot + 1u) % HWM_JOURNAL_SLOTS;
+    }
+}
+
+void write_hwm_journal(high_watermark_t const *const hwm) {
+    if ((hwm == NULL) || N_data_real.hwm_disabled) {
+        return;
+    }
+
+    bool const is_main = (hwm == &g_hwm.hwm.main);
+    volatile hwm_journal_entry_t *const journal = is_main ? N_hwm_journal.main : N_hwm_journal.test;
+    uint8_t *const slot = is_main ? &global.hwm_journal.main_slot : &global.hwm_journal.test_slot;
+
+    hwm_journal_entry_t entry;
+    memset(&entry, 0, sizeof(entry));
+    global.hwm_journal.sequence++;
+    entry.sequence = global.hwm_journal.sequence;
+    memcpy(&entry.hwm, hwm, sizeof(entry.hwm));
+    entry.checksum = entry_checksum(&entry);
+
+    // Never overwrites the newest entry of the journal
+    write_nvram((void *) &journal[*slot], &entry, sizeof(entry));
+    *slot = (*slot + 1u) % HWM_JOURNAL_SLOTS;
+}
@@ -0,0 +1,40 @@
+/* Tezos Ledger application - HWM journal
+
+   Copyright 2024 TriliTech <contact@trili.tech>
+   Copyright 2024 Functori <contact@functori.com>
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+*/
+
+#pragma once
+
+#include "types.h"
+
+/**
+ * @brief Applies the newest valid entries of the HWM journal to the HWMs in RAM
+ *
+ *        Must be called once the NVRAM data has been copied in RAM
+ *
+ */
+void restore_hwm_journal(void);
+
+/**
+ * @brief Persists a HWM of the RAM by appending it to its journal
+ *
+ *        Only writes the entry of the given HWM. Does nothing if the
+ *        HWM tracking is disabled.
+ *
+ * @param hwm: HWM to persist, either the main or the test HWM of the RAM
+ */
+void write_hwm_journal(high_watermark_t const *const hwm);
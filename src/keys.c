@@ -201,6 +201,143 @@ end:
     return error;
 }
 
+#ifdef HAVE_BAKING_KEY_CACHE
+
+/**
+ * @brief Private key of the authorized baking key, derived once
+ *
+ *        Only kept in this RAM slot, wiped as soon as the authorized
+ *        key changes or the application exits
+ */
+static struct {
+    bool is_valid;                          ///< if the private key has been derived
+    bip32_path_with_curve_t key;            ///< bip32 path and curve of the private key
+    cx_ecfp_256_private_key_t private_key;  ///< derived private key
+} baking_key_cache;
+
+void wipe_baking_key_cache(void) {
+    explicit_bzero(&baking_key_cache, sizeof(baking_key_cache));
+}
+
+cx_err_t cache_baking_key(void) {
+    cx_err_t error = CX_OK;
+
+    wipe_baking_key_cache();
+
+    if (g_hwm.baking_key.bip32_path.length == 0u) {
+        return CX_OK;
+    }
+
+    derivation_type_t derivation_type = g_hwm.baking_key.derivation_type;
+    signature_type_t signature_type = derivation_type_to_signature_type(derivation_type);
+
+    CX_CHECK(
+        bip32_derive_with_seed_init_privkey_256(derivation_type_to_derivation_mode(derivation_type),
+                                                signature_type_to_cx_curve(signature_type),
+                                                g_hwm.baking_key.bip32_path.components,
+                                                g_hwm.baking_key.bip32_path.length,
+                                                &baking_key_cache.private_key,
+                                                NULL,
+                                                NULL,
+                                                0));
+
+    if (!copy_bip32_path_with_curve(&baking_key_cache.key, &g_hwm.baking_key)) {
+        error = CX_INVALID_PARAMETER;
+        goto end;
+    }
+    baking_key_cache.is_valid = true;
+
+end:
+    if (error != CX_OK) {
+        wipe_baking_key_cache();
+    }
+    return error;
+}
+
+/**
+ * @brief Signs a message with the cached private key of the authorized baking key
+ *
+ *        Same signatures as `sign`, without the derivation
+ *
+ * @param out: signature output
+ * @param out_size: output size
+ * @param in: message input
+ * @param in_size: input size
+ * @return cx_err_t: error, CX_OK if none
+ */
+static cx_err_t sign_with_cached_baking_key(uint8_t *const out,
+                                            size_t *out_size,
+                                            uint8_t const *const in,
+                                            size_t const in_size) {
+    cx_err_t error = CX_OK;
+
+    signature_type_t signature_type =
+        derivation_type_to_signature_type(baking_key_cache.key.derivation_type);
+    uint32_t info;
+    size_t domain_length;
+
+    switch (signature_type) {
+        case SIGNATURE_TYPE_ED25519: {
+            CX_CHECK(cx_eddsa_sign_no_throw(&baking_key_cache.private_key,
+                                            CX_SHA512,
+                                            (uint8_t const *) PIC(in),
+                                            in_size,
+                                            out,
+                                            *out_size));
+            CX_CHECK(
+                cx_ecdomain_parameters_length(baking_key_cache.private_key.curve, &domain_length));
+            *out_size = domain_length * 2u;
+        } break;
+        case SIGNATURE_TYPE_SECP256K1:
+        case SIGNATURE_TYPE_SECP256R1: {
+            CX_CHECK(cx_ecdsa_sign_no_throw(&baking_key_cache.private_key,
+                                            CX_LAST | CX_RND_RFC6979,
+                                            CX_SHA256,
+                                            (uint8_t const *) PIC(in),
+                                            in_size,
+                                            out,
+                                            out_size,
+                                            &info));
+            if ((info & CX_ECCINFO_PARITY_ODD) != 0) {
+                out[0] |= 0x01;
+            }
+        } break;
+        default:
+            error = CX_INVALID_PARAMETER;
+    }
+
+end:
+    return error;
+}
+
+cx_err_t sign_consensus(uint8_t *const out,
+                        size_t *out_size,
+                        bip32_path_with_curve_t const *const path_with_curve,
+                        uint8_t const *const in,
+                        size_t const in_size) {
+    if ((out == NULL) || (out_size == NULL) || (path_with_curve == NULL) || (in == NULL)) {
+        return CX_INVALID_PARAMETER;
+    }
+
+    cx_err_t error = CX_OK;
+
+    if (!bip32_path_with_curve_eq(path_with_curve, &g_hwm.baking_key)) {
+        return sign(out, out_size, path_with_curve, in, in_size);
+    }
+
+    // The authorized baking key is only derived once
+    if (!baking_key_cache.is_valid ||
+        !bip32_path_with_curve_eq(&baking_key_cache.key, &g_hwm.baking_key)) {
+        CX_CHECK(cache_baking_key());
+    }
+    error = sign_with_cached_baking_key(out, out_size, in, in_size);
+
+end:
+    return error;
+}
+
+#endif  // HAVE_BAKING_KEY_CACHE
+
 cx_err_t sign(uint8_t *const out,
               size_t *out_size,
               bip32_path_with_curve_t const *const path_with_curve,
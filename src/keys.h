@@ -87,6 +87,62 @@ cx_err_t sign(uint8_t *const out,
               uint8_t const *const in,
               size_t const in_size);
 
+#ifdef HAVE_BAKING_KEY_CACHE
+
+/**
+ * @brief Derives the authorized baking key and keeps its private key in RAM
+ *
+ *        The signatures with the authorized baking key then skip the
+ *        derivation. Only wipes the cache if no key is authorized.
+ *
+ * @return cx_err_t: error, CX_OK if none
+ */
+cx_err_t cache_baking_key(void);
+
+/**
+ * @brief Wipes the cached private key of the authorized baking key
+ *
+ */
+void wipe_baking_key_cache(void);
+
+/**
+ * @brief Signs a consensus operation with a key
+ *
+ *        Same as `sign`, but the private key of the authorized baking
+ *        key is only derived once
+ *
+ * @param out: signature output
+ * @param out_size: output size
+ * @param path_with_curve: bip32 path and curve of the key
+ * @param in: message input
+ * @param in_size: input size
+ * @return cx_err_t: error, CX_OK if none
+ */
+cx_err_t sign_consensus(uint8_t *const out,
+                        size_t *out_size,
+                        bip32_path_with_curve_t const *const path_with_curve,
+                        uint8_t const *const in,
+                        size_t const in_size);
+
+#else
+
+static inline cx_err_t cache_baking_key(void) {
+    return CX_OK;
+}
+
+static inline void wipe_baking_key_cache(void) {
+}
+
+static inline cx_err_t sign_consensus(uint8_t *const out,
+                                      size_t *out_size,
+                                      bip32_path_with_curve_t const *const path_with_curve,
+                                      uint8_t const *const in,
+                                      size_t const in_size) {
+    return sign(out, out_size, path_with_curve, in, in_size);
+}
+
+#endif  // HAVE_BAKING_KEY_CACHE
+
 /**
  * @brief Reads a curve code from wire-format and parse into `deviration_type`
  *
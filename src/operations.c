@@ -62,8 +62,6 @@ typedef enum {
         }                   \
     } while (0)
 
-#define STEP_HARD_FAIL -2
-
 /// Conversion/check functions
 
 /**
@@ -160,37 +158,74 @@ end:
     return res;
 }
 
+/// Reading of a field
+typedef enum {
+    FIELD_KIND_FIXED,       ///< fixed-size field, read in bulk
+    FIELD_KIND_PUBLIC_KEY,  ///< public key, of the size of the signing public key, read in bulk
+    FIELD_KIND_ZARITH       ///< Z number, read byte by byte
+} field_kind_t;
+
 /**
- * @brief Helpers for sub parser
- *
- *       Subparsers: no function here should be called anywhere in
- *       this file without using the CALL_SUBPARSER macro above.
+ * @brief This structure represents how a field is read
  *
  */
-#define CALL_SUBPARSER_LN(func, line, ...) PARSER_CHECK(func(__VA_ARGS__, line))
-#define CALL_SUBPARSER(func, ...)          CALL_SUBPARSER_LN(func, __LINE__, __VA_ARGS__)
-
-#define NEXT_BYTE (byte)
+typedef struct {
+    field_kind_t kind;  ///< how the field is read
+    uint8_t size;       ///< size of the fixed-size fields
+} field_descriptor_t;
+
+/// Descriptors of the fields
+static const field_descriptor_t FIELD_DESCRIPTORS[OPERATION_FIELD_COUNT] = {
+    [OPERATION_FIELD_END] = {FIELD_KIND_FIXED, 0u},
+    [OPERATION_FIELD_BRANCH] = {FIELD_KIND_FIXED, sizeof(struct operation_group_header)},
+    [OPERATION_FIELD_TAG] = {FIELD_KIND_FIXED, sizeof(uint8_t)},
+    [OPERATION_FIELD_SOURCE] = {FIELD_KIND_FIXED, sizeof(struct implicit_contract)},
+    [OPERATION_FIELD_FEE] = {FIELD_KIND_ZARITH, 0u},
+    [OPERATION_FIELD_COUNTER] = {FIELD_KIND_ZARITH, 0u},
+    [OPERATION_FIELD_GAS_LIMIT] = {FIELD_KIND_ZARITH, 0u},
+    [OPERATION_FIELD_STORAGE_LIMIT] = {FIELD_KIND_ZARITH, 0u},
+    [OPERATION_FIELD_PUBLIC_KEY_TYPE] = {FIELD_KIND_FIXED,
+                                         sizeof(raw_tezos_header_signature_type_t)},
+    [OPERATION_FIELD_PUBLIC_KEY] = {FIELD_KIND_PUBLIC_KEY, 0u},
+    [OPERATION_FIELD_DELEGATE_PRESENCE] = {FIELD_KIND_FIXED, sizeof(uint8_t)},
+    [OPERATION_FIELD_DELEGATE] = {FIELD_KIND_FIXED, sizeof(struct delegation_contents)},
+};
+
+#define MAX_LAYOUT_FIELDS 8u  /// Maximum number of fields of a layout, including its end
+
+/// Fields of each layout, in order. The layouts end with OPERATION_FIELD_END.
+static const operation_field_t LAYOUT_FIELDS[OPERATION_LAYOUT_COUNT][MAX_LAYOUT_FIELDS] = {
+    [OPERATION_LAYOUT_HEADER] = {OPERATION_FIELD_BRANCH, OPERATION_FIELD_END},
+    [OPERATION_LAYOUT_CONTENT] = {OPERATION_FIELD_TAG, OPERATION_FIELD_END},
+    [OPERATION_LAYOUT_REVEAL] = {OPERATION_FIELD_SOURCE,
+                                 OPERATION_FIELD_FEE,
+                                 OPERATION_FIELD_COUNTER,
+                                 OPERATION_FIELD_GAS_LIMIT,
+                                 OPERATION_FIELD_STORAGE_LIMIT,
+                                 OPERATION_FIELD_PUBLIC_KEY_TYPE,
+                                 OPERATION_FIELD_PUBLIC_KEY,
+                                 OPERATION_FIELD_END},
+    [OPERATION_LAYOUT_DELEGATION] = {OPERATION_FIELD_SOURCE,
+                                     OPERATION_FIELD_FEE,
+                                     OPERATION_FIELD_COUNTER,
+                                     OPERATION_FIELD_GAS_LIMIT,
+                                     OPERATION_FIELD_STORAGE_LIMIT,
+                                     OPERATION_FIELD_DELEGATE_PRESENCE,
+                                     OPERATION_FIELD_DELEGATE,
+                                     OPERATION_FIELD_END},
+};
 
 /**
- * @brief Parses a Z number
+ * @brief Parses a byte of a Z number
  *
  * @param current_byte: the current read byte
- * @param state: parsing state
- * @param lineno: line number of the caller
+ * @param state: Z parsing state
  * @return tz_parser_result: result of the parsing
  */
 static inline tz_parser_result parse_z(uint8_t current_byte,
-                                       struct int_subparser_state *state,
-                                       uint32_t lineno) {
+                                       struct zarith_parser_state *const state) {
     tz_parser_result res = PARSER_CONTINUE;
 
-    if (state->lineno != lineno) {
-        // New call; initialize.
-        state->lineno = lineno;
-        state->value = 0;
-        state->shift = 0;
-    }
     // Fails when the resulting shifted value overflows 64 bits
     if ((state->shift > 63u) || ((state->shift == 63u) && (current_byte != 1u))) {
         PARSER_FAIL();
@@ -205,77 +240,172 @@ static inline tz_parser_result parse_z(uint8_t current_byte,
 end:
     return res;
 }
-#define PARSE_Z                                                             \
-    ({                                                                      \
-        CALL_SUBPARSER(parse_z, (byte), &(state)->subparser_state.integer); \
-        (state)->subparser_state.integer.value;                             \
-    })
 
 /**
- * @brief Parses a wire type
+ * @brief Reads the bytes of the current field available in the buffer
  *
- * @param current_byte: the current read byte
+ *        The fixed-size fields are copied in bulk in the state body
+ *
+ * @param buf: input operation
+ * @param descriptor: descriptor of the current field
  * @param state: parsing state
- * @param sizeof_type: size of the type
- * @param lineno: line number of the caller
- * @return tz_parser_result: result of the parsing
+ * @param out: parsing output
+ * @return tz_parser_result: PARSER_DONE if the field has been fully
+ *         read, PARSER_CONTINUE if it needs more bytes
  */
-static tz_parser_result parse_next_type(uint8_t current_byte,
-                                        struct nexttype_subparser_state *state,
-                                        uint32_t sizeof_type,
-                                        uint32_t lineno) {
+static tz_parser_result read_field(buffer_t *buf,
+                                   field_descriptor_t const *const descriptor,
+                                   struct parse_state *const state,
+                                   struct parsed_operation_group const *const out) {
     tz_parser_result res = PARSER_CONTINUE;
+    uint8_t byte;
 
-#ifdef DEBUG
-    if (sizeof_type > sizeof(state->body)) {
-        PARSER_FAIL();  // Shouldn't happen, but error if it does and we're debugging. Neither side
-                        // is dynamic.
+    switch (descriptor->kind) {
+        case FIELD_KIND_ZARITH:
+            while ((res == PARSER_CONTINUE) && buffer_read_u8(buf, &byte)) {
+                res = parse_z(byte, &state->zarith);
+            }
+            break;
+        case FIELD_KIND_FIXED:
+        case FIELD_KIND_PUBLIC_KEY: {
+            // klen must match one of the field sizes in the public_key union
+            size_t const size =
+                (descriptor->kind == FIELD_KIND_FIXED) ? descriptor->size : out->public_key.W_len;
+            PARSER_ASSERT((size <= sizeof(state->body)) && (state->fill_idx < size));
+
+            size_t const length = CUSTOM_MIN(size - state->fill_idx, buf->size - buf->offset);
+            memcpy(state->body.raw + state->fill_idx, buf->ptr + buf->offset, length);
+            PARSER_ASSERT(buffer_seek_cur(buf, length));
+            state->fill_idx += (uint8_t) length;
+
+            if (state->fill_idx == size) {
+                res = PARSER_DONE;
+            }
+            break;
+        }
+        default:
+            PARSER_FAIL();
     }
-#endif
 
-    if (state->lineno != lineno) {
-        state->lineno = lineno;
-        state->fill_idx = 0;
-    }
+end:
+    return res;
+}
 
-    state->body.raw[state->fill_idx] = current_byte;
-    state->fill_idx++;
+/**
+ * @brief Starts a layout at its first field
+ *
+ * @param state: parsing state
+ * @param layout: layout to start
+ */
+static inline void start_layout(struct parse_state *const state, operation_layout_t layout) {
+    state->layout = layout;
+    state->field_index = 0u;
+}
 
-    if (state->fill_idx == sizeof_type) {
-        res = PARSER_DONE;
+/**
+ * @brief Checks and stores a field which has been fully read
+ *
+ *        The parser moves to the next field of the layout unless the
+ *        field starts another layout
+ *
+ * @param field: field read
+ * @param state: parsing state
+ * @param out: parsing output
+ * @return tz_parser_result: result of the parsing
+ */
+static tz_parser_result store_field(operation_field_t field,
+                                    struct parse_state *const state,
+                                    struct parsed_operation_group *const out) {
+    tz_parser_result res = PARSER_CONTINUE;
+    state->field_index++;
+
+    switch (field) {
+        case OPERATION_FIELD_BRANCH:
+        case OPERATION_FIELD_COUNTER:
+        case OPERATION_FIELD_GAS_LIMIT:
+            // Ignored
+            break;
+        case OPERATION_FIELD_TAG:
+            state->tag = (enum operation_tag) state->body.raw[0];
+            switch (state->tag) {
+                case OPERATION_TAG_REVEAL:
+                    start_layout(state, OPERATION_LAYOUT_REVEAL);
+                    break;
+                case OPERATION_TAG_DELEGATION:
+                    // We are only currently allowing one non-reveal operation
+                    PARSER_ASSERT(out->operation.tag == OPERATION_TAG_NONE);
+                    out->operation.tag = state->tag;
+                    start_layout(state, OPERATION_LAYOUT_DELEGATION);
+                    break;
+                default:
+                    PARSER_FAIL();
+            }
+            break;
+        case OPERATION_FIELD_SOURCE:
+            // Tags that don't have "originated" byte only support tz accounts, not KT or tz.
+            PARSER_CHECK(parse_implicit(&out->operation.source,
+                                        &state->body.ic.signature_type,
+                                        state->body.ic.pkh));
+            // It had better match our key, otherwise why are we signing it?
+            PARSER_ASSERT(COMPARE(out->operation.source, out->signing) == 0);
+            break;
+        case OPERATION_FIELD_FEE:
+            out->total_fee += state->zarith.value;
+            break;
+        case OPERATION_FIELD_STORAGE_LIMIT:
+            out->total_storage_limit += state->zarith.value;
+            break;
+        case OPERATION_FIELD_PUBLIC_KEY_TYPE: {
+            // Public key up next! Ensure it matches signing key.
+            signature_type_t reveal_signature_type = {0};
+            PARSER_CHECK(parse_raw_tezos_header_signature_type(&state->body.sigtype,
+                                                               &reveal_signature_type));
+            PARSER_ASSERT(reveal_signature_type == out->signing.signature_type);
+            break;
+        }
+        case OPERATION_FIELD_PUBLIC_KEY:
+            PARSER_ASSERT(memcmp(out->public_key.W, state->body.raw, out->public_key.W_len) == 0);
+            out->has_reveal = true;
+            break;
+        case OPERATION_FIELD_DELEGATE_PRESENCE:
+            if (state->body.raw[0] == 0u) {
+                // Encode "not present"
+                out->operation.destination.originated = 0;
+                out->operation.destination.signature_type = SIGNATURE_TYPE_UNSET;
+                start_layout(state, OPERATION_LAYOUT_CONTENT);
+            }
+            break;
+        case OPERATION_FIELD_DELEGATE:
+            PARSER_CHECK(parse_implicit(&out->operation.destination,
+                                        &state->body.dc.signature_type,
+                                        state->body.dc.hash));
+            break;
+        default:
+            PARSER_FAIL();
     }
 
-    if (state->fill_idx > sizeof_type) {
-        PARSER_FAIL();
+    // The operations go back to the top to catch any reveals.
+    if (LAYOUT_FIELDS[state->layout][state->field_index] == OPERATION_FIELD_END) {
+        start_layout(state, OPERATION_LAYOUT_CONTENT);
     }
 
+    state->fill_idx = 0u;
+    state->zarith.value = 0u;
+    state->zarith.shift = 0u;
+    res = PARSER_DONE;
+
 end:
     return res;
 }
-// do _NOT_ keep pointers to this data around.
-#define NEXT_TYPE(type)                                                                          \
-    ({                                                                                           \
-        CALL_SUBPARSER(parse_next_type, byte, &(state->subparser_state.nexttype), sizeof(type)); \
-        (const type *) &(state->subparser_state.nexttype.body);                                  \
-    })
-
-// End of subparsers.
 
-/**
- * @brief Initialize the operation parser
- *
- * @param out: parsing output
- * @param path_with_curve: bip32 path and curve of the key
- * @param state: parsing state
- * @return tz_exc: exception, SW_OK if none
- */
-static tz_exc parse_operations_init(struct parsed_operation_group *const out,
-                                    bip32_path_with_curve_t const *const path_with_curve,
-                                    struct parse_state *const state) {
+tz_exc parse_operations_init(struct parsed_operation_group *const out,
+                             bip32_path_with_curve_t const *const path_with_curve,
+                             struct parse_state *const state) {
     tz_exc exc = SW_OK;
 
     TZ_ASSERT_NOT_NULL(out);
     TZ_ASSERT_NOT_NULL(path_with_curve);
+    TZ_ASSERT_NOT_NULL(state);
 
     memset(out, 0, sizeof(*out));
 
@@ -286,20 +416,14 @@ static tz_exc parse_operations_init(struct parsed_operation_group *const out,
     // Start out with source = signing, for reveals
     memcpy(&out->operation.source, &out->signing, sizeof(out->signing));
 
-    state->op_step = 0;
-    state->subparser_state.integer.lineno = -1;
-    state->tag = OPERATION_TAG_NONE;  // This and the rest shouldn't be required.
+    memset(state, 0, sizeof(*state));
+    start_layout(state, OPERATION_LAYOUT_HEADER);
+    state->tag = OPERATION_TAG_NONE;
 
 end:
     return exc;
 }
 
-/// Named steps in the top-level state machine
-#define STEP_END_OF_MESSAGE       -1
-#define STEP_OP_TYPE_DISPATCH     10001
-#define STEP_AFTER_MANAGER_FIELDS 10002
-#define STEP_HAS_DELEGATE         10003
-
 bool parse_operations_final(struct parse_state *const state,
                             struct parsed_operation_group *const out) {
     if ((state == NULL) || (out == NULL)) {
@@ -308,210 +432,58 @@ bool parse_operations_final(struct parse_state *const state,
     if ((out->operation.tag == OPERATION_TAG_NONE) && !out->has_reveal) {
         return false;
     }
-    return ((state->op_step == STEP_END_OF_MESSAGE) || (state->op_step == 1));
+    // The message must end between two operations
+    return !state->failed && (state->layout == OPERATION_LAYOUT_CONTENT) &&
+           (state->field_index == 0u) && (state->fill_idx == 0u);
 }
 
 /**
- * @brief Parse one bytes regarding the current parsing state
+ * @brief Parses the bytes of the buffer regarding the current parsing state
  *
- * @param byte: byte to read
+ * @param buf: input operation
  * @param state: parsing state
  * @param out: parsing output
  * @return tz_parser_result: result of the parsing
  */
-static inline tz_parser_result parse_byte(uint8_t byte,
-                                          struct parse_state *const state,
-                                          struct parsed_operation_group *const out) {
+static tz_parser_result parse_fields(buffer_t *buf,
+                                     struct parse_state *const state,
+                                     struct parsed_operation_group *const out) {
     tz_parser_result res = PARSER_CONTINUE;
 
-// OP_STEP finishes the current state transition, setting the state, and introduces the next state.
-// For linear chains of states, this keeps the code structurally similar to equivalent imperative
-// parsing code.
-#define OP_STEP                \
-    state->op_step = __LINE__; \
-    break;                     \
-    case __LINE__:
-
-// The same as OP_STEP, but with a particular name, such that we could jump to this state.
-#define OP_NAMED_STEP(name) \
-    state->op_step = name;  \
-    break;                  \
-    case name:
-
-// "jump" to specific state: (set state to foo and return.)
-#define JMP(step)          \
-    state->op_step = step; \
-    break;
-
-// Set the next state to start-of-payload; used after reveal.
-#define JMP_TO_TOP JMP(1)
-
-// Conditionally set the next state.
-#define OP_JMPIF(step, cond)   \
-    if (cond) {                \
-        state->op_step = step; \
-        break;                 \
-    }
+    PARSER_ASSERT(!state->failed);
 
-    switch (state->op_step) {
-        case STEP_HARD_FAIL:
-            PARSER_FAIL();
+    while (buf->offset < buf->size) {
+        PARSER_ASSERT((state->layout < OPERATION_LAYOUT_COUNT) &&
+                      (state->field_index < MAX_LAYOUT_FIELDS));
+        operation_field_t const field = LAYOUT_FIELDS[state->layout][state->field_index];
+        PARSER_ASSERT((field != OPERATION_FIELD_END) && (field < OPERATION_FIELD_COUNT));
 
-        case STEP_END_OF_MESSAGE:
-            PARSER_FAIL();  // We already hit a hard end of message; fail.
+        res = read_field(buf, &FIELD_DESCRIPTORS[field], state, out);
+        PARSER_ASSERT(res != PARSER_ERROR);
 
-        case 0: {
-            // Ignore block hash
-            NEXT_TYPE(struct operation_group_header);
+        if (res == PARSER_DONE) {
+            PARSER_CHECK(store_field(field, state, out));
         }
-
-            OP_NAMED_STEP(1)
-
-            state->tag = NEXT_BYTE;
-
-            OP_STEP
-
-            // Parse 'source'
-            switch (state->tag) {
-                // Tags that don't have "originated" byte only support tz accounts, not KT or tz.
-                case OPERATION_TAG_DELEGATION:
-                case OPERATION_TAG_REVEAL: {
-                    struct implicit_contract const *const implicit_source =
-                        NEXT_TYPE(struct implicit_contract);
-
-                    out->operation.source.originated = 0;
-                    PARSER_CHECK(parse_raw_tezos_header_signature_type(
-                        &implicit_source->signature_type,
-                        &out->operation.source.signature_type));
-
-                    memcpy(out->operation.source.hash,
-                           implicit_source->pkh,
-                           sizeof(out->operation.source.hash));
-                    break;
-                }
-
-                default:
-                    PARSER_FAIL();
-                    break;
-            }
-
-            // If the source is an implicit contract,...
-            if (!out->operation.source.originated) {
-                // ... it had better match our key, otherwise why are we signing it?
-                PARSER_ASSERT(COMPARE(out->operation.source, out->signing) == 0);
-            }
-            // OK, it passes muster.
-
-            OP_STEP
-
-            // out->operation.source IS NORMALIZED AT THIS POINT
-
-            // Parse common fields for non-governance related operations.
-
-            out->total_fee += PARSE_Z;  // fee
-            OP_STEP
-            PARSE_Z;  // counter
-            OP_STEP
-            PARSE_Z;  // gas limit
-            OP_STEP
-            out->total_storage_limit += PARSE_Z;  // storage limit
-
-            OP_JMPIF(STEP_AFTER_MANAGER_FIELDS, state->tag != OPERATION_TAG_REVEAL)
-
-            OP_STEP
-
-            // We know this is a reveal
-
-            // Public key up next! Ensure it matches signing key.
-            {
-                raw_tezos_header_signature_type_t const *const sig_type =
-                    NEXT_TYPE(raw_tezos_header_signature_type_t);
-                signature_type_t reveal_signature_type = {0};
-                PARSER_CHECK(
-                    parse_raw_tezos_header_signature_type(sig_type, &reveal_signature_type));
-                PARSER_ASSERT(reveal_signature_type == out->signing.signature_type);
-            }
-
-            OP_STEP
-
-            {
-                size_t klen = out->public_key.W_len;
-
-                // klen must match one of the field sizes in the public_key union
-
-                CALL_SUBPARSER(parse_next_type, byte, &(state->subparser_state.nexttype), klen);
-
-                PARSER_ASSERT(memcmp(out->public_key.W,
-                                     &(state->subparser_state.nexttype.body.raw),
-                                     klen) == 0);
-
-                out->has_reveal = true;
-
-                JMP_TO_TOP;
-            }
-
-        case STEP_AFTER_MANAGER_FIELDS:  // Anything but a reveal
-
-            // We are only currently allowing one non-reveal operation
-            PARSER_ASSERT(out->operation.tag == OPERATION_TAG_NONE);
-
-            // This is the one allowable non-reveal operation per set
-
-            out->operation.tag = state->tag;
-
-            // Deliberate epsilon-transition.
-            state->op_step = STEP_OP_TYPE_DISPATCH;
-            __attribute__((fallthrough));
-        default:
-
-            if (state->tag == OPERATION_TAG_DELEGATION) {
-                switch (state->op_step) {
-                    case STEP_OP_TYPE_DISPATCH: {
-                        bool delegate_present = NEXT_BYTE != 0u;
-
-                        OP_JMPIF(STEP_HAS_DELEGATE, delegate_present)
-                    }
-                        // Else branch: Encode "not present"
-                        out->operation.destination.originated = 0;
-                        out->operation.destination.signature_type = SIGNATURE_TYPE_UNSET;
-
-                        JMP_TO_TOP;  // These go back to the top to catch any reveals.
-
-                    case STEP_HAS_DELEGATE: {
-                        const struct delegation_contents *dlg =
-                            NEXT_TYPE(struct delegation_contents);
-                        PARSER_CHECK(parse_implicit(&out->operation.destination,
-                                                    &dlg->signature_type,
-                                                    dlg->hash));
-                    }
-                        JMP_TO_TOP;  // These go back to the top to catch any reveals.
-                    default:         // Any other tag; probably not possible here.
-                        PARSER_FAIL();
-                }
-            }
     }
+    res = PARSER_CONTINUE;
 
 end:
     if (res == PARSER_ERROR) {
-        global.apdu.u.sign.parse_state.op_step = STEP_HARD_FAIL;
+        state->failed = true;
     }
     return res;
 }
 
-#define G global.apdu.u.sign
-
 tz_exc parse_operations(buffer_t *buf,
-                        struct parsed_operation_group *const out,
-                        bip32_path_with_curve_t const *const path_with_curve) {
+                        struct parse_state *const state,
+                        struct parsed_operation_group *const out) {
     tz_exc exc = SW_OK;
-    uint8_t byte;
 
-    TZ_CHECK(parse_operations_init(out, path_with_curve, &G.parse_state));
+    TZ_ASSERT_NOT_NULL(buf);
+    TZ_ASSERT_NOT_NULL(state);
+    TZ_ASSERT_NOT_NULL(out);
 
-    while (buffer_read_u8(buf, &byte) == true) {
-        TZ_ASSERT(parse_byte(byte, &G.parse_state, out) != PARSER_ERROR, EXC_PARSE_ERROR);
-        PRINTF("Byte: %x - Next op_step state: %d\n", byte, G.parse_state.op_step);
-    }
+    TZ_ASSERT(parse_fields(buf, state, out) != PARSER_ERROR, EXC_PARSE_ERROR);
 
 end:
     return exc;
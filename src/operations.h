@@ -75,28 +75,60 @@ struct delegation_contents {
     uint8_t hash[KEY_HASH_SIZE];                       ///< raw delegate
 } __attribute__((packed));
 
+/**
+ * @brief Fields of the operations
+ *
+ */
+typedef enum {
+    OPERATION_FIELD_END = 0,            ///< end of the fields of a layout
+    OPERATION_FIELD_BRANCH,             ///< branch of the operation group
+    OPERATION_FIELD_TAG,                ///< tag of the operation
+    OPERATION_FIELD_SOURCE,             ///< source of the manager operation
+    OPERATION_FIELD_FEE,                ///< fee of the manager operation
+    OPERATION_FIELD_COUNTER,            ///< counter of the manager operation
+    OPERATION_FIELD_GAS_LIMIT,          ///< gas limit of the manager operation
+    OPERATION_FIELD_STORAGE_LIMIT,      ///< storage limit of the manager operation
+    OPERATION_FIELD_PUBLIC_KEY_TYPE,    ///< type of the revealed public key
+    OPERATION_FIELD_PUBLIC_KEY,         ///< revealed public key
+    OPERATION_FIELD_DELEGATE_PRESENCE,  ///< if the delegation has a delegate
+    OPERATION_FIELD_DELEGATE,           ///< delegate of the delegation
+    OPERATION_FIELD_COUNT               ///< number of fields
+} operation_field_t;
+
+/**
+ * @brief Layouts of the parts of an operation group, i.e. their sequence of fields
+ *
+ */
+typedef enum {
+    OPERATION_LAYOUT_HEADER = 0,  ///< operation group header
+    OPERATION_LAYOUT_CONTENT,     ///< tag of the next operation
+    OPERATION_LAYOUT_REVEAL,      ///< reveal, after its tag
+    OPERATION_LAYOUT_DELEGATION,  ///< delegation, after its tag
+    OPERATION_LAYOUT_COUNT        ///< number of layouts
+} operation_layout_t;
+
 /**
  * @brief This structure represents the state of a Z parser
  *
  */
-struct int_subparser_state {
-    uint32_t lineno;  ///< line number
-                      ///< Has to be in _all_ members of the subparser union.
-    uint64_t value;   ///< Read value
-                      /// Still need to fix this.
-    uint8_t shift;    ///< Z shift
+struct zarith_parser_state {
+    uint64_t value;  ///< Read value
+    uint8_t shift;   ///< Z shift
 };
 
 /**
- * @brief This structure represents the state of a wire type parser
- *
- *        Allows to read data using wire representation types
+ * @brief This structure represents the parsing state
  *
- *        Fills body using raw and an increasing fill_idx
+ *        The parsing can be resumed at any byte of the operation
+ *        group: the fixed-size fields are filled in `body` as their
+ *        bytes are received.
  *
  */
-struct nexttype_subparser_state {
-    uint32_t lineno;  ///< line number
+struct parse_state {
+    operation_layout_t layout;  ///< layout being parsed
+    uint8_t field_index;        ///< index of the current field in the layout
+    uint8_t fill_idx;           ///< number of bytes of the current fixed-size field read
+    bool failed;                ///< if the parsing has failed
 
     /// union of all wire structure
     union {
@@ -111,48 +143,46 @@ struct nexttype_subparser_state {
         // Required to read Reveal public key
         union public_key pk;  ///< wire public key
 
-        uint8_t raw[1];  ///< raw array to fill the body
+        uint8_t raw[sizeof(union public_key)];  ///< raw array to fill the body
     } body;
-    uint32_t fill_idx;  ///< current fill index
-};
+    struct zarith_parser_state zarith;  ///< state of the current Z field
 
-/**
- * @brief This structure represents the union of all subparsers
- *
- */
-union subparser_state {
-    struct int_subparser_state integer;        ///< state of a n integer parser
-    struct nexttype_subparser_state nexttype;  ///< state of a wire type parser
+    enum operation_tag tag;  ///< current operation tag
 };
 
 /**
- * @brief This structure represents the parsing state
+ * @brief Initializes the parsing of a group of operation
  *
+ * @param out: parsing output
+ * @param path_with_curve: bip32 path and curve of the key
+ * @param state: parsing state
+ * @return tz_exc: exception, SW_OK if none
  */
-struct parse_state {
-    int16_t op_step;                        ///< current parsing step
-    union subparser_state subparser_state;  ///< state of subparser
-    enum operation_tag tag;                 ///< current operation tag
-};
+tz_exc parse_operations_init(struct parsed_operation_group *const out,
+                             bip32_path_with_curve_t const *const path_with_curve,
+                             struct parse_state *const state);
 
 /**
- * @brief Parses a group of operation
+ * @brief Parses a part of a group of operation
  *
  *        Allows arbitrarily many "REVEAL" operations but only one
  *        operation of any other type, which is the one it puts into
  *        the group.
  *
- *        Some checks are carried out during the parsing using a key using a key
+ *        The parsing resumes from `state` so the group can be parsed
+ *        part by part, as the packets arrive, whatever its size.
  *
- * @param buf: input operation
+ *        Some checks are carried out during the parsing using the key
+ *        given to `parse_operations_init`
+ *
+ * @param buf: input part of the operation
+ * @param state: parsing state
  * @param out: parsing output
- * @param curve: curve of the key
- * @param path_with_curve: bip32 path and curve of the key
  * @return tz_exc: exception, SW_OK if none
  */
 tz_exc parse_operations(buffer_t *buf,
-                        struct parsed_operation_group *const out,
-                        bip32_path_with_curve_t const *const path_with_curve);
+                        struct parse_state *const state,
+                        struct parsed_operation_group *const out);
 
 /**
  * @brief Checks parsing has been completed successfully
@@ -213,8 +213,33 @@ typedef struct {
     bool hwm_disabled;                   /**< Set HWM setting on/off,
                                               e.g. if you are using signer assisted HWM,
                                               no need to track HWM using Ledger.*/
+    uint32_t hwm_journal_base;           /**< HWM journal sequence number of the HWMs
+                                              above, older journal entries are obsolete */
 } baking_data;
 
+/// Number of slots of the journal of each HWM
+#define HWM_JOURNAL_SLOTS 8u
+
+/**
+ * @brief This structure represents an entry of the HWM journal
+ *
+ */
+typedef struct {
+    uint32_t sequence;     ///< journal sequence number, 0 if never written
+    high_watermark_t hwm;  ///< journaled HWM
+    uint32_t checksum;     ///< checksum of the sequence number and of the HWM
+} hwm_journal_entry_t;
+
+/**
+ * @brief This structure represents the HWM journal stored in NVRAM
+ *
+ *        See `doc/NVRAM.md#hwm-journal`
+ */
+typedef struct {
+    hwm_journal_entry_t main[HWM_JOURNAL_SLOTS];  ///< journal of the main HWM
+    hwm_journal_entry_t test[HWM_JOURNAL_SLOTS];  ///< journal of the test HWM
+} hwm_journal_t;
+
 #define SIGN_HASH_SIZE 32u
 
 #define PKH_STRING_SIZE 40u  // includes null byte
@@ -42,6 +42,17 @@ void __attribute__((noreturn)) app_exit(void);
 
 #ifdef HAVE_BAGL
 
+/**
+ * @brief This structure represents a context needed for home screens navigation
+ *
+ */
+typedef struct {
+    char chain_id[CHAIN_ID_BASE58_STRING_SIZE];
+    char authorized_key[PKH_STRING_SIZE];
+    char hwm[MAX_INT_DIGITS + 1u + MAX_INT_DIGITS + 1u];
+    char hwm_status[HWM_STATUS_SIZE];
+} HomeContext_t;
+
 #ifdef TARGET_NANOS
 /**
  * @brief Sets low-cost display mode
@@ -74,6 +85,14 @@ tz_exc calculate_idle_screen_authorized_key(void);
  */
 tz_exc calculate_idle_screen_hwm(void);
 
+/**
+ * @brief Marks the HWM of the idle screens as outdated
+ *
+ *        The HWM is only recomputed when its screen is next displayed,
+ *        to keep the formatting out of the signing path
+ */
+void invalidate_idle_screen_hwm(void);
+
 /**
  * @brief Calculates baking values for the idle screens
  *
@@ -118,20 +118,10 @@ uint8_t io_event(uint8_t channel) {
 #endif  // TARGET_NANOS
 
 static void ui_refresh_idle_hwm_screen(void);
-
-/**
- * @brief This structure represents a context needed for home screens navigation
- *
- */
-typedef struct {
-    char chain_id[CHAIN_ID_BASE58_STRING_SIZE];
-    char authorized_key[PKH_STRING_SIZE];
-    char hwm[MAX_INT_DIGITS + 1u + MAX_INT_DIGITS + 1u];
-    char hwm_status[HWM_STATUS_SIZE];
-} HomeContext_t;
+static void update_idle_screen_hwm(void);
 
 /// Current home context
-static HomeContext_t home_context;
+#define home_context global.dynamic_display.screen_context.home
 
 void ui_settings(void);    ///> Initialize settings page
 void ui_toggle_hwm(void);  ///> Toggle HWM settings
@@ -156,10 +146,11 @@ UX_STEP_NOCB(ux_version_step, bnnn_paging, {"Tezos Baking", APPVERSION});
 UX_STEP_NOCB(ux_chain_id_step, bnnn_paging, {"Chain", home_context.chain_id});
 UX_STEP_NOCB(ux_authorized_key_step, bnnn_paging, {"Public Key Hash", home_context.authorized_key});
 UX_STEP_CB(ux_settings_step, pb, ui_settings(), {&C_icon_coggle, "Settings"});
-UX_STEP_CB(ux_hwm_step,
-           bnnn_paging,
-           ui_refresh_idle_hwm_screen(),
-           {"High Watermark", home_context.hwm});
+UX_STEP_CB_INIT(ux_hwm_step,
+                bnnn_paging,
+                update_idle_screen_hwm(),
+                ui_refresh_idle_hwm_screen(),
+                {"High Watermark", home_context.hwm});
 UX_STEP_CB(ux_idle_quit_step, pb, app_exit(), {&C_icon_dashboard_x, "Quit"});
 
 UX_FLOW(ux_idle_flow,
@@ -238,10 +229,29 @@ tz_exc calculate_idle_screen_hwm(void) {
     TZ_ASSERT(hwm_to_string(home_context.hwm, sizeof(home_context.hwm), &g_hwm.hwm.main) >= 0,
               EXC_WRONG_LENGTH);
 
+    G_display.idle_screen_hwm_dirty = false;
+
 end:
     return exc;
 }
 
+void invalidate_idle_screen_hwm(void) {
+    G_display.idle_screen_hwm_dirty = true;
+}
+
+/**
+ * @brief Recomputes the HWM of the idle screens if it is outdated
+ *
+ *        Called right before the HWM screen is displayed
+ *
+ */
+static void update_idle_screen_hwm(void) {
+    if (G_display.idle_screen_hwm_dirty) {
+        // Ignore calculation errors
+        (void) calculate_idle_screen_hwm();
+    }
+}
+
 tz_exc calculate_baking_idle_screens_data(void) {
     tz_exc exc = SW_OK;
 
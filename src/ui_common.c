@@ -20,6 +20,7 @@
 */
 
 #include "ui.h"
+#include "keys.h"
 #include "os_pin.h"
 
 #include <globals.h>
@@ -34,6 +35,7 @@ static void require_pin(void) {
 
 void __attribute__((noreturn)) app_exit(void) {
     UPDATE_NVRAM
+    wipe_baking_key_cache();
     require_pin();
     os_sched_exit(-1);
 }
@@ -20,8 +20,22 @@
 */
 #pragma once
 
+#include "to_string.h"
 #include "types.h"
 
+#ifdef HAVE_BAGL
+
+/**
+ * @brief This structure represents a context needed for delegation screens navigation
+ *
+ */
+typedef struct {
+    char address[PKH_STRING_SIZE];
+    char fee[MAX_INT_DIGITS + sizeof(TICKER_WITH_SPACE) + 1u];
+} DelegationContext_t;
+
+#endif  // HAVE_BAGL
+
 /**
  * @brief Draws delegation confirmation pages flow
  *
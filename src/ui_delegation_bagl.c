@@ -36,17 +36,8 @@
 
 #define G global.apdu.u.sign
 
-/**
- * @brief This structure represents a context needed for delegation screens navigation
- *
- */
-typedef struct {
-    char address[PKH_STRING_SIZE];
-    char fee[MAX_INT_DIGITS + sizeof(TICKER_WITH_SPACE) + 1u];
-} DelegationContext_t;
-
 /// Current delegation context
-static DelegationContext_t delegation_context;
+#define delegation_context global.dynamic_display.screen_context.delegation
 
 UX_STEP_NOCB(ux_register_step, bnnn_paging, {"Register", "as delegate?"});
 UX_STEP_NOCB(ux_delegate_step, bnnn_paging, {"Address", delegation_context.address});
@@ -75,6 +66,8 @@ int prompt_delegation(ui_callback_t const ok_cb, ui_callback_t const cxl_cb) {
     return 0;
 
 end:
+    // The context shares its storage with the idle screens one
+    ui_initial_screen();
     return io_send_apdu_err(exc);
 }
 
@@ -22,6 +22,18 @@
 
 #include "types.h"
 
+#ifdef HAVE_BAGL
+
+/**
+ * @brief This structure represents a context needed for address screens navigation
+ *
+ */
+typedef struct {
+    char public_key_hash[PKH_STRING_SIZE];
+} AddressContext_t;
+
+#endif  // HAVE_BAGL
+
 /**
  * @brief Draws public key confirmation pages flow
  *
@@ -33,16 +33,8 @@
 
 #include <string.h>
 
-/**
- * @brief This structure represents a context needed for address screens navigation
- *
- */
-typedef struct {
-    char public_key_hash[PKH_STRING_SIZE];
-} AddressContext_t;
-
 /// Current address context
-static AddressContext_t address_context;
+#define address_context global.dynamic_display.screen_context.address
 
 UX_STEP_NOCB(ux_authorize_step, bnnn_paging, {"Authorize Baking", "With Public Key?"});
 UX_STEP_NOCB(ux_provide_step, bnnn_paging, {"Provide", "Public Key"});
@@ -71,6 +63,8 @@ int prompt_pubkey(bool authorize, ui_callback_t ok_cb, ui_callback_t cxl_cb) {
     return 0;
 
 end:
+    // The context shares its storage with the idle screens one
+    ui_initial_screen();
     return io_send_apdu_err(exc);
 }
 
@@ -23,6 +23,18 @@
 
 #include "types.h"
 
+#ifdef HAVE_BAGL
+
+/**
+ * @brief This structure represents a context needed for reset screens navigation
+ *
+ */
+typedef struct {
+    char reset_level[MAX_INT_DIGITS + 1u];
+} ResetContext_t;
+
+#endif  // HAVE_BAGL
+
 /**
  * @brief Draws reset confirmation pages flow
  *
@@ -35,16 +35,8 @@
 
 #define G global.apdu.u.baking
 
-/**
- * @brief This structure represents a context needed for reset screens navigation
- *
- */
-typedef struct {
-    char reset_level[MAX_INT_DIGITS + 1u];
-} ResetContext_t;
-
 /// Current reset context
-static ResetContext_t reset_context;
+#define reset_context global.dynamic_display.screen_context.reset
 
 UX_STEP_NOCB(ux_reset_level_step, bnnn_paging, {"Reset HWM", reset_context.reset_level});
 
@@ -65,6 +57,8 @@ int prompt_reset(ui_callback_t const ok_cb, ui_callback_t const cxl_cb) {
     return 0;
 
 end:
+    // The context shares its storage with the idle screens one
+    ui_initial_screen();
     return io_send_apdu_err(exc);
 }
 
@@ -23,6 +23,21 @@
 
 #include "types.h"
 
+#ifdef HAVE_BAGL
+
+/**
+ * @brief This structure represents a context needed for setup screens navigation
+ *
+ */
+typedef struct {
+    char address[PKH_STRING_SIZE];
+    char chain[CHAIN_ID_BASE58_STRING_SIZE];
+    char main_hwm[MAX_INT_DIGITS + 1u];
+    char test_hwm[MAX_INT_DIGITS + 1u];
+} SetupContext_t;
+
+#endif  // HAVE_BAGL
+
 /**
  * @brief Draws setup confirmation pages flow
  *
@@ -35,19 +35,8 @@
 
 #define G global.apdu.u.setup
 
-/**
- * @brief This structure represents a context needed for setup screens navigation
- *
- */
-typedef struct {
-    char address[PKH_STRING_SIZE];
-    char chain[CHAIN_ID_BASE58_STRING_SIZE];
-    char main_hwm[MAX_INT_DIGITS + 1u];
-    char test_hwm[MAX_INT_DIGITS + 1u];
-} SetupContext_t;
-
 /// Current setup context
-static SetupContext_t setup_context;
+#define setup_context global.dynamic_display.screen_context.setup
 
 UX_STEP_NOCB(ux_setup_step, bnnn_paging, {"Setup", "Baking?"});
 UX_STEP_NOCB(ux_address_step, bnnn_paging, {"Address", setup_context.address});
@@ -89,6 +78,8 @@ int prompt_setup(ui_callback_t const ok_cb, ui_callback_t const cxl_cb) {
     return 0;
 
 end:
+    // The context shares its storage with the idle screens one
+    ui_initial_screen();
     return io_send_apdu_err(exc);
 }
 
@@ -15,24 +15,268 @@
 
 """Pytest configuration file."""
 
+import time
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Generator, Optional
+
 import pytest
 from ragger.backend import BackendInterface
 from ragger.conftest import configuration
+from ragger.conftest.base_conftest import create_backend, prepare_speculos_args
 from ragger.firmware import Firmware
 from ragger.navigator import Navigator
+from utils.apdu_trace import ApduTracer
+from utils.backend import TezosSpeculosBackend
 from utils.client import TezosClient
-from utils.navigator import TezosNavigator
-from common import DEFAULT_SEED
+from utils.host_profiling import cpu_profile, memory_profile
+from utils.latency import LatencyProfiler, profiling
+from utils.metrics import ClientMetrics
+from utils.navigator import TezosNavigator, TezosNanoNavigator, TezosTouchNavigator
+from utils.snapshot import SnapshotCache, SnapshotPipeline
+from utils.snapshot_store import SnapshotStore
+from utils.time_breakdown import TimeBreakdown
+from common import DEFAULT_SEED, TESTS_ROOT_DIR
+
+APDU_TRACES_DIR = TESTS_ROOT_DIR / "apdu-traces"
+PROFILES_DIR = TESTS_ROOT_DIR / "profiles"
+
+time_breakdown_key = pytest.StashKey[TimeBreakdown]()
 
 configuration.OPTIONAL.CUSTOM_SEED = DEFAULT_SEED
 
 # Pull all features from the base ragger conftest using the overridden configuration
 pytest_plugins = ("ragger.conftest.base_conftest", )
 
+def pytest_addoption(parser):
+    """Register tezos specific options."""
+    parser.addoption("--deferred_snapshots", action="store_true", default=False,
+                     help="Compare the snapshots in background processes, "
+                     "the failures are reported at the test teardown")
+    parser.addoption("--snapshots_root", type=Path, default=None,
+                     help="Location of the golden snapshot store, "
+                     "defaults to the snapshots directory")
+    parser.addoption("--speculos_port", type=int, default=None,
+                     help="Speculos API port, the APDU port being the next one")
+    parser.addoption("--benchmark", action="store_true", default=False,
+                     help="Run the benchmarks")
+    parser.addoption("--apdu_trace", type=int, default=None, metavar="CAPACITY",
+                     help="Trace the last CAPACITY APDU exchanges, the trace is "
+                     "dumped in apdu-traces on test failures and on SIGUSR1")
+    parser.addoption("--metrics_file", type=Path, default=None,
+                     help="Write the client metrics in the Prometheus text format "
+                     "in this file at the end of the session")
+    parser.addoption("--metrics_port", type=int, default=None,
+                     help="Serve the client metrics on localhost:<port>/metrics")
+    parser.addoption("--time_breakdown", type=Path, default=None,
+                     help="Report the time spent by each test in startup, navigation, "
+                     "snapshot comparisons and APDUs, and write it as JSON in this file")
+    parser.addoption("--profile_cpu", action="store_true", default=False,
+                     help="Profile the selected tests with cProfile, "
+                     "in profiles/<test>.pstats")
+    parser.addoption("--profile_mem", action="store_true", default=False,
+                     help="Trace the allocations of the selected tests with tracemalloc, "
+                     "in profiles/<test>.memdiff.txt")
+
+def pytest_configure(config):
+    """Register tezos specific markers and set up the time breakdown."""
+    config.addinivalue_line(
+        "markers",
+        "headless: run the test on a speculos not waiting for nor capturing the screen",
+    )
+    config.addinivalue_line(
+        "markers",
+        "benchmark: only run the test with --benchmark",
+    )
+
+    if config.getoption("time_breakdown") is not None:
+        config.stash[time_breakdown_key] = TimeBreakdown()
+
+def pytest_collection_modifyitems(config, items):
+    """Skip the benchmarks unless requested."""
+    if config.getoption("benchmark"):
+        return
+    skip_benchmark = pytest.mark.skip(reason="benchmarks only run with --benchmark")
+    for item in items:
+        if item.get_closest_marker("benchmark"):
+            item.add_marker(skip_benchmark)
+
+def _file_name(item) -> str:
+    """Name of the files dumped for a test."""
+    return item.nodeid.replace("/", "_").replace("::", "-")
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item, nextitem):
+    """Profile the setup, call and teardown of each test for the time breakdown."""
+    breakdown = item.config.stash.get(time_breakdown_key, None)
+    if breakdown is None:
+        yield
+        return
+    profiler = LatencyProfiler()
+    start = time.perf_counter()
+    with profiling(profiler):
+        yield
+    breakdown.add(item.nodeid, time.perf_counter() - start, profiler)
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    """Profile the call of the tests with cProfile and/or tracemalloc."""
+    name = _file_name(item)
+    with ExitStack() as stack:
+        if item.config.getoption("profile_cpu"):
+            stack.enter_context(cpu_profile(PROFILES_DIR / f"{name}.pstats"))
+        if item.config.getoption("profile_mem"):
+            stack.enter_context(memory_profile(PROFILES_DIR / f"{name}.memdiff.txt"))
+        yield
+
+def pytest_terminal_summary(terminalreporter, config):
+    """Report the time breakdown of the slowest tests."""
+    breakdown = config.stash.get(time_breakdown_key, None)
+    if breakdown is None or not breakdown.tests:
+        return
+    terminalreporter.section("time breakdown")
+    for line in breakdown.report():
+        terminalreporter.write_line(line)
+    path = config.getoption("time_breakdown")
+    breakdown.write(path)
+    terminalreporter.write_line(f"Time breakdown written in {path}")
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """Dump the APDU trace of the failed tests."""
+    outcome = yield
+    report = outcome.get_result()
+    tracer = getattr(item, "funcargs", {}).get("apdu_tracer")
+    if report.failed and tracer is not None:
+        name = _file_name(item)
+        path = tracer.dump(APDU_TRACES_DIR / f"{name}-{report.when}.tztrace")
+        report.sections.append(("APDU trace", f"Dumped in {path}"))
+
+@pytest.fixture(scope="session")
+def apdu_tracer(pytestconfig) -> Optional[ApduTracer]:
+    """Get the APDU tracer shared by the clients, None unless requested."""
+    capacity = pytestconfig.getoption("apdu_trace")
+    if capacity is None:
+        return None
+    tracer = ApduTracer(capacity)
+    tracer.install_signal_handler(APDU_TRACES_DIR)
+    return tracer
+
+@pytest.fixture(scope="session")
+def client_metrics(pytestconfig) -> Generator[Optional[ClientMetrics], None, None]:
+    """Get the metrics shared by the clients, None unless requested."""
+    metrics_file: Optional[Path] = pytestconfig.getoption("metrics_file")
+    metrics_port: Optional[int] = pytestconfig.getoption("metrics_port")
+    if metrics_file is None and metrics_port is None:
+        yield None
+        return
+    metrics = ClientMetrics()
+    server = None if metrics_port is None else metrics.serve(metrics_port)
+    yield metrics
+    if server is not None:
+        server.shutdown()
+    if metrics_file is not None:
+        metrics.write(metrics_file)
+
+@pytest.fixture(scope="session")
+def snapshot_store(pytestconfig, golden_run: bool) -> Generator[SnapshotStore, None, None]:
+    """Get the store of the golden snapshots."""
+    golden_root = TESTS_ROOT_DIR / "snapshots"
+    store = SnapshotStore(pytestconfig.getoption("snapshots_root") or golden_root, golden_root)
+    yield store
+    if golden_run:
+        store.flush()
+        store.prune()
+
+@pytest.fixture(scope="session")
+def snapshot_cache(snapshot_store: SnapshotStore) -> SnapshotCache:
+    """Get the decoded snapshots shared by the whole session."""
+    return SnapshotCache(snapshot_store)
+
+@pytest.fixture(scope="session")
+def snapshot_pipeline(
+        pytestconfig,
+        snapshot_store: SnapshotStore) -> Generator[Optional[SnapshotPipeline], None, None]:
+    """Get the background snapshot comparisons, if enabled."""
+    if not pytestconfig.getoption("deferred_snapshots"):
+        yield None
+        return
+    pipeline = SnapshotPipeline(snapshot_store.root, snapshot_store.golden_root)
+    yield pipeline
+    pipeline.shutdown()
+
+@pytest.fixture(autouse=True)
+def join_snapshot_comparisons(request) -> Generator[None, None, None]:
+    """Fail the test if one of its deferred snapshot comparisons failed."""
+    yield
+    if "backend" in request.fixturenames:
+        backend_instance = request.getfixturevalue("backend")
+        if isinstance(backend_instance, TezosSpeculosBackend):
+            backend_instance.join_comparisons()
+
+# Overrides the ragger `backend` fixture to use the tezos speculos backend
+@pytest.fixture(scope=configuration.OPTIONAL.BACKEND_SCOPE)
+def backend(
+        request,
+        pytestconfig,
+        root_pytest_dir: Path,
+        backend_name: str,
+        firmware: Firmware,
+        display: bool,
+        log_apdu_file: Optional[Path],
+        cli_user_seed: str,
+        snapshot_cache: SnapshotCache,
+        snapshot_pipeline: Optional[SnapshotPipeline]) -> Generator[BackendInterface, None, None]:
+    """Get a backend.
+
+    Tests marked `headless` get a speculos backend ignoring the screen.
+    """
+    if backend_name.lower() == "speculos":
+        headless = request.node.get_closest_marker("headless") is not None
+        main_app_path, speculos_args = prepare_speculos_args(
+            root_pytest_dir,
+            firmware,
+            display and not headless,
+            cli_user_seed
+        )
+        port = pytestconfig.getoption("speculos_port")
+        if port is not None:
+            speculos_args["args"] += ["--api-port", str(port), "--apdu-port", str(port + 1)]
+        instance: BackendInterface = TezosSpeculosBackend(
+            main_app_path,
+            firmware=firmware,
+            log_apdu_file=log_apdu_file,
+            snapshot_cache=snapshot_cache,
+            snapshot_pipeline=snapshot_pipeline,
+            headless=headless,
+            **speculos_args
+        )
+    else:
+        instance = create_backend(
+            root_pytest_dir,
+            backend_name,
+            firmware,
+            display,
+            log_apdu_file,
+            cli_user_seed
+        )
+    with instance as b:
+        yield b
+
+# Overrides the ragger `navigator` fixture to resolve goldens through the snapshot store
+@pytest.fixture(scope=configuration.OPTIONAL.BACKEND_SCOPE)
+def navigator(backend: BackendInterface, firmware: Firmware, golden_run: bool) -> Navigator:
+    """Get a navigator."""
+    if firmware.is_nano:
+        return TezosNanoNavigator(backend, firmware, golden_run)
+    return TezosTouchNavigator(backend, firmware, golden_run)
+
 @pytest.fixture(scope="function")
-def client(backend: BackendInterface) -> TezosClient:
+def client(backend: BackendInterface,
+           apdu_tracer: Optional[ApduTracer],
+           client_metrics: Optional[ClientMetrics]) -> TezosClient:
     """Get a tezos client."""
-    return TezosClient(backend)
+    return TezosClient(backend, apdu_tracer, client_metrics)
 
 @pytest.fixture(scope="function")
 def tezos_navigator(
@@ -0,0 +1,133 @@
+/* Tezos Ledger application - Host driver of the HWM journal
+
+   Copyright 2024 TriliTech <contact@trili.tech>
+   Copyright 2024 Functori <contact@functori.com>
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+*/
+
+/* Runs the HWM persistence of `src/globals.c` and `src/hwm_journal.c`
+   over a simulated NVRAM, kept across the simulated boots.
+
+   Reads one command per line on the standard input:
+     - `boot`: restores the RAM from the NVRAM and prints the HWMs,
+     - `sign <main|test> <level> <round>`: journals a signed HWM,
+     - `setup <main level> <test level>`: sets the HWMs as SETUP does,
+     - `reset <level>`: resets the HWMs as RESET does,
+     - `toggle`: toggles the HWM tracking,
+     - `tear <size>`: only writes the first `size` bytes of the next
+       NVRAM write, as a power loss would. */
+
+#include "globals.h"
+#include "hwm_journal.h"
+
+#include <inttypes.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <sys/mman.h>
+#include <unistd.h>
+
+/// Size of the next NVRAM write, negative if not torn
+static long tear_size = -1;
+
+void nvm_write(void *dst, void *src, unsigned int size) {
+    // The NVRAM objects are read-only constants on the host
+    uintptr_t const page_size = (uintptr_t) sysconf(_SC_PAGESIZE);
+    uintptr_t const start = ((uintptr_t) dst) & ~(page_size - 1u);
+    uintptr_t const end = ((uintptr_t) dst) + size;
+    if (mprotect((void *) start, end - start, PROT_READ | PROT_WRITE) != 0) {
+        perror("mprotect");
+        exit(EXIT_FAILURE);
+    }
+    if ((tear_size >= 0) && ((unsigned long) tear_size < size)) {
+        size = (unsigned int) tear_size;
+    }
+    tear_size = -1;
+    memcpy(dst, src, size);
+}
+
+int io_send_sw(uint16_t sw) {
+    (void) sw;
+    return 0;
+}
+
+/**
+ * @brief Prints the HWMs and the journal state of the RAM
+ *
+ */
+static void print_state(void) {
+    printf("main=%" PRIu32 ":%" PRIu32 " test=%" PRIu32 ":%" PRIu32 " disabled=%d sequence=%" PRIu32
+           " main_slot=%u test_slot=%u\n",
+           g_hwm.hwm.main.highest_level,
+           g_hwm.hwm.main.highest_round,
+           g_hwm.hwm.test.highest_level,
+           g_hwm.hwm.test.highest_round,
+           g_hwm.hwm_disabled ? 1 : 0,
+           global.hwm_journal.sequence,
+           global.hwm_journal.main_slot,
+           global.hwm_journal.test_slot);
+}
+
+/**
+ * @brief Resets a HWM to a level, as SETUP and RESET do
+ *
+ * @param hwm: HWM to reset
+ * @param level: new level
+ */
+static void reset_hwm(high_watermark_t *const hwm, level_t const level) {
+    hwm->highest_level = level;
+    hwm->highest_round = 0;
+    hwm->had_attestation = false;
+    hwm->had_preattestation = false;
+}
+
+int main(void) {
+    char line[128];
+    char chain[8];
+    unsigned long level;
+    unsigned long test_level;
+    unsigned long round;
+    long size;
+
+    init_globals();
+
+    while (fgets(line, sizeof(line), stdin) != NULL) {
+        if (strncmp(line, "boot", 4u) == 0) {
+            init_globals();
+            print_state();
+        } else if (sscanf(line, "sign %7s %lu %lu", chain, &level, &round) == 3) {
+            high_watermark_t *const hwm =
+                (strcmp(chain, "main") == 0) ? &g_hwm.hwm.main : &g_hwm.hwm.test;
+            hwm->highest_level = (level_t) level;
+            hwm->highest_round = (round_t) round;
+            write_hwm_journal(hwm);
+        } else if (sscanf(line, "setup %lu %lu", &level, &test_level) == 2) {
+            reset_hwm(&g_hwm.hwm.main, (level_t) level);
+            reset_hwm(&g_hwm.hwm.test, (level_t) test_level);
+            UPDATE_NVRAM;
+        } else if (sscanf(line, "reset %lu", &level) == 1) {
+            reset_hwm(&g_hwm.hwm.main, (level_t) level);
+            reset_hwm(&g_hwm.hwm.test, (level_t) level);
+            UPDATE_NVRAM;
+        } else if (strncmp(line, "toggle", 6u) == 0) {
+            toggle_hwm();
+        } else if (sscanf(line, "tear %ld", &size) == 1) {
+            tear_size = size;
+        } else {
+            fprintf(stderr, "Unknown command: %s", line);
+            return EXIT_FAILURE;
+        }
+    }
+    return EXIT_SUCCESS;
+}
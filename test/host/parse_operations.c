@@ -0,0 +1,225 @@
+/* Tezos Ledger application - Host driver of the operation parser
+
+   Copyright 2024 TriliTech <contact@trili.tech>
+   Copyright 2024 Functori <contact@functori.com>
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+*/
+
+/* Runs the parser of `src/operations.c` or, if `REFERENCE_PARSER` is
+   defined, the previous parser of `reference/operations.c`.
+
+   Usage: parse_operations [<chunk size> [<repetitions>]]
+
+   Reads one unsafe operation per line on the standard input:
+     `<signer key hash> <signer public key> <signature type> <operation>`
+   in hexadecimal, the key hash and the public key without their tag,
+   the signature type being the tag of the signer address and the
+   operation without its magic byte.
+
+   Prints, for each operation, the exception, whether the parsing
+   completed, the operation tag, the total fee, the total storage
+   limit, whether there is a reveal, and the signature type, the
+   origination and the hash of the destination.
+
+   The current parser receives the operation in chunks of `chunk size`
+   bytes, as the packets of a SIGN instruction, the whole operation by
+   default. The reference parser always receives the whole operation.
+
+   If `repetitions` is given, every operation is parsed `repetitions`
+   times and the parsing time is printed on the standard error as
+   `bytes=<parsed bytes> ns=<parsing time>`. */
+
+#ifdef REFERENCE_PARSER
+#include "globals.h"
+#endif
+#include "operations.h"
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <time.h>
+
+#define MAX_OPERATION_SIZE 4096u
+
+#ifdef REFERENCE_PARSER
+globals_t global;
+#endif
+
+/// Key hash of the signer
+static uint8_t signer_hash[KEY_HASH_SIZE];
+/// Public key of the signer
+static uint8_t signer_public_key[65];
+/// Size of the public key of the signer
+static size_t signer_public_key_size;
+
+cx_err_t generate_public_key_hash(uint8_t *const hash_out,
+                                  size_t const hash_out_size,
+                                  cx_ecfp_public_key_t *const compressed_out,
+                                  bip32_path_with_curve_t const *const path_with_curve) {
+    (void) path_with_curve;
+    if (hash_out_size < sizeof(signer_hash)) {
+        return CX_INVALID_PARAMETER;
+    }
+    memcpy(hash_out, signer_hash, sizeof(signer_hash));
+    compressed_out->W_len = signer_public_key_size;
+    memcpy(compressed_out->W, signer_public_key, signer_public_key_size);
+    return CX_OK;
+}
+
+int io_send_sw(uint16_t sw) {
+    (void) sw;
+    return 0;
+}
+
+/**
+ * @brief Decodes an hexadecimal string
+ *
+ * @param hex: null-terminated hexadecimal string
+ * @param out: output
+ * @param out_size: output size
+ * @return long: number of bytes decoded, -1 if invalid
+ */
+static long decode_hex(char const *hex, uint8_t *const out, size_t const out_size) {
+    size_t const size = strlen(hex) / 2u;
+    unsigned int byte;
+
+    if ((strlen(hex) % 2u != 0u) || (size > out_size)) {
+        return -1;
+    }
+    for (size_t i = 0u; i < size; i++) {
+        if (sscanf(&hex[2u * i], "%2x", &byte) != 1) {
+            return -1;
+        }
+        out[i] = (uint8_t) byte;
+    }
+    return (long) size;
+}
+
+/**
+ * @brief Parses an operation
+ *
+ * @param data: operation
+ * @param size: operation size
+ * @param chunk_size: size of the parts given to the parser
+ * @param path: signer path
+ * @param out: parsing output
+ * @param valid: output, whether the parsing completed
+ * @return tz_exc: exception, SW_OK if none
+ */
+static tz_exc parse(uint8_t const *const data,
+                    size_t const size,
+                    size_t const chunk_size,
+                    bip32_path_with_curve_t const *const path,
+                    struct parsed_operation_group *const out,
+                    bool *const valid) {
+    tz_exc exc;
+#ifdef REFERENCE_PARSER
+    (void) chunk_size;
+    buffer_t buf = {.ptr = data, .size = size, .offset = 0u};
+    exc = parse_operations(&buf, out, path);
+    *valid = parse_operations_final(&global.apdu.u.sign.parse_state, out);
+#else
+    struct parse_state state;
+    exc = parse_operations_init(out, path, &state);
+    for (size_t offset = 0u; (exc == SW_OK) && (offset < size); offset += chunk_size) {
+        buffer_t buf = {.ptr = data + offset,
+                        .size = CUSTOM_MIN(chunk_size, size - offset),
+                        .offset = 0u};
+        exc = parse_operations(&buf, &state, out);
+    }
+    *valid = parse_operations_final(&state, out);
+#endif
+    return exc;
+}
+
+int main(int argc, char *argv[]) {
+    static char line[2u * MAX_OPERATION_SIZE + 256u];
+    static char hash_hex[2u * KEY_HASH_SIZE + 1u];
+    static char public_key_hex[2u * sizeof(signer_public_key) + 1u];
+    static char operation_hex[2u * MAX_OPERATION_SIZE + 1u];
+    static uint8_t operation[MAX_OPERATION_SIZE];
+    unsigned int signature_type;
+    size_t chunk_size = (argc > 1) ? strtoul(argv[1], NULL, 10) : 0u;
+    unsigned long const repetitions = (argc > 2) ? strtoul(argv[2], NULL, 10) : 0u;
+    unsigned long long parsed_bytes = 0u;
+    unsigned long long parsing_time = 0u;
+
+    if (chunk_size == 0u) {
+        chunk_size = MAX_OPERATION_SIZE;
+    }
+
+    while (fgets(line, sizeof(line), stdin) != NULL) {
+        operation_hex[0] = '\0';
+        if (sscanf(line,
+                   "%40s %130s %u %8192s",
+                   hash_hex,
+                   public_key_hex,
+                   &signature_type,
+                   operation_hex) < 3) {
+            continue;
+        }
+        long const public_key_size =
+            decode_hex(public_key_hex, signer_public_key, sizeof(signer_public_key));
+        long const size = decode_hex(operation_hex, operation, sizeof(operation));
+        if ((decode_hex(hash_hex, signer_hash, sizeof(signer_hash)) != KEY_HASH_SIZE) ||
+            (public_key_size < 0) || (size < 0)) {
+            fprintf(stderr, "Invalid line: %s", line);
+            return EXIT_FAILURE;
+        }
+        signer_public_key_size = (size_t) public_key_size;
+
+        bip32_path_with_curve_t path;
+        memset(&path, 0, sizeof(path));
+        path.derivation_type = (signature_type == 0u)   ? DERIVATION_TYPE_ED25519
+                               : (signature_type == 1u) ? DERIVATION_TYPE_SECP256K1
+                                                        : DERIVATION_TYPE_SECP256R1;
+
+        struct parsed_operation_group out;
+        bool valid;
+        memset(&out, 0, sizeof(out));
+        tz_exc const exc = parse(operation, (size_t) size, chunk_size, &path, &out, &valid);
+
+        if (repetitions > 0u) {
+            struct timespec start;
+            struct timespec stop;
+            clock_gettime(CLOCK_MONOTONIC, &start);
+            for (unsigned long i = 0u; i < repetitions; i++) {
+                (void) parse(operation, (size_t) size, chunk_size, &path, &out, &valid);
+            }
+            clock_gettime(CLOCK_MONOTONIC, &stop);
+            parsing_time += (unsigned long long) (stop.tv_sec - start.tv_sec) * 1000000000u +
+                            (unsigned long long) stop.tv_nsec - (unsigned long long) start.tv_nsec;
+            parsed_bytes += (unsigned long long) size * repetitions;
+        }
+
+        printf("%04x %d %d %llu %llu %d %d %d ",
+               exc,
+               valid ? 1 : 0,
+               out.operation.tag,
+               (unsigned long long) out.total_fee,
+               (unsigned long long) out.total_storage_limit,
+               out.has_reveal ? 1 : 0,
+               out.operation.destination.signature_type,
+               out.operation.destination.originated);
+        for (size_t i = 0u; i < sizeof(out.operation.destination.hash); i++) {
+            printf("%02x", out.operation.destination.hash[i]);
+        }
+        printf("\n");
+    }
+
+    if (repetitions > 0u) {
+        fprintf(stderr, "bytes=%llu ns=%llu\n", parsed_bytes, parsing_time);
+    }
+    return EXIT_SUCCESS;
+}
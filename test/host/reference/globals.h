@@ -0,0 +1,37 @@
+/* Tezos Ledger application - Globals of the reference parser
+
+   Copyright 2024 TriliTech <contact@trili.tech>
+   Copyright 2024 Functori <contact@functori.com>
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+*/
+
+#pragma once
+
+/* Only holds the parser state of the reference parser, which
+   `src/globals.h` no longer declares. */
+
+#include "operations.h"
+
+typedef struct {
+    struct {
+        union {
+            struct {
+                struct parse_state parse_state;
+            } sign;
+        } u;
+    } apdu;
+} globals_t;
+
+extern globals_t global;
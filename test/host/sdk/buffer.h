@@ -0,0 +1,52 @@
+/* Tezos Ledger application - Host stub of the SDK header buffer.h
+
+   Copyright 2024 TriliTech <contact@trili.tech>
+   Copyright 2024 Functori <contact@functori.com>
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+*/
+
+#pragma once
+
+#include <stdbool.h>
+#include <stddef.h>
+#include <stdint.h>
+
+typedef struct {
+    const uint8_t *ptr;
+    size_t size;
+    size_t offset;
+} buffer_t;
+
+static inline bool buffer_can_read(const buffer_t *buffer, size_t n) {
+    return (buffer->size - buffer->offset) >= n;
+}
+
+static inline bool buffer_read_u8(buffer_t *buffer, uint8_t *value) {
+    if (!buffer_can_read(buffer, 1u)) {
+        *value = 0u;
+        return false;
+    }
+    *value = buffer->ptr[buffer->offset];
+    buffer->offset++;
+    return true;
+}
+
+static inline bool buffer_seek_cur(buffer_t *buffer, size_t offset) {
+    if (!buffer_can_read(buffer, offset)) {
+        return false;
+    }
+    buffer->offset += offset;
+    return true;
+}
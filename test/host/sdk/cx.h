@@ -0,0 +1,56 @@
+/* Tezos Ledger application - Host stub of the SDK header cx.h
+
+   Copyright 2024 TriliTech <contact@trili.tech>
+   Copyright 2024 Functori <contact@functori.com>
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+*/
+
+#pragma once
+
+#include <stddef.h>
+#include <stdint.h>
+
+typedef uint32_t cx_err_t;
+typedef int cx_curve_t;
+
+#define CX_OK                0x00000000u
+#define CX_INVALID_PARAMETER 0xFFFFFF84u
+#define CX_SHA256_SIZE       32u
+#define CX_SHA512_SIZE       64u
+#define BLAKE2B_BLOCKBYTES   128u
+
+#define CX_CHECK(call)        \
+    do {                      \
+        error = (call);       \
+        if (error != CX_OK) { \
+            goto end;         \
+        }                     \
+    } while (0)
+
+typedef struct {
+    cx_curve_t curve;
+    size_t W_len;
+    uint8_t W[65];
+} cx_ecfp_public_key_t;
+
+typedef struct {
+    cx_curve_t curve;
+    size_t d_len;
+    uint8_t d[32];
+} cx_ecfp_private_key_t;
+
+typedef struct {
+    uint8_t state[256];
+} cx_blake2b_t;
@@ -0,0 +1,30 @@
+/* Tezos Ledger application - Host stub of the SDK header io.h
+
+   Copyright 2024 TriliTech <contact@trili.tech>
+   Copyright 2024 Functori <contact@functori.com>
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+*/
+
+#pragma once
+
+#include <stdint.h>
+
+/**
+ * @brief Sends a status word, never called by the host programs
+ *
+ * @param sw: status word
+ * @return int: number of bytes sent
+ */
+int io_send_sw(uint16_t sw);
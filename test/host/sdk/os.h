@@ -0,0 +1,42 @@
+/* Tezos Ledger application - Host stub of the SDK header os.h
+
+   Copyright 2024 TriliTech <contact@trili.tech>
+   Copyright 2024 Functori <contact@functori.com>
+
+   Licensed under the Apache License, Version 2.0 (the "License");
+   you may not use this file except in compliance with the License.
+   You may obtain a copy of the License at
+
+       http://www.apache.org/licenses/LICENSE-2.0
+
+   Unless required by applicable law or agreed to in writing, software
+   distributed under the License is distributed on an "AS IS" BASIS,
+   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+   See the License for the specific language governing permissions and
+   limitations under the License.
+
+*/
+
+#pragma once
+
+#include <stdbool.h>
+#include <stddef.h>
+#include <stdint.h>
+#include <string.h>
+
+#include "cx.h"
+
+#define PRINTF(...) \
+    do {            \
+    } while (0)
+
+#define PIC(x) (x)
+
+/**
+ * @brief Writes in NVRAM, provided by the host programs
+ *
+ * @param dst: destination in NVRAM
+ * @param src: source in RAM
+ * @param size: number of bytes to write
+ */
+void nvm_write(void *dst, void *src, unsigned int size);
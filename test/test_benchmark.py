@@ -0,0 +1,921 @@
+# Copyright 2024 Functori <contact@functori.com>
+# Copyright 2024 Trilitech <contact@trili.tech>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module benchmarking the app. Only run with --benchmark.
+
+The results of a run are written in benchmarks/benchmark.json and
+stored in the benchmark history, see utils/benchmark_history.py.
+"""
+
+import subprocess
+import sys
+from typing import Dict, Generator, Iterator, List
+
+import pytest
+
+from ragger.backend import BackendInterface
+from ragger.error import ExceptionRAPDU
+from ragger.firmware import Firmware
+from utils.account import Account
+from utils.backend import TezosSpeculosBackend
+from utils.benchmark import BENCHMARKS_DIR, BenchmarkRecorder, LatencyStats, measure
+from utils.benchmark_history import BenchmarkHistory
+from utils.client import TezosClient, Hwm, Ins, SignPhase, StatusCode, MAX_APDU_SIZE
+from utils.helper import LazyImport, get_current_commit
+from utils.host import (
+    MAX_HOST_OPERATION_SIZE,
+    build_host_program,
+    time_parse_operations_on_host
+)
+from utils.latency import LatencyProfiler, phase, profiling
+from utils.message import (
+    Message,
+    Preattestation,
+    Attestation,
+    AttestationDal,
+    Fitness,
+    BlockHeader,
+    Block,
+    Delegation,
+    Reveal,
+    UnsafeOp,
+    DEFAULT_BLOCK_HASH,
+    DEFAULT_CHAIN_ID
+)
+from utils.navigator import TezosNavigator
+from utils.ram_usage import read_static_ram
+from utils.unsafe_op_model import SigningKey, generate_corpus
+from common import DEFAULT_ACCOUNT, DEFAULT_ACCOUNT_2, ZEBRA_ACCOUNTS, TESTS_ROOT_DIR
+
+pytezos = LazyImport("pytezos", "pytezos")
+
+APDU_LATENCY_ITERATIONS = 100
+APDU_LATENCY_WARMUP = 5
+
+STARTUP_ITERATIONS = 10
+STARTUP_WARMUP = 1
+
+SIGNING_ITERATIONS = 100
+SIGNING_WARMUP = 10
+
+FORGE_ITERATIONS = 200
+FORGE_WARMUP = 10
+
+HOST_PARSING_RUNS = 10
+HOST_PARSING_REPETITIONS = 20
+HOST_PARSING_CORPUS_SEED = 0
+HOST_PARSING_CORPUS_SIZE = 1000
+
+# Delegations are benchmarked with their approval navigation
+SIGNING_KINDS = [
+    "preattestation",
+    "attestation",
+    "attestation_dal",
+    "block",
+    "reveal",
+    "delegation",
+]
+
+@pytest.fixture(scope="module")
+def recorder() -> Generator[BenchmarkRecorder, None, None]:
+    """Get the recorder of the benchmark run."""
+    benchmark_recorder = BenchmarkRecorder("benchmark")
+    yield benchmark_recorder
+    if benchmark_recorder.results:
+        path = benchmark_recorder.write()
+        history = BenchmarkHistory()
+        history.add_run(benchmark_recorder)
+        print(f"Benchmark results written in {path} and {history.path}")
+
+def app_tags(client: TezosClient) -> Dict[str, str]:
+    """Tags identifying the benchmarked app."""
+    version = client.version()
+    return {
+        "app_version": f"{version.major}.{version.minor}.{version.patch}",
+        "app_commit": client.git(),
+    }
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("step, arguments", [
+    ("import", ["-c", "import common, utils.client, utils.message, utils.navigator"]),
+    ("collection", [
+        "-m", "pytest", "test_instructions.py",
+        "--collect-only", "-q", "-p", "no:cacheprovider", "-k", "test_version"
+    ]),
+])
+def test_benchmark_startup(step: str,
+                           arguments: List[str],
+                           recorder: BenchmarkRecorder) -> None:
+    """Benchmark the import of the test helpers and the collection of the tests.
+
+    Each measure runs a fresh interpreter.
+    """
+
+    def run() -> None:
+        subprocess.run(
+            [sys.executable, *arguments],
+            cwd=TESTS_ROOT_DIR,
+            stdout=subprocess.DEVNULL,
+            check=True
+        )
+
+    recorder.record(
+        f"startup/{step}",
+        measure(run, STARTUP_ITERATIONS, STARTUP_WARMUP),
+        step=step,
+        app_commit=get_current_commit()
+    )
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("forger", ["native", "pytezos"])
+@pytest.mark.parametrize("size", [1, 3, 30])
+def test_benchmark_forge_operation_group(forger: str,
+                                         size: int,
+                                         recorder: BenchmarkRecorder) -> None:
+    """Benchmark the forging of unsafe operation groups of `size` contents.
+
+    The groups alternate reveals and delegations, as in
+    `test_sign_multiple_operation`. `pytezos` builds and merges the
+    groups with pytezos, as done before the native forging.
+    """
+
+    account = DEFAULT_ACCOUNT
+
+    if forger == "native":
+        def forge_group() -> None:
+            operation = UnsafeOp([])
+            for index in range(size):
+                if index % 2 == 0:
+                    content: UnsafeOp = Reveal(
+                        public_key=account.public_key,
+                        source=account.public_key_hash
+                    )
+                else:
+                    content = Delegation(
+                        delegate=account.public_key_hash,
+                        source=account.public_key_hash
+                    )
+                operation = operation.merge(content)
+            operation.forge()
+    else:
+        def forge_group() -> None:
+            ctxt = pytezos.using()
+            group = ctxt.reveal(account.public_key, account.public_key_hash)
+            for index in range(1, size):
+                if index % 2 == 0:
+                    content = ctxt.reveal(account.public_key, account.public_key_hash)
+                else:
+                    content = ctxt.delegation(account.public_key_hash, account.public_key_hash)
+                for operation_content in content.contents:
+                    group = group.operation(operation_content)
+            group.branch = DEFAULT_BLOCK_HASH
+            group.forge()
+
+    recorder.record(
+        f"forge/{forger}/{size}",
+        measure(forge_group, FORGE_ITERATIONS, FORGE_WARMUP),
+        forger=forger,
+        size=size,
+        app_commit=get_current_commit()
+    )
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("parser", ["parse_operations", "parse_operations_reference"])
+def test_benchmark_host_unsafe_op_parsing(parser: str, recorder: BenchmarkRecorder) -> None:
+    """Benchmark the parsing of unsafe operations on the host.
+
+    `parse_operations_reference` is the parser replaced by the
+    table-driven one. Both parse a corpus of valid operations and of
+    their mutations, as `test_parse_operations_like_reference_parser`
+    does. A sample is the parsing time of the whole corpus,
+    out of the process startup; the time per byte is recorded as the
+    `ns_per_byte` tag.
+    """
+    program = build_host_program(parser)
+
+    account = DEFAULT_ACCOUNT
+    key = SigningKey(account.public_key_hash, account.public_key)
+    corpus = list(generate_corpus(
+        HOST_PARSING_CORPUS_SEED,
+        account.public_key_hash,
+        account.public_key,
+        DEFAULT_ACCOUNT_2.public_key_hash,
+        HOST_PARSING_CORPUS_SIZE,
+        MAX_HOST_OPERATION_SIZE
+    ))
+
+    samples = []
+    parsed_bytes = 0
+    for _ in range(HOST_PARSING_RUNS):
+        parsed_bytes, duration = time_parse_operations_on_host(
+            program, key, corpus, HOST_PARSING_REPETITIONS
+        )
+        samples.append(duration / HOST_PARSING_REPETITIONS)
+    stats = LatencyStats(samples)
+
+    recorder.record(
+        f"host_unsafe_op_parsing/{parser}",
+        stats,
+        parser=parser,
+        ns_per_byte=stats.mean * 1e9 * HOST_PARSING_REPETITIONS / parsed_bytes,
+        app_commit=get_current_commit()
+    )
+
+def benchmark_apdu_latency(firmware: Firmware,
+                           backend: BackendInterface,
+                           client: TezosClient,
+                           recorder: BenchmarkRecorder,
+                           mode: str) -> None:
+    """Measure the latency of APDUs not involving the screen."""
+
+    account = DEFAULT_ACCOUNT
+    tags = app_tags(client)
+
+    startup_time = None
+    if isinstance(backend, TezosSpeculosBackend):
+        startup_time = backend.startup_time
+
+    recorder.record(
+        f"apdu_latency/{firmware.name}/{mode}/version",
+        measure(
+            client.version,
+            APDU_LATENCY_ITERATIONS,
+            APDU_LATENCY_WARMUP
+        ),
+        firmware=firmware.name,
+        mode=mode,
+        startup_time=startup_time,
+        **tags
+    )
+    recorder.record(
+        f"apdu_latency/{firmware.name}/{mode}/get_public_key_silent",
+        measure(
+            lambda: client.get_public_key_silent(account),
+            APDU_LATENCY_ITERATIONS,
+            APDU_LATENCY_WARMUP
+        ),
+        firmware=firmware.name,
+        mode=mode,
+        startup_time=startup_time,
+        **tags
+    )
+
+@pytest.mark.benchmark
+@pytest.mark.use_on_backend("speculos")
+def test_benchmark_apdu_latency_display(
+        firmware: Firmware,
+        backend: BackendInterface,
+        client: TezosClient,
+        recorder: BenchmarkRecorder) -> None:
+    """Benchmark the APDU latency on speculos."""
+    benchmark_apdu_latency(firmware, backend, client, recorder, "display")
+
+@pytest.mark.benchmark
+@pytest.mark.headless
+@pytest.mark.use_on_backend("speculos")
+def test_benchmark_apdu_latency_headless(
+        firmware: Firmware,
+        backend: BackendInterface,
+        client: TezosClient,
+        recorder: BenchmarkRecorder) -> None:
+    """Benchmark the APDU latency on a headless speculos."""
+    benchmark_apdu_latency(firmware, backend, client, recorder, "headless")
+
+def build_signing_message(kind: str, account: Account, level: int) -> Message:
+    """Build a message of kind `kind`, baking messages being at `level`.
+
+    Only baking messages and reveals can be built.
+    """
+    if kind == "preattestation":
+        return Preattestation(op_level=level, op_round=0).forge(chain_id=DEFAULT_CHAIN_ID)
+    if kind == "attestation":
+        return Attestation(op_level=level, op_round=0).forge(chain_id=DEFAULT_CHAIN_ID)
+    if kind == "attestation_dal":
+        return AttestationDal(op_level=level, op_round=0).forge(chain_id=DEFAULT_CHAIN_ID)
+    if kind == "block":
+        return Block(
+            header=BlockHeader(
+                level=level,
+                fitness=Fitness(current_round=0)
+            )
+        ).forge(chain_id=DEFAULT_CHAIN_ID)
+    if kind == "reveal":
+        return Reveal(
+            public_key=account.public_key,
+            source=account.public_key_hash
+        ).forge()
+    raise ValueError(f"Unknown signing kind {kind}")
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("account", ZEBRA_ACCOUNTS, ids=lambda account: account.sig_scheme.name)
+@pytest.mark.parametrize("kind", SIGNING_KINDS)
+def test_benchmark_signing(
+        kind: str,
+        account: Account,
+        firmware: Firmware,
+        backend_name: str,
+        client: TezosClient,
+        tezos_navigator: TezosNavigator,
+        recorder: BenchmarkRecorder) -> None:
+    """Benchmark the latency of the SIGN instruction.
+
+    The messages are forged before the measurements, each request
+    only sends one message and waits for its signature.
+    """
+
+    if kind == "delegation" and backend_name != "speculos":
+        pytest.skip("Delegations need to be approved manually on devices")
+
+    tezos_navigator.setup_app_context(
+        account,
+        DEFAULT_CHAIN_ID,
+        main_hwm=Hwm(0, 0),
+        test_hwm=Hwm(0, 0)
+    )
+
+    tags = app_tags(client)
+
+    if kind == "delegation":
+        delegation = Delegation(
+            delegate=account.public_key_hash,
+            source=account.public_key_hash
+        )
+
+        def sign() -> None:
+            tezos_navigator.sign_delegation(account, delegation)
+    else:
+        # Levels must increase for the high watermark to accept the messages
+        messages: Iterator[Message] = iter([
+            build_signing_message(kind, account, level)
+            for level in range(1, SIGNING_WARMUP + SIGNING_ITERATIONS + 1)
+        ])
+
+        def sign() -> None:
+            client.sign_message(account, next(messages))
+
+    recorder.record(
+        f"signing/{firmware.name}/{backend_name}/{kind}/{account.sig_scheme.name}",
+        measure(sign, SIGNING_ITERATIONS, SIGNING_WARMUP),
+        firmware=firmware.name,
+        backend=backend_name,
+        kind=kind,
+        sig_scheme=account.sig_scheme.name,
+        **tags
+    )
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("account", ZEBRA_ACCOUNTS, ids=lambda account: account.sig_scheme.name)
+@pytest.mark.parametrize("reveals", [1, 2, 3])
+def test_benchmark_unsafe_op_parsing(
+        reveals: int,
+        account: Account,
+        firmware: Firmware,
+        backend_name: str,
+        client: TezosClient,
+        tezos_navigator: TezosNavigator,
+        recorder: BenchmarkRecorder) -> None:
+    """Benchmark the latency of the SIGN requests of groups of reveals.
+
+    The parsing time of the unsafe operations grows with the number of
+    reveals, up to the three reveals fitting in an APDU.
+    """
+
+    tezos_navigator.setup_app_context(
+        account,
+        DEFAULT_CHAIN_ID,
+        main_hwm=Hwm(0, 0),
+        test_hwm=Hwm(0, 0)
+    )
+
+    tags = app_tags(client)
+
+    reveal = Reveal(public_key=account.public_key, source=account.public_key_hash)
+    operation: UnsafeOp = reveal
+    for _ in range(reveals - 1):
+        operation = operation.merge(reveal)
+    message = operation.forge()
+
+    def sign() -> None:
+        client.sign_message(account, message)
+
+    recorder.record(
+        f"unsafe_op_parsing/{firmware.name}/{backend_name}/{reveals}/{account.sig_scheme.name}",
+        measure(sign, SIGNING_ITERATIONS, SIGNING_WARMUP),
+        firmware=firmware.name,
+        backend=backend_name,
+        reveals=reveals,
+        sig_scheme=account.sig_scheme.name,
+        **tags
+    )
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("reveals", [3, 12, 48])
+def test_benchmark_unsafe_op_streaming(
+        reveals: int,
+        firmware: Firmware,
+        backend_name: str,
+        client: TezosClient,
+        tezos_navigator: TezosNavigator,
+        recorder: BenchmarkRecorder) -> None:
+    """Benchmark the latency per byte of the groups of reveals sent in several APDUs.
+
+    The unsafe operations are parsed and hashed packet by packet, so
+    the latency per byte must not depend on the size of the group.
+    """
+
+    account = DEFAULT_ACCOUNT
+    tezos_navigator.setup_app_context(
+        account,
+        DEFAULT_CHAIN_ID,
+        main_hwm=Hwm(0, 0),
+        test_hwm=Hwm(0, 0)
+    )
+
+    tags = app_tags(client)
+
+    reveal = Reveal(public_key=account.public_key, source=account.public_key_hash)
+    operation: UnsafeOp = reveal
+    for _ in range(reveals - 1):
+        operation = operation.merge(reveal)
+    message = operation.forge()
+    size = len(bytes(message))
+    packets = -(-size // MAX_APDU_SIZE)
+
+    def sign() -> None:
+        client.sign_message(account, message)
+
+    stats = measure(sign, SIGNING_ITERATIONS, SIGNING_WARMUP)
+    for unit, unit_stats in [
+            ("request", stats),
+            ("byte", LatencyStats([sample / size for sample in stats.samples]))
+    ]:
+        recorder.record(
+            f"unsafe_op_streaming/{firmware.name}/{backend_name}/{reveals}/{unit}",
+            unit_stats,
+            firmware=firmware.name,
+            backend=backend_name,
+            reveals=reveals,
+            size=size,
+            packets=packets,
+            unit=unit,
+            **tags
+        )
+
+BAKING_KINDS = ["preattestation", "attestation", "attestation_dal", "block"]
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("kind", BAKING_KINDS)
+def test_benchmark_stale_rejection(
+        kind: str,
+        firmware: Firmware,
+        backend_name: str,
+        client: TezosClient,
+        tezos_navigator: TezosNavigator,
+        recorder: BenchmarkRecorder) -> None:
+    """Benchmark the latency of the SIGN requests rejected by the high watermark.
+
+    The messages are below the high watermark, as the retries of
+    stale consensus operations. The latency of the accepted
+    signatures is recorded alongside as a reference, and the
+    rejection latency of other commits is compared with the history.
+    """
+
+    account = DEFAULT_ACCOUNT
+    stale_level = 1
+    hwm_level = stale_level + 1
+    tezos_navigator.setup_app_context(
+        account,
+        DEFAULT_CHAIN_ID,
+        main_hwm=Hwm(hwm_level, 0),
+        test_hwm=Hwm(0, 0)
+    )
+
+    tags = app_tags(client)
+    stale_message = build_signing_message(kind, account, stale_level)
+
+    def sign_stale() -> None:
+        with StatusCode.WRONG_VALUES.expected():
+            client.sign_message(account, stale_message)
+
+    recorder.record(
+        f"stale_rejection/{firmware.name}/{backend_name}/{kind}/rejected",
+        measure(sign_stale, SIGNING_ITERATIONS, SIGNING_WARMUP),
+        firmware=firmware.name,
+        backend=backend_name,
+        kind=kind,
+        outcome="rejected",
+        **tags
+    )
+
+    # Levels must increase for the high watermark to accept the messages
+    messages: Iterator[Message] = iter([
+        build_signing_message(kind, account, level)
+        for level in range(hwm_level + 1, hwm_level + SIGNING_WARMUP + SIGNING_ITERATIONS + 1)
+    ])
+
+    def sign() -> None:
+        client.sign_message(account, next(messages))
+
+    recorder.record(
+        f"stale_rejection/{firmware.name}/{backend_name}/{kind}/signed",
+        measure(sign, SIGNING_ITERATIONS, SIGNING_WARMUP),
+        firmware=firmware.name,
+        backend=backend_name,
+        kind=kind,
+        outcome="signed",
+        **tags
+    )
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("kind", BAKING_KINDS)
+def test_benchmark_idle_screen_refresh(
+        kind: str,
+        firmware: Firmware,
+        backend_name: str,
+        client: TezosClient,
+        tezos_navigator: TezosNavigator,
+        recorder: BenchmarkRecorder) -> None:
+    """Benchmark the latency removed from the consensus signatures by the deferred HWM refresh.
+
+    The HWM of the idle screens is only recomputed when its screen is
+    next displayed, no longer once the signature is sent. Each SIGN
+    request is followed by a VERSION request, so that the work left
+    after the signature is counted. On the BAGL devices, the baseline
+    refreshes the HWM screen after each signature, as the eager update
+    did, the redraw of the screen included: the difference of the mean
+    latencies, recorded as the `removed_latency` tag, is the latency
+    removed per signature. The NBGL devices only format the HWM with
+    the home screen, so only the signatures are recorded.
+    """
+
+    account = DEFAULT_ACCOUNT
+    tezos_navigator.setup_app_context(
+        account,
+        DEFAULT_CHAIN_ID,
+        main_hwm=Hwm(0, 0),
+        test_hwm=Hwm(0, 0)
+    )
+
+    tags = app_tags(client)
+
+    # Levels must increase for the high watermark to accept the messages
+    messages: Iterator[Message] = iter([
+        build_signing_message(kind, account, level)
+        for level in range(1, 2 * (SIGNING_WARMUP + SIGNING_ITERATIONS) + 1)
+    ])
+
+    def sign() -> None:
+        client.sign_message(account, next(messages))
+        client.version()
+
+    deferred = measure(sign, SIGNING_ITERATIONS, SIGNING_WARMUP)
+
+    if not firmware.is_nano:
+        recorder.record(
+            f"idle_screen_refresh/{firmware.name}/{backend_name}/{kind}/deferred",
+            deferred,
+            firmware=firmware.name,
+            backend=backend_name,
+            kind=kind,
+            refresh="deferred",
+            **tags
+        )
+        return
+
+    def sign_and_refresh() -> None:
+        client.sign_message(account, next(messages))
+        # Refresh the HWM screen, outdated by the signature
+        tezos_navigator.press_both_buttons()
+
+    with tezos_navigator.goto_home_hwm():
+        eager = measure(sign_and_refresh, SIGNING_ITERATIONS, SIGNING_WARMUP)
+
+    recorder.record(
+        f"idle_screen_refresh/{firmware.name}/{backend_name}/{kind}/eager",
+        eager,
+        firmware=firmware.name,
+        backend=backend_name,
+        kind=kind,
+        refresh="eager",
+        **tags
+    )
+    recorder.record(
+        f"idle_screen_refresh/{firmware.name}/{backend_name}/{kind}/deferred",
+        deferred,
+        firmware=firmware.name,
+        backend=backend_name,
+        kind=kind,
+        refresh="deferred",
+        removed_latency=eager.mean - deferred.mean,
+        **tags
+    )
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("kind", [kind for kind in SIGNING_KINDS if kind != "delegation"])
+def test_benchmark_signing_phases(
+        kind: str,
+        firmware: Firmware,
+        backend_name: str,
+        client: TezosClient,
+        tezos_navigator: TezosNavigator,
+        recorder: BenchmarkRecorder) -> None:
+    """Decompose the latency of the SIGN requests into phases.
+
+    Each request forges its message then signs it. The histograms of
+    the phases are printed and the stacks of the run are written in
+    the folded format in benchmarks/signing_<firmware>_<backend>_<kind>.folded.
+    """
+
+    account = DEFAULT_ACCOUNT
+    tezos_navigator.setup_app_context(
+        account,
+        DEFAULT_CHAIN_ID,
+        main_hwm=Hwm(0, 0),
+        test_hwm=Hwm(0, 0)
+    )
+
+    tags = app_tags(client)
+    request_phase = f"sign_{kind}"
+
+    def sign(level: int) -> None:
+        with phase(request_phase):
+            client.sign_message(account, build_signing_message(kind, account, level))
+
+    for level in range(1, SIGNING_WARMUP + 1):
+        sign(level)
+
+    profiler = LatencyProfiler()
+    with profiling(profiler):
+        for level in range(SIGNING_WARMUP + 1, SIGNING_WARMUP + SIGNING_ITERATIONS + 1):
+            sign(level)
+
+    print(profiler.report())
+    folded_path = BENCHMARKS_DIR / f"signing_{firmware.name}_{backend_name}_{kind}.folded"
+    profiler.write_folded(folded_path)
+    print(f"Folded stacks written in {folded_path}")
+
+    for name in [request_phase, "forge", "transport", "device"]:
+        recorder.record(
+            f"signing_phases/{firmware.name}/{backend_name}/{kind}/{name}",
+            LatencyStats(profiler.phase_durations(name)),
+            firmware=firmware.name,
+            backend=backend_name,
+            kind=kind,
+            phase=name,
+            **tags
+        )
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("account", ZEBRA_ACCOUNTS, ids=lambda account: account.sig_scheme.name)
+@pytest.mark.parametrize("kind", BAKING_KINDS)
+def test_benchmark_device_sign_phases(
+        kind: str,
+        account: Account,
+        firmware: Firmware,
+        backend_name: str,
+        client: TezosClient,
+        tezos_navigator: TezosNavigator,
+        recorder: BenchmarkRecorder) -> None:
+    """Decompose the device time of the SIGN requests into phases.
+
+    The apps cannot read a timer or a cycle counter, so the phases are
+    timed from the host: the app, which must be built with
+    `DEBUG_STATS=1`, stops the SIGN requests after a given phase, and
+    the duration of a phase is the latency difference between the
+    requests stopped after it and after the previous phase. Each SIGN
+    request is followed by a VERSION request, so that the idle screen
+    update, done once the signature is sent, is counted.
+    """
+
+    try:
+        client.sign_phases()
+    except ExceptionRAPDU as e:
+        if e.status == StatusCode.INVALID_INS:
+            pytest.skip("The app must be built with DEBUG_STATS=1")
+        raise
+
+    tezos_navigator.setup_app_context(
+        account,
+        DEFAULT_CHAIN_ID,
+        main_hwm=Hwm(0, 0),
+        test_hwm=Hwm(0, 0)
+    )
+
+    tags = app_tags(client)
+    phases = [sign_phase for sign_phase in SignPhase if sign_phase != SignPhase.NONE]
+
+    # Levels must increase for the high watermark to accept the messages
+    messages: Iterator[Message] = iter([
+        build_signing_message(kind, account, level)
+        for level in range(1, len(phases) * (SIGNING_WARMUP + SIGNING_ITERATIONS) + 1)
+    ])
+
+    def sign() -> None:
+        client.sign_message_raw(account, next(messages))
+        client.version()
+
+    previous_mean = 0.0
+    try:
+        for sign_phase in phases:
+            client.sign_phases(stop_phase=sign_phase)
+            stats = measure(sign, SIGNING_ITERATIONS, SIGNING_WARMUP)
+            last_phase = client.sign_phases(stop_phase=sign_phase)
+            # Only the BAGL devices update the idle screen after signing
+            if sign_phase != SignPhase.UI or firmware.is_nano:
+                assert last_phase == sign_phase, \
+                    f"Expected the SIGN to stop after {sign_phase.name}"
+
+            recorder.record(
+                f"device_sign_phases/{firmware.name}/{backend_name}/{kind}/"
+                f"{account.sig_scheme.name}/{sign_phase.name}",
+                stats,
+                firmware=firmware.name,
+                backend=backend_name,
+                kind=kind,
+                sig_scheme=account.sig_scheme.name,
+                phase=sign_phase.name,
+                phase_duration=max(0.0, stats.mean - previous_mean),
+                **tags
+            )
+            previous_mean = stats.mean
+    finally:
+        client.sign_phases(stop_phase=SignPhase.NONE)
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("kind", [kind for kind in SIGNING_KINDS if kind != "delegation"])
+def test_benchmark_nvram_writes(
+        kind: str,
+        firmware: Firmware,
+        backend_name: str,
+        client: TezosClient,
+        tezos_navigator: TezosNavigator,
+        recorder: BenchmarkRecorder) -> None:
+    """Benchmark the NVRAM writes of the SIGN instruction.
+
+    The writes are counted by the app, which must be built with
+    `DEBUG_STATS=1`. The latency is recorded alongside, tagged with
+    the writes and bytes written per signature.
+
+    The baking signatures are measured again with the HWM tracking
+    disabled, which skips their HWM journal write: the latency
+    difference is recorded as the `journal_latency` tag.
+    """
+
+    try:
+        client.nvram_stats(reset=True)
+    except ExceptionRAPDU as e:
+        if e.status == StatusCode.INVALID_INS:
+            pytest.skip("The app must be built with DEBUG_STATS=1")
+        raise
+
+    account = DEFAULT_ACCOUNT
+    tezos_navigator.setup_app_context(
+        account,
+        DEFAULT_CHAIN_ID,
+        main_hwm=Hwm(0, 0),
+        test_hwm=Hwm(0, 0)
+    )
+
+    tags = app_tags(client)
+
+    # Levels must increase for the high watermark to accept the messages
+    messages: Iterator[Message] = iter([
+        build_signing_message(kind, account, level)
+        for level in range(1, SIGNING_WARMUP + 2 * SIGNING_ITERATIONS + 1)
+    ])
+
+    def sign() -> None:
+        client.sign_message(account, next(messages))
+
+    for _ in range(SIGNING_WARMUP):
+        sign()
+    client.nvram_stats(reset=True)
+
+    stats = measure(sign, SIGNING_ITERATIONS, warmup=0)
+    nvram_stats = client.nvram_stats().get(Ins.SIGN)
+    writes = nvram_stats.writes if nvram_stats is not None else 0
+    bytes_written = nvram_stats.bytes if nvram_stats is not None else 0
+
+    journal_tags: Dict[str, float] = {}
+    if kind in BAKING_KINDS:
+        tezos_navigator.disable_hwm()
+        try:
+            disabled = measure(sign, SIGNING_ITERATIONS, warmup=0)
+        finally:
+            tezos_navigator.enable_hwm()
+        recorder.record(
+            f"nvram_writes/{firmware.name}/{backend_name}/{kind}/hwm_disabled",
+            disabled,
+            firmware=firmware.name,
+            backend=backend_name,
+            kind=kind,
+            hwm="disabled",
+            **tags
+        )
+        journal_tags["journal_latency"] = stats.mean - disabled.mean
+
+    recorder.record(
+        f"nvram_writes/{firmware.name}/{backend_name}/{kind}",
+        stats,
+        firmware=firmware.name,
+        backend=backend_name,
+        kind=kind,
+        writes_per_signature=writes / SIGNING_ITERATIONS,
+        bytes_per_signature=bytes_written / SIGNING_ITERATIONS,
+        **journal_tags,
+        **tags
+    )
+
+RAM_USAGE_REQUESTS = ["version", "query_all_hwm", "get_public_key", "hmac"] + \
+    [kind for kind in SIGNING_KINDS if kind != "delegation"]
+
+@pytest.mark.benchmark
+@pytest.mark.parametrize("request_kind", RAM_USAGE_REQUESTS)
+def test_benchmark_ram_usage(
+        request_kind: str,
+        firmware: Firmware,
+        backend_name: str,
+        backend: BackendInterface,
+        client: TezosClient,
+        tezos_navigator: TezosNavigator,
+        recorder: BenchmarkRecorder) -> None:
+    """Benchmark the RAM used by the instructions.
+
+    The peak stack usage is measured by the app, which must be built
+    with `DEBUG_STATS=1`. On speculos, the static RAM is read in the
+    ELF of the app. The latency is recorded alongside, tagged with the
+    memory used, so that the memory regressions are flagged by the
+    comparison of the benchmark history.
+    """
+
+    try:
+        client.stack_stats(reset=True)
+    except ExceptionRAPDU as e:
+        if e.status == StatusCode.INVALID_INS:
+            pytest.skip("The app must be built with DEBUG_STATS=1")
+        raise
+
+    account = DEFAULT_ACCOUNT
+    tezos_navigator.setup_app_context(
+        account,
+        DEFAULT_CHAIN_ID,
+        main_hwm=Hwm(0, 0),
+        test_hwm=Hwm(0, 0)
+    )
+
+    tags = app_tags(client)
+
+    if request_kind in SIGNING_KINDS:
+        ins = Ins.SIGN
+        # Levels must increase for the high watermark to accept the messages
+        messages: Iterator[Message] = iter([
+            build_signing_message(request_kind, account, level)
+            for level in range(1, SIGNING_WARMUP + SIGNING_ITERATIONS + 1)
+        ])
+
+        def request() -> None:
+            client.sign_message(account, next(messages))
+    else:
+        ins, request = {
+            "version": (Ins.VERSION, client.version),
+            "query_all_hwm": (Ins.QUERY_ALL_HWM, client.get_all_hwm),
+            "get_public_key": (Ins.GET_PUBLIC_KEY,
+                               lambda: client.get_public_key_silent(account)),
+            "hmac": (Ins.HMAC, lambda: client.hmac(account, bytes(32))),
+        }[request_kind]
+
+    client.stack_stats(reset=True)
+    stats = measure(request, SIGNING_ITERATIONS, SIGNING_WARMUP)
+    # The stack usage of the last request is recorded when the query starts
+    stack_stats = client.stack_stats()
+
+    memory_tags = {
+        "stack_size": stack_stats.size,
+        "stack_peak": stack_stats.peaks.get(ins, 0),
+    }
+    if isinstance(backend, TezosSpeculosBackend):
+        static_ram = read_static_ram(backend.application_path)
+        memory_tags["static_ram"] = static_ram.total
+        memory_tags["globals_size"] = static_ram.globals_size
+
+    recorder.record(
+        f"ram_usage/{firmware.name}/{backend_name}/{request_kind}",
+        stats,
+        firmware=firmware.name,
+        backend=backend_name,
+        request=request_kind,
+        **memory_tags,
+        **tags
+    )
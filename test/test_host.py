@@ -0,0 +1,171 @@
+# Copyright 2024 Functori <contact@functori.com>
+# Copyright 2024 Trilitech <contact@trili.tech>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Check the application sources run on the host, without device."""
+
+from pathlib import Path
+
+import pytest
+
+from utils.account import Account
+from utils.host import (
+    MAX_HOST_OPERATION_SIZE,
+    build_host_program,
+    parse_operations_on_host,
+    run_hwm_journal
+)
+from utils.message import OperationTag
+from utils.unsafe_op_model import SigningKey, generate_corpus, parse_unsafe_op
+from common import ACCOUNTS, DEFAULT_ACCOUNT_2
+
+# Mirrors `HWM_JOURNAL_SLOTS` of `src/types.h`
+HWM_JOURNAL_SLOTS = 8
+
+@pytest.fixture(scope="module")
+def hwm_journal() -> Path:
+    """Build the HWM journal host program."""
+    return build_host_program("hwm_journal")
+
+def test_hwm_journal_restores_newest_entry(hwm_journal: Path) -> None:
+    """Check that the boot restores the newest entry of each journal."""
+    [state] = run_hwm_journal(hwm_journal, [
+        "sign main 10 0",
+        "sign main 10 1",
+        "sign test 3 0",
+        "boot",
+    ])
+    assert state["main"] == "10:1"
+    assert state["test"] == "3:0"
+    assert state["sequence"] == "3"
+
+def test_hwm_journal_wraps_to_next_slot(hwm_journal: Path) -> None:
+    """Check that the newest entry wins over the older ones of the next slots."""
+    signatures = HWM_JOURNAL_SLOTS + 3
+    [state] = run_hwm_journal(
+        hwm_journal,
+        [f"sign main {level} 0" for level in range(1, signatures + 1)] + ["boot"]
+    )
+    assert state["main"] == f"{signatures}:0"
+    assert state["main_slot"] == str(signatures % HWM_JOURNAL_SLOTS)
+    assert state["sequence"] == str(signatures)
+
+def test_hwm_journal_ignores_torn_entry(hwm_journal: Path) -> None:
+    """Check that an entry torn by a power loss is ignored at boot."""
+    [state] = run_hwm_journal(hwm_journal, [
+        "sign main 10 0",
+        "tear 8",
+        "sign main 11 0",
+        "boot",
+    ])
+    assert state["main"] == "10:0"
+
+def test_hwm_journal_keeps_newest_entry_across_boots(hwm_journal: Path) -> None:
+    """Check that the entries written after a boot never overwrite the newest one."""
+    states = run_hwm_journal(hwm_journal, [
+        "sign main 10 0",
+        "boot",
+        "tear 8",
+        "sign main 11 0",
+        "boot",
+    ])
+    assert [state["main"] for state in states] == ["10:0", "10:0"]
+
+def test_hwm_journal_ignores_entries_below_base(hwm_journal: Path) -> None:
+    """Check that SETUP supersedes the older entries, even if higher."""
+    states = run_hwm_journal(hwm_journal, [
+        "sign main 100 0",
+        "sign test 50 0",
+        "setup 5 6",
+        "boot",
+        "sign main 7 0",
+        "boot",
+    ])
+    assert [(state["main"], state["test"]) for state in states] == \
+        [("5:0", "6:0"), ("7:0", "6:0")]
+
+def test_hwm_journal_superseded_by_reset(hwm_journal: Path) -> None:
+    """Check that RESET supersedes the older entries."""
+    [state] = run_hwm_journal(hwm_journal, [
+        "sign main 100 0",
+        "sign test 50 0",
+        "reset 20",
+        "boot",
+    ])
+    assert (state["main"], state["test"]) == ("20:0", "20:0")
+
+def test_hwm_journal_superseded_by_toggle(hwm_journal: Path) -> None:
+    """Check that toggling the HWM tracking keeps the HWMs and stops the journal."""
+    states = run_hwm_journal(hwm_journal, [
+        "sign main 100 0",
+        "toggle",
+        "sign main 200 0",
+        "boot",
+        "toggle",
+        "boot",
+        "sign main 101 0",
+        "boot",
+    ])
+    assert [(state["main"], state["disabled"]) for state in states] == \
+        [("100:0", "1"), ("100:0", "0"), ("101:0", "0")]
+
+
+UNSAFE_OP_HOST_CORPUS_SEED = 0
+UNSAFE_OP_HOST_CORPUS_SIZE = 2000
+
+@pytest.mark.parametrize("account", ACCOUNTS)
+def test_parse_operations_like_reference_parser(account: Account) -> None:
+    """Check that the unsafe operations are parsed as the previous
+    parser and the reference model do.
+
+    The current parser is also given the operations byte per byte, as
+    it can receive them in several packets.
+    """
+    parser = build_host_program("parse_operations")
+    reference_parser = build_host_program("parse_operations_reference")
+
+    key = SigningKey(account.public_key_hash, account.public_key)
+    corpus = list(generate_corpus(
+        UNSAFE_OP_HOST_CORPUS_SEED,
+        account.public_key_hash,
+        account.public_key,
+        DEFAULT_ACCOUNT_2.public_key_hash,
+        UNSAFE_OP_HOST_CORPUS_SIZE,
+        MAX_HOST_OPERATION_SIZE
+    ))
+
+    results = zip(
+        corpus,
+        parse_operations_on_host(parser, key, corpus),
+        parse_operations_on_host(parser, key, corpus, chunk_size=1),
+        parse_operations_on_host(reference_parser, key, corpus)
+    )
+    for raw, parsed, parsed_by_byte, reference in results:
+        assert parsed == parsed_by_byte, \
+            f"Expected {parsed} but got {parsed_by_byte} byte per byte on {raw.hex()}"
+        assert parsed.is_valid == reference.is_valid, \
+            f"Expected {reference} but got {parsed} on {raw.hex()}"
+        if parsed.is_valid:
+            assert parsed == reference, \
+                f"Expected {reference} but got {parsed} on {raw.hex()}"
+
+        expected = parse_unsafe_op(raw, key)
+        assert parsed.is_valid == (expected is not None), \
+            f"Expected {'a valid' if expected else 'an invalid'} operation on {raw.hex()}"
+        if expected is not None:
+            assert parsed.total_fee == expected.total_fee
+            assert parsed.total_storage_limit == expected.total_storage_limit
+            assert parsed.has_reveal == expected.has_reveal
+            assert (parsed.tag == OperationTag.BABYLON_DELEGATION) == (expected.tag is not None)
+            assert parsed.delegate == expected.delegate
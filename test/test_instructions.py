@@ -23,18 +23,19 @@ import hmac
 import time
 
 import pytest
-from pytezos import pytezos
 
 from ragger.backend import BackendInterface
 from ragger.firmware import Firmware
-from utils.client import TezosClient, Version, Hwm, StatusCode
+from utils.client import TezosClient, Version, Hwm, Index, StatusCode, MAX_APDU_SIZE
 from utils.account import Account
 from utils.helper import get_current_commit
 from utils.message import (
     Message,
+    RawMessage,
     UnsafeOp,
     Delegation,
     Reveal,
+    Transaction,
     Preattestation,
     Attestation,
     AttestationDal,
@@ -43,6 +44,7 @@ from utils.message import (
     Block,
     DEFAULT_CHAIN_ID
 )
+from utils.unsafe_op_model import Outcome, SigningKey, expected_outcome, generate_corpus
 from utils.navigator import (
     TezosNavigator,
     NanoFixedScreen,
@@ -54,7 +56,6 @@ from common import (
     DEFAULT_ACCOUNT_2,
     TZ1_ACCOUNTS,
     ACCOUNTS,
-    ZEBRA_ACCOUNTS,
 )
 
 @pytest.mark.parametrize("account", [None, *ACCOUNTS])
@@ -275,7 +276,7 @@ def test_automatic_low_cost_screensaver(firmware: Firmware,
 
     tezos_navigator.assert_screen(NanoFixedScreen.HOME_WELCOME)
 
-    time.sleep(30)
+    tezos_navigator.advance_clock(30)
 
     # Low-cost screensaver activate only after signing
     tezos_navigator.assert_screen(NanoFixedScreen.HOME_WELCOME)
@@ -288,12 +289,12 @@ def test_automatic_low_cost_screensaver(firmware: Firmware,
 
     client.sign_message(account, attestation)
 
-    time.sleep(5)
+    tezos_navigator.advance_clock(5)
 
     # Low-cost screensaver activate after 20s after signing
     tezos_navigator.assert_screen(NanoFixedScreen.HOME_WELCOME)
 
-    time.sleep(30)
+    tezos_navigator.advance_clock(30)
 
     # Low-cost screensaver has been activated
     backend.wait_for_screen_change()
@@ -303,7 +304,7 @@ def test_automatic_low_cost_screensaver(firmware: Firmware,
     backend.wait_for_screen_change()
     tezos_navigator.assert_screen(NanoFixedScreen.HOME_WELCOME)
 
-    time.sleep(30)
+    tezos_navigator.advance_clock(30)
 
     # Low-cost screensaver deactivate after button push
     tezos_navigator.assert_screen(NanoFixedScreen.HOME_WELCOME)
@@ -335,13 +336,13 @@ def test_automatic_low_cost_screensaver_cancelled_by_display(
 
     client.sign_message(account, attestation)
 
-    time.sleep(5)
+    tezos_navigator.advance_clock(5)
 
     # Low-cost screensaver activate after 20s after signing
     tezos_navigator.assert_screen(NanoFixedScreen.HOME_WELCOME)
 
     def delayed_authorize_navigate(**kwargs):
-        time.sleep(30)
+        tezos_navigator.advance_clock(30)
 
         # Low-cost screensaver deactivate after something is displayed.
         backend.wait_for_screen_change()
@@ -384,12 +385,12 @@ def test_automatic_low_cost_screensaver_exited_by_display(
 
     client.sign_message(account, attestation)
 
-    time.sleep(5)
+    tezos_navigator.advance_clock(5)
 
     # Low-cost screensaver activate after 20s after signing
     tezos_navigator.assert_screen(NanoFixedScreen.HOME_WELCOME)
 
-    time.sleep(30)
+    tezos_navigator.advance_clock(30)
 
     # Low-cost screensaver has been activated
     backend.wait_for_screen_change()
@@ -400,7 +401,7 @@ def test_automatic_low_cost_screensaver_exited_by_display(
 
     tezos_navigator.assert_screen(NanoFixedScreen.HOME_WELCOME)
 
-    time.sleep(30)
+    tezos_navigator.advance_clock(30)
 
     # Low-cost screensaver deactivate after display
     tezos_navigator.assert_screen(NanoFixedScreen.HOME_WELCOME)
@@ -413,18 +414,19 @@ def test_automatic_low_cost_screensaver_exited_by_display(
 
     client.sign_message(account, attestation)
 
-    time.sleep(5)
+    tezos_navigator.advance_clock(5)
 
     # Low-cost screensaver activate after 20s after signing
     tezos_navigator.assert_screen(NanoFixedScreen.HOME_WELCOME)
 
-    time.sleep(30)
+    tezos_navigator.advance_clock(30)
 
     # Low-cost screensaver has been activated
     backend.wait_for_screen_change()
     tezos_navigator.assert_screen(NanoFixedScreen.HOME_BLACK)
 
 
+@pytest.mark.headless
 def test_version(client: TezosClient) -> None:
     """Test the VERSION instruction."""
 
@@ -435,6 +437,7 @@ def test_version(client: TezosClient) -> None:
     assert version == expected_version, \
         f"Expected {expected_version} but got {version}"
 
+@pytest.mark.headless
 def test_git(client: TezosClient) -> None:
     """Test the GIT instruction."""
 
@@ -489,39 +492,6 @@ def test_ledger_screensaver(firmware: Firmware,
         assert (res.find("y") != -1), "Ledger screensaver should have activated"
 
 
-@pytest.mark.parametrize("account", ZEBRA_ACCOUNTS)
-def test_benchmark_attestation_time(account: Account, client: TezosClient, tezos_navigator: TezosNavigator, backend_name) -> None:
-    # check if backend is speculos, then return .
-    if backend_name == "speculos":
-        assert True
-        return
-
-    lvl = 0
-    main_chain_id = DEFAULT_CHAIN_ID
-    main_hwm = Hwm(lvl, 0)
-    test_hwm = Hwm(0, 0)
-
-    tezos_navigator.setup_app_context(
-        account,
-        main_chain_id,
-        main_hwm,
-        test_hwm
-    )
-    st = time.time()
-    # Run test for 100 times.
-    for _ in range(100):
-        lvl += 1
-        attestation = build_attestation(
-            op_level=lvl,
-            op_round=0,
-            chain_id=main_chain_id
-        )
-        client.sign_message(account, attestation)
-    end= time.time()
-    with open("Avg_time_for_100_attestations.txt",'a') as f:
-        f.write("\nTime elapsed for derivation type : " + str(account) + " is : " + str(end-st) + "\n")
-
-
 @pytest.mark.parametrize("account", ACCOUNTS)
 def test_authorize_baking(account: Account, tezos_navigator: TezosNavigator) -> None:
     """Test the AUTHORIZE_BAKING instruction."""
@@ -611,6 +581,7 @@ def test_get_public_key_baking(account: Account, tezos_navigator: TezosNavigator
     account.check_public_key(public_key)
 
 
+@pytest.mark.headless
 @pytest.mark.parametrize("account", ACCOUNTS)
 def test_get_public_key_silent(account: Account, client: TezosClient) -> None:
     """Test the GET_PUBLIC_KEY instruction."""
@@ -1317,6 +1288,115 @@ def test_sign_reveal_constraints(
         )
 
 
+UNSAFE_OP_CORPUS_SEED = 0
+UNSAFE_OP_CORPUS_SIZE = 100
+
+@pytest.mark.parametrize("account", ACCOUNTS)
+def test_sign_unsafe_op_like_reference_model(
+        account: Account,
+        client: TezosClient,
+        tezos_navigator: TezosNavigator) -> None:
+    """Check that the unsafe operations are parsed as the reference model does.
+
+    The corpus is made of valid operation groups and of their
+    mutations. The self-delegations, which need to be approved, are
+    not sent.
+    """
+
+    tezos_navigator.setup_app_context(
+        account,
+        DEFAULT_CHAIN_ID,
+        main_hwm=Hwm(0, 0),
+        test_hwm=Hwm(0, 0)
+    )
+
+    key = SigningKey(account.public_key_hash, account.public_key)
+    corpus = generate_corpus(
+        UNSAFE_OP_CORPUS_SEED,
+        account.public_key_hash,
+        account.public_key,
+        DEFAULT_ACCOUNT_2.public_key_hash,
+        UNSAFE_OP_CORPUS_SIZE,
+        MAX_APDU_SIZE
+    )
+
+    for raw in corpus:
+        outcome = expected_outcome(raw, key)
+        if outcome == Outcome.PROMPTED:
+            continue
+
+        if outcome == Outcome.SIGNED:
+            signature = client.sign_message(account, RawMessage(raw))
+            account.check_signature(signature, raw)
+        else:
+            status_code = StatusCode.PARSE_ERROR \
+                if outcome == Outcome.PARSE_ERROR else StatusCode.SECURITY
+            with status_code.expected():
+                client.sign_message(account, RawMessage(raw))
+
+
+STREAMED_GROUP_REVEALS = 16
+
+@pytest.mark.parametrize("account", ACCOUNTS)
+@pytest.mark.parametrize("chunk_size", [7, 100, MAX_APDU_SIZE])
+def test_sign_unsafe_op_in_several_packets(
+        account: Account,
+        chunk_size: int,
+        client: TezosClient,
+        tezos_navigator: TezosNavigator) -> None:
+    """Check that the unsafe operations larger than an APDU are parsed packet by packet."""
+
+    tezos_navigator.setup_app_context(
+        account,
+        DEFAULT_CHAIN_ID,
+        main_hwm=Hwm(0, 0),
+        test_hwm=Hwm(0, 0)
+    )
+
+    reveal = Reveal(public_key=account.public_key, source=account.public_key_hash)
+    operation: UnsafeOp = reveal
+    for _ in range(STREAMED_GROUP_REVEALS - 1):
+        operation = operation.merge(reveal)
+    raw = operation.forge().raw()
+    assert len(raw) > MAX_APDU_SIZE, "The group must not fit in an APDU"
+
+    signature = client.sign_message(account, RawMessage(raw), chunk_size=chunk_size)
+    account.check_signature(signature, raw)
+
+    # The operation group must end between two operations
+    with StatusCode.PARSE_ERROR.expected():
+        client.sign_message(account, RawMessage(raw[:-1]), chunk_size=chunk_size)
+
+    # The checks still apply to the operations of the last packets
+    foreign_delegation = Delegation(
+        delegate=DEFAULT_ACCOUNT_2.public_key_hash,
+        source=account.public_key_hash,
+    )
+    raw = operation.merge(foreign_delegation).forge().raw()
+    with StatusCode.SECURITY.expected():
+        client.sign_message(account, RawMessage(raw), chunk_size=chunk_size)
+
+
+def test_sign_baking_in_several_packets(
+        client: TezosClient,
+        tezos_navigator: TezosNavigator) -> None:
+    """Check that the consensus operations sent in several packets are refused."""
+
+    account = DEFAULT_ACCOUNT
+    tezos_navigator.setup_app_context(
+        account,
+        DEFAULT_CHAIN_ID,
+        main_hwm=Hwm(0, 0),
+        test_hwm=Hwm(0, 0)
+    )
+
+    attestation = build_attestation(1, 0, DEFAULT_CHAIN_ID)
+    chunk_size = len(bytes(attestation)) - 1
+
+    with StatusCode.PARSE_ERROR.expected():
+        client.sign_message(account, attestation, chunk_size=chunk_size)
+
+
 def test_sign_not_authorized_key(
         client: TezosClient,
         tezos_navigator: TezosNavigator) -> None:
@@ -1357,13 +1437,10 @@ def test_sign_transaction(
         test_hwm=Hwm(0, 0)
     )
 
-    ctxt = pytezos.using()
-    transaction = UnsafeOp(
-        ctxt.transaction(
-            source=account_1.public_key_hash,
-            destination=account_2.public_key_hash,
-            amount=10_000,
-        )
+    transaction = Transaction(
+        source=account_1.public_key_hash,
+        destination=account_2.public_key_hash,
+        amount=10_000,
     ).forge()
 
     with StatusCode.PARSE_ERROR.expected():
@@ -1382,15 +1459,12 @@ def build_delegation(account: Account) -> Delegation:
         delegate=account.public_key_hash,
         source=account.public_key_hash,
     )
-def build_transaction(account: Account) -> UnsafeOp:
+def build_transaction(account: Account) -> Transaction:
     """Build a transaction."""
-    ctxt = pytezos.using()
-    return UnsafeOp(
-        ctxt.transaction(
-            source=account.public_key_hash,
-            destination=DEFAULT_ACCOUNT_2.public_key_hash,
-            amount=10_000,
-        )
+    return Transaction(
+        source=account.public_key_hash,
+        destination=DEFAULT_ACCOUNT_2.public_key_hash,
+        amount=10_000,
     )
 def build_bad_reveal_1(account: Account) -> Reveal:
     """Build a bad reveal."""
@@ -1725,6 +1799,132 @@ def test_sign_when_chain_is_setup(
     )
 
 
+@pytest.mark.parametrize("with_hash", [False, True])
+def test_sign_with_hwm(
+        with_hash: bool,
+        client: TezosClient,
+        tezos_navigator: TezosNavigator) -> None:
+    """Check that the main HWM requested with the signature is the one after signing."""
+
+    account = DEFAULT_ACCOUNT
+    main_chain_id = "NetXH12AexHqTQa" # Chain = 1
+
+    tezos_navigator.setup_app_context(
+        account,
+        main_chain_id,
+        main_hwm=Hwm(0, 0),
+        test_hwm=Hwm(0, 0)
+    )
+
+    def sign(message: Message) -> Hwm:
+        if not with_hash:
+            signature, hwm = client.sign_message_with_hwm(account, message)
+        else:
+            message_hash, signature, hwm = \
+                client.sign_message_with_hash_and_hwm(account, message)
+            assert message_hash == message.hash, \
+                f"Expected hash {message.hash.hex()} but got {message_hash.hex()}"
+        account.check_signature(signature, bytes(message))
+        return hwm
+
+    hwm = sign(build_attestation(1, 2, main_chain_id))
+    assert hwm == Hwm(1, 2), f"Expected main HWM {Hwm(1, 2)} but got {hwm}"
+
+    # Signing on another chain does not change the main HWM
+    hwm = sign(build_attestation(3, 0, DEFAULT_CHAIN_ID))
+    assert hwm == Hwm(1, 2), f"Expected main HWM {Hwm(1, 2)} but got {hwm}"
+
+    hwm = sign(Reveal(public_key=account.public_key, source=account.public_key_hash).forge())
+    assert hwm == Hwm(1, 2), f"Expected main HWM {Hwm(1, 2)} but got {hwm}"
+
+    tezos_navigator.check_app_context(
+        account,
+        chain_id=main_chain_id,
+        main_hwm=Hwm(1, 2),
+        test_hwm=Hwm(3, 0)
+    )
+
+
+def test_setup_hwm_survives_signatures(
+        client: TezosClient,
+        tezos_navigator: TezosNavigator) -> None:
+    """Check that a HWM set by SETUP supersedes the HWMs journaled by
+    the previous signatures and is raised by the next ones.
+
+    The restoration of the journal at boot is checked on the host, see
+    `test_host.py`."""
+
+    account = DEFAULT_ACCOUNT
+    main_chain_id = DEFAULT_CHAIN_ID
+
+    tezos_navigator.setup_app_context(
+        account,
+        main_chain_id,
+        main_hwm=Hwm(0, 0),
+        test_hwm=Hwm(0, 0)
+    )
+
+    # Fill every slot of the journal of the main HWM
+    for level in range(100, 111):
+        client.sign_message(account, build_attestation(level, 0, main_chain_id))
+
+    tezos_navigator.setup_app_context(
+        account,
+        main_chain_id,
+        main_hwm=Hwm(5, 0),
+        test_hwm=Hwm(0, 0)
+    )
+
+    tezos_navigator.check_app_context(
+        account,
+        chain_id=main_chain_id,
+        main_hwm=Hwm(5, 0),
+        test_hwm=Hwm(0, 0)
+    )
+
+    for level in range(6, 9):
+        client.sign_message(account, build_attestation(level, 0, main_chain_id))
+
+    with StatusCode.WRONG_VALUES.expected():
+        client.sign_message(account, build_attestation(7, 0, main_chain_id))
+
+    tezos_navigator.check_app_context(
+        account,
+        chain_id=main_chain_id,
+        main_hwm=Hwm(8, 0),
+        test_hwm=Hwm(0, 0)
+    )
+
+
+def test_sign_with_hwm_on_non_last_packet(
+        client: TezosClient,
+        tezos_navigator: TezosNavigator) -> None:
+    """Check that the main HWM can only be requested with the last packet."""
+
+    account = DEFAULT_ACCOUNT
+
+    tezos_navigator.setup_app_context(
+        account,
+        DEFAULT_CHAIN_ID,
+        main_hwm=Hwm(0, 0),
+        test_hwm=Hwm(0, 0)
+    )
+
+    reveal = Reveal(public_key=account.public_key, source=account.public_key_hash).forge()
+    chunk_size = len(bytes(reveal)) // 2
+
+    with StatusCode.WRONG_PARAM.expected():
+        client.sign_message_raw(account,
+                                reveal,
+                                chunk_size=chunk_size,
+                                last_index=Index.LAST_WITH_HWM,
+                                other_index=Index.OTHER_WITH_HWM)
+
+    signature, hwm = client.sign_message_with_hwm(account, reveal)
+    account.check_signature(signature, bytes(reveal))
+    assert hwm == Hwm(0, 0), f"Expected main HWM {Hwm(0, 0)} but got {hwm}"
+
+
 KEY_SHA256_HEX = "6c4e7e706c54d367c87a8d89c16adfe06cb5680cb7d18e625a90475ec0dbdb9f"
 
 def get_hmac_key(account):
@@ -1741,6 +1941,7 @@ HMAC_TEST_SET = [
 ]
 
 # This HMAC test don't pass with tz2 and tz3
+@pytest.mark.headless
 @pytest.mark.parametrize("account", TZ1_ACCOUNTS)
 @pytest.mark.parametrize("message_hex", HMAC_TEST_SET)
 def test_hmac(
@@ -0,0 +1,143 @@
+# Copyright 2024 Functori <contact@functori.com>
+# Copyright 2024 Trilitech <contact@trili.tech>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Check the forged messages against pytezos, without device."""
+
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+from utils.account import Account
+from utils.helper import LazyImport
+from utils.message import (
+    Delegation,
+    Reveal,
+    Transaction,
+    UnsafeOp,
+    DEFAULT_BLOCK_HASH
+)
+from utils.unsafe_op_model import Outcome, SigningKey, expected_outcome, parse_unsafe_op
+from common import ACCOUNTS, DEFAULT_ACCOUNT_2
+
+pytezos = LazyImport("pytezos", "pytezos")
+
+CONTRACT_ADDRESS = "KT1BEqzn5Wx8uJrZNvuS9DVHmLvG9td3fDLi"
+OTHER_BRANCH = "BLockGenesisGenesisGenesisGenesisGenesisf79b5d1CoW2"
+
+# fee, counter, gas_limit, storage_limit: around the zarith byte boundaries
+MANAGER_FIELDS: List[Tuple[int, int, int, int]] = [
+    (0, 0, 0, 0),
+    (127, 128, 16_383, 16_384),
+    (1_420, 2_983_771, 10_600, 257),
+    (2**31, 2**63 - 1, 2**40 + 7, 2**70),
+]
+
+def build_contents(account: Account, fields: Tuple[int, int, int, int]) \
+        -> List[Tuple[UnsafeOp, Dict[str, Any]]]:
+    """Build a content of each kind with its pytezos arguments."""
+    fee, counter, gas_limit, storage_limit = fields
+    manager = {
+        "source": account.public_key_hash,
+        "counter": counter,
+        "fee": fee,
+        "gas_limit": gas_limit,
+        "storage_limit": storage_limit,
+    }
+    return [
+        (Reveal(public_key=account.public_key, **manager),
+         {"kind": "reveal", "public_key": account.public_key, **manager}),
+        (Delegation(delegate=account.public_key_hash, **manager),
+         {"kind": "delegation", "delegate": account.public_key_hash, **manager}),
+        (Delegation(delegate=None, **manager),
+         {"kind": "delegation", "delegate": None, **manager}),
+        (Transaction(destination=DEFAULT_ACCOUNT_2.public_key_hash, amount=10_000, **manager),
+         {"kind": "transaction", "destination": DEFAULT_ACCOUNT_2.public_key_hash,
+          "amount": 10_000, **manager}),
+        (Transaction(destination=CONTRACT_ADDRESS, amount=2**64, **manager),
+         {"kind": "transaction", "destination": CONTRACT_ADDRESS, "amount": 2**64, **manager}),
+    ]
+
+def forge_with_pytezos(contents: List[Dict[str, Any]], branch: str) -> bytes:
+    """Forge the unsafe operation of `contents` with pytezos."""
+    ctxt = pytezos.using()
+    group = None
+    for content in contents:
+        arguments = dict(content)
+        kind = arguments.pop("kind")
+        operation = getattr(ctxt, kind)(**arguments)
+        group = operation if group is None else group.operation(operation.contents[0])
+    group.branch = branch
+    return bytes([0x03]) + bytes.fromhex(group.forge())
+
+@pytest.mark.parametrize("account", ACCOUNTS, ids=lambda account: account.public_key_hash)
+@pytest.mark.parametrize("fields", MANAGER_FIELDS)
+@pytest.mark.parametrize("branch", [DEFAULT_BLOCK_HASH, OTHER_BRANCH])
+def test_forge_unsafe_op_like_pytezos(account: Account,
+                                      fields: Tuple[int, int, int, int],
+                                      branch: str) -> None:
+    """Check that the native forging of the unsafe operations matches pytezos."""
+    contents = build_contents(account, fields)
+
+    for operation, content in contents:
+        assert operation.forge(branch).raw() == forge_with_pytezos([content], branch), \
+            f"Forged {content['kind']} differs from pytezos"
+
+    operation = contents[0][0]
+    for other_operation, _ in contents[1:]:
+        operation = operation.merge(other_operation)
+    assert operation.forge(branch).raw() == \
+        forge_with_pytezos([content for _, content in contents], branch), \
+        "Forged operation group differs from pytezos"
+
+def test_forge_rejects_invalid_inputs() -> None:
+    """Check that the native forging rejects the invalid inputs."""
+    account = ACCOUNTS[0]
+    corrupted_key_hash = account.public_key_hash[:-1] + \
+        ("1" if account.public_key_hash[-1] != "1" else "2")
+    with pytest.raises(ValueError):
+        Reveal(public_key=account.public_key, source=account.public_key_hash,
+               fee=-1).forge()
+    with pytest.raises(ValueError):
+        Delegation(delegate=account.public_key_hash, source=CONTRACT_ADDRESS).forge()
+    with pytest.raises(ValueError):
+        Delegation(delegate=corrupted_key_hash, source=account.public_key_hash).forge()
+
+@pytest.mark.parametrize("account", ACCOUNTS, ids=lambda account: account.public_key_hash)
+@pytest.mark.parametrize("fields", MANAGER_FIELDS[:-1])
+def test_reference_model_parses_forged_groups(account: Account,
+                                              fields: Tuple[int, int, int, int]) -> None:
+    """Check that the reference model of the app parser reads the forged groups."""
+    fee, counter, gas_limit, storage_limit = fields
+    key = SigningKey(account.public_key_hash, account.public_key)
+    reveal = Reveal(public_key=account.public_key, source=account.public_key_hash,
+                    fee=fee, counter=counter, gas_limit=gas_limit,
+                    storage_limit=storage_limit)
+    delegation = Delegation(delegate=account.public_key_hash, source=account.public_key_hash,
+                            fee=fee, storage_limit=storage_limit)
+
+    parsed = parse_unsafe_op(reveal.merge(delegation).forge().raw(), key)
+    assert parsed is not None, "Expected the group to be parsed"
+    assert parsed.has_reveal
+    assert parsed.total_fee == 2 * fee
+    assert parsed.total_storage_limit == 2 * storage_limit
+    assert parsed.delegate == key.address
+
+    assert expected_outcome(reveal.merge(reveal).forge().raw(), key) == Outcome.SIGNED
+    assert expected_outcome(delegation.forge().raw(), key) == Outcome.PROMPTED
+    assert expected_outcome(delegation.merge(delegation).forge().raw(), key) == \
+        Outcome.PARSE_ERROR
+    assert expected_outcome(reveal.forge().raw()[:-1], key) == Outcome.PARSE_ERROR
+    other_delegation = Delegation(delegate=None, source=account.public_key_hash)
+    assert expected_outcome(other_delegation.forge().raw(), key) == Outcome.SECURITY
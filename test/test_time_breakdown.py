@@ -0,0 +1,38 @@
+# Copyright 2024 Functori <contact@functori.com>
+# Copyright 2024 Trilitech <contact@trili.tech>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Check the time breakdown of the tests, without device."""
+
+import pytest
+
+from utils.latency import LatencyProfiler
+from utils.time_breakdown import BUCKETS, TimeBreakdown
+
+def test_breakdown_counts_unmapped_phases_once() -> None:
+    """Check that the time of the phases without bucket goes to `other` once."""
+    profiler = LatencyProfiler()
+    profiler.self_times = {
+        ("sign_attestation",): 0.15,
+        ("sign_attestation", "forge"): 0.05,
+    }
+    breakdown = TimeBreakdown()
+    breakdown.add("test", 0.35, profiler)
+
+    buckets = breakdown.tests["test"]
+    assert buckets["forge"] == pytest.approx(0.05)
+    # The unmapped phase and the time out of any phase
+    assert buckets["other"] == pytest.approx(0.3)
+    assert sum(buckets[bucket] for bucket in BUCKETS) == pytest.approx(0.35), \
+        "Expected the buckets to add up to the wall time"
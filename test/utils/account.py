@@ -16,17 +16,22 @@
 """Module providing an account interface."""
 
 from enum import IntEnum
-from typing import Union
+from typing import TYPE_CHECKING, Optional, Union
 
 import base58
-import pysodium
-import secp256k1
-import fastecdsa
 
-import pytezos
-from bip_utils.bip.bip32.bip32_path import Bip32Path, Bip32PathParser
-from bip_utils.bip.bip32.bip32_key_data import Bip32KeyIndex
-from utils.helper import BytesReader
+from utils.helper import BytesReader, LazyImport
+
+if TYPE_CHECKING:
+    from bip_utils.bip.bip32.bip32_path import Bip32Path
+    from pytezos.crypto.key import Key
+
+pysodium = LazyImport("pysodium")
+secp256k1 = LazyImport("secp256k1")
+fastecdsa = LazyImport("fastecdsa")
+pytezos = LazyImport("pytezos")
+bip32_path = LazyImport("bip_utils.bip.bip32.bip32_path")
+Bip32KeyIndex = LazyImport("bip_utils.bip.bip32.bip32_key_data", "Bip32KeyIndex")
 
 class SigScheme(IntEnum):
     """Class representing signature scheme."""
@@ -38,11 +43,27 @@ class SigScheme(IntEnum):
     DEFAULT       = ED25519
 
 class BipPath:
-    """Class representing mnemonic path."""
-    value: Bip32Path
+    """Class representing mnemonic path.
 
-    def __init__(self, value: Bip32Path):
-        self.value = value
+    A path built from its string representation is only parsed when used.
+    """
+    _value: Optional['Bip32Path']
+    _path: str
+
+    def __init__(self, value: Union['Bip32Path', str]):
+        if isinstance(value, str):
+            self._value = None
+            self._path = value
+        else:
+            self._value = value
+            self._path = str(value)
+
+    @property
+    def value(self) -> 'Bip32Path':
+        """Parsed path."""
+        if self._value is None:
+            self._value = bip32_path.Bip32PathParser.Parse(self._path)
+        return self._value
 
     def __eq__(self, other: object):
         if not isinstance(other, BipPath):
@@ -63,7 +84,7 @@ class BipPath:
     @classmethod
     def from_string(cls, path: str) -> 'BipPath':
         """Return the path from its string representation."""
-        return BipPath(Bip32PathParser.Parse(path))
+        return BipPath(path)
 
     @classmethod
     def from_bytes(cls, raw_path: bytes) -> 'BipPath':
@@ -76,7 +97,7 @@ class BipPath:
                 Bip32KeyIndex.FromBytes(
                     reader.read_bytes(Bip32KeyIndex.FixedLength())
                 ))
-        return BipPath(Bip32Path(elems))
+        return BipPath(bip32_path.Bip32Path(elems))
 
 class Signature:
     """Class representing signature."""
@@ -134,7 +155,10 @@ class Signature:
         return Signature.from_tlv(data)
 
 class Account:
-    """Class representing account."""
+    """Class representing account.
+
+    The key is only loaded when used.
+    """
 
     def __init__(self,
                  path: Union[BipPath, str, bytes],
@@ -146,9 +170,17 @@ class Account:
             BipPath.from_bytes(path) if isinstance(path, bytes) else \
             path
         self.sig_scheme: SigScheme = sig_scheme
-        self.key: pytezos.Key = pytezos.pytezos.using(key=key).key
+        self._encoded_key: str = key
+        self._key: Optional['Key'] = None
         self.nanos_screens: int = nanos_screens
 
+    @property
+    def key(self) -> 'Key':
+        """key of the account."""
+        if self._key is None:
+            self._key = pytezos.pytezos.using(key=self._encoded_key).key
+        return self._key
+
     @property
     def public_key_hash(self) -> str:
         """public_key_hash of the account."""
@@ -0,0 +1,188 @@
+# Copyright 2024 Functori <contact@functori.com>
+# Copyright 2024 Trilitech <contact@trili.tech>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module providing a low-overhead APDU tracer.
+
+The tracer keeps the last exchanges of a client in a ring buffer
+allocated once: recording an exchange packs fixed-size fields in place.
+The buffer is dumped as is in a compact binary file, on a test failure
+or on SIGUSR1, and decoded afterwards.
+
+Usage, from the test directory:
+  `python -m utils.apdu_trace <trace file>`: print the exchanges of a trace
+"""
+
+import argparse
+import os
+import signal
+import struct
+import time
+from pathlib import Path
+from typing import List
+
+TRACE_MAGIC: bytes = b"TZAT"
+TRACE_VERSION: int = 1
+# magic, version, capacity, number of exchanges recorded since the start
+TRACE_HEADER = struct.Struct("<4sHIQ")
+# start (ns), end (ns), ins, p1, p2, status, payload length, response length
+TRACE_RECORD = struct.Struct("<QQBBBHHH")
+
+# Status recorded when no response was received
+NO_RESPONSE: int = 0x0000
+
+class ApduRecord:
+    """Class representing a traced APDU exchange."""
+
+    start_ns: int
+    end_ns: int
+    ins: int
+    p1: int
+    p2: int
+    status: int
+    payload_length: int
+    response_length: int
+
+    def __init__(self,
+                 start_ns: int,
+                 end_ns: int,
+                 ins: int,
+                 p1: int,
+                 p2: int,
+                 status: int,
+                 payload_length: int,
+                 response_length: int):
+        self.start_ns        = start_ns
+        self.end_ns          = end_ns
+        self.ins             = ins
+        self.p1              = p1
+        self.p2              = p2
+        self.status          = status
+        self.payload_length  = payload_length
+        self.response_length = response_length
+
+    @property
+    def duration_ns(self) -> int:
+        """Duration of the exchange."""
+        return self.end_ns - self.start_ns
+
+    def __repr__(self) -> str:
+        # Imported here as the client imports the tracer
+        from utils.client import Index, Ins, StatusCode
+
+        def name(enum, value: int) -> str:
+            try:
+                return enum(value).name
+            except ValueError:
+                return f"0x{value:02x}"
+
+        status = "NO_RESPONSE" if self.status == NO_RESPONSE else \
+            f"{name(StatusCode, self.status)} (0x{self.status:04x})"
+        return f"{name(Ins, self.ins)} p1={name(Index, self.p1)} p2=0x{self.p2:02x} " \
+            f"payload={self.payload_length}B -> {status} " \
+            f"response={self.response_length}B in {self.duration_ns / 1e6:.3f}ms"
+
+class ApduTracer:
+    """Class representing a ring buffer of the last `capacity` APDU exchanges."""
+
+    capacity: int
+    count: int
+    _buffer: bytearray
+
+    def __init__(self, capacity: int = 4096):
+        assert capacity > 0, "The trace capacity must be positive"
+        self.capacity = capacity
+        self.count = 0
+        self._buffer = bytearray(capacity * TRACE_RECORD.size)
+
+    def record(self,
+               start_ns: int,
+               end_ns: int,
+               ins: int,
+               p1: int,
+               p2: int,
+               status: int,
+               payload_length: int,
+               response_length: int) -> None:
+        """Record an exchange, overwriting the oldest one when full."""
+        TRACE_RECORD.pack_into(
+            self._buffer,
+            (self.count % self.capacity) * TRACE_RECORD.size,
+            start_ns,
+            end_ns,
+            ins,
+            p1,
+            p2,
+            status,
+            payload_length,
+            response_length
+        )
+        self.count += 1
+
+    def dump(self, path: Path) -> Path:
+        """Write the trace in `path`."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("wb") as trace_file:
+            trace_file.write(TRACE_HEADER.pack(
+                TRACE_MAGIC,
+                TRACE_VERSION,
+                self.capacity,
+                self.count
+            ))
+            trace_file.write(self._buffer)
+        return path
+
+    def install_signal_handler(self,
+                               directory: Path,
+                               signum: int = signal.SIGUSR1) -> None:
+        """Dump the trace in `directory` each time the process receives `signum`."""
+
+        def dump_on_signal(received_signum, _frame) -> None:
+            self.dump(directory / f"signal-{received_signum}-{os.getpid()}-{time.time_ns()}.tztrace")
+
+        signal.signal(signum, dump_on_signal)
+
+def read_trace(path: Path) -> List[ApduRecord]:
+    """Read the exchanges of a trace, from the oldest to the newest."""
+    data = path.read_bytes()
+    magic, version, capacity, count = TRACE_HEADER.unpack_from(data)
+    assert magic == TRACE_MAGIC, f"Invalid trace magic {magic.hex()}"
+    assert version == TRACE_VERSION, f"Unsupported trace version {version}"
+    first = count - capacity if count > capacity else 0
+    return [
+        ApduRecord(*TRACE_RECORD.unpack_from(
+            data,
+            TRACE_HEADER.size + (index % capacity) * TRACE_RECORD.size
+        ))
+        for index in range(first, count)
+    ]
+
+def main() -> None:
+    """Command line interface of the trace decoder."""
+    parser = argparse.ArgumentParser(description="Decode an APDU trace.")
+    parser.add_argument("trace", type=Path, help="Trace file")
+    parser.add_argument("--last", type=int, default=None,
+                        help="Only print the last exchanges")
+    args = parser.parse_args()
+
+    records = read_trace(args.trace)
+    if args.last is not None:
+        records = records[-args.last:]
+    print(f"{len(records)} exchanges")
+    for record in records:
+        # Timestamps relative to the first printed exchange
+        print(f"+{(record.start_ns - records[0].start_ns) / 1e6:12.3f}ms {record}")
+
+if __name__ == "__main__":
+    main()
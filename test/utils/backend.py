@@ -0,0 +1,173 @@
+# Copyright 2024 Functori <contact@functori.com>
+# Copyright 2024 Trilitech <contact@trili.tech>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module providing a tezos speculos backend."""
+
+import math
+import time
+from contextlib import contextmanager
+from io import BytesIO
+from pathlib import Path
+from typing import Generator, Optional
+
+from ragger.backend import SpeculosBackend
+from ragger.utils import Crop
+from speculos.mcu.seproxyhal import TICKER_DELAY
+
+from utils.latency import phase
+from utils.snapshot import SnapshotCache, SnapshotPipeline
+from utils.snapshot_store import SnapshotStore
+
+class TezosSpeculosBackend(SpeculosBackend):
+    """Speculos backend comparing screens through a snapshot cache.
+
+    A headless backend is meant for tests never looking at the screen:
+    it does not wait for the app to display its home screen when
+    starting and refuses screen comparisons.
+    """
+
+    _snapshot_cache:    SnapshotCache
+    _snapshot_pipeline: Optional[SnapshotPipeline]
+    _deferring:         int
+    _headless:          bool
+    _application_path:  Path
+
+    startup_time: Optional[float] = None
+
+    def __init__(self,
+                 application: Path,
+                 *args,
+                 snapshot_cache: SnapshotCache,
+                 snapshot_pipeline: Optional[SnapshotPipeline] = None,
+                 headless: bool = False,
+                 **kwargs):
+        super().__init__(application, *args, **kwargs)
+        self._application_path  = application
+        self._snapshot_cache    = snapshot_cache
+        self._snapshot_pipeline = snapshot_pipeline
+        self._deferring         = 0
+        self._headless          = headless
+
+    @property
+    def headless(self) -> bool:
+        """Whether the backend ignores the screen."""
+        return self._headless
+
+    @property
+    def application_path(self) -> Path:
+        """Path of the ELF of the app run by speculos."""
+        return self._application_path
+
+    def __enter__(self) -> "TezosSpeculosBackend":
+        start = time.perf_counter()
+        with phase("startup"):
+            if self._headless:
+                self.logger.info(f"Starting headless {self.__class__.__name__} stream")
+                self._client.__enter__()
+            else:
+                super().__enter__()
+        self.startup_time = time.perf_counter() - start
+        return self
+
+    def advance_clock(self, seconds: float) -> None:
+        """Make `seconds` elapse on the device ticker without waiting.
+
+        The real-time ticker is paused while the ticker events are sent.
+        """
+        self.pause_ticker()
+        try:
+            for _ in range(math.ceil(seconds / TICKER_DELAY)):
+                self.send_tick()
+        finally:
+            self.resume_ticker()
+
+    @property
+    def snapshot_store(self) -> Optional[SnapshotStore]:
+        """Store of the golden snapshots, if any."""
+        return self._snapshot_cache.store
+
+    @contextmanager
+    def deferred_comparisons(self) -> Generator[None, None, None]:
+        """Defer the comparisons made in this context to the snapshot pipeline.
+
+        Only use it where the comparison result is asserted: deferred
+        comparisons always succeed until `join_comparisons` is called.
+        Without pipeline, comparisons stay synchronous.
+        """
+        self._deferring += 1
+        try:
+            yield
+        finally:
+            self._deferring -= 1
+
+    def join_comparisons(self) -> None:
+        """Wait for the deferred comparisons and fail if any did not match."""
+        if self._snapshot_pipeline is None:
+            return
+        with phase("snapshot"):
+            failures = self._snapshot_pipeline.join()
+        assert not failures, "\n".join(failures)
+
+    def compare_screen_with_snapshot(self,
+                                     golden_snap_path: Path,
+                                     crop: Optional[Crop] = None,
+                                     tmp_snap_path: Optional[Path] = None,
+                                     golden_run: bool = False) -> bool:
+        with phase("snapshot"):
+            return self._compare_screen_with_snapshot(
+                golden_snap_path,
+                crop,
+                tmp_snap_path,
+                golden_run
+            )
+
+    def _compare_screen_with_snapshot(self,
+                                      golden_snap_path: Path,
+                                      crop: Optional[Crop],
+                                      tmp_snap_path: Optional[Path],
+                                      golden_run: bool) -> bool:
+        assert not self._headless, \
+            "Screens cannot be compared on a headless backend, remove the 'headless' marker"
+        data = self._client.get_screenshot()
+
+        # Comparisons used to drive the navigation (cropped or against
+        # a screen just saved) must remain synchronous
+        if self._snapshot_pipeline is not None \
+           and self._deferring > 0 \
+           and crop is None \
+           and not golden_run:
+            self._snapshot_pipeline.submit(golden_snap_path, data, tmp_snap_path)
+            return True
+
+        snapshot = self._snapshot_cache.decode(data)
+
+        # Save snap in tmp folder.
+        # It allows the user to access the screenshots in case of comparison failure
+        if tmp_snap_path:
+            self._save_screen_snapshot(BytesIO(data), tmp_snap_path)
+
+        # Allow to generate golden snapshots
+        if golden_run:
+            store = self.snapshot_store
+            if store is not None and store.owns(golden_snap_path):
+                store.write(golden_snap_path, snapshot, data)
+            else:
+                self._save_screen_snapshot(BytesIO(data), golden_snap_path)
+                self._snapshot_cache.record(golden_snap_path, snapshot)
+
+        bbox = self._snapshot_cache.compare(golden_snap_path, snapshot, crop)
+        if bbox is not None:
+            self.logger.info(f"Screen differs from '{golden_snap_path}' in area {bbox}")
+        return bbox is None
@@ -0,0 +1,124 @@
+# Copyright 2024 Functori <contact@functori.com>
+# Copyright 2024 Trilitech <contact@trili.tech>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module providing benchmark helpers."""
+
+import json
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+BENCHMARKS_DIR = Path(__file__).parent.parent / "benchmarks"
+
+class LatencyStats:
+    """Class representing statistics over latency samples, in seconds.
+
+    `duration` is the wall time taken by all the samples, used to
+    compute the throughput.
+    """
+
+    samples: List[float]
+    duration: Optional[float]
+
+    def __init__(self, samples: List[float], duration: Optional[float] = None):
+        assert samples, "No latency samples"
+        self.samples = sorted(samples)
+        self.duration = duration
+
+    def percentile(self, percent: float) -> float:
+        """Return the nearest-rank percentile."""
+        rank = max(0, min(len(self.samples) - 1,
+                          round(percent / 100 * len(self.samples)) - 1))
+        return self.samples[rank]
+
+    @property
+    def mean(self) -> float:
+        """Mean latency."""
+        return sum(self.samples) / len(self.samples)
+
+    @property
+    def throughput(self) -> Optional[float]:
+        """Number of requests per second."""
+        if not self.duration:
+            return None
+        return len(self.samples) / self.duration
+
+    def to_dict(self) -> Dict[str, float]:
+        """Summary of the statistics."""
+        summary = {
+            "count": len(self.samples),
+            "mean": self.mean,
+            "min": self.samples[0],
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.samples[-1],
+        }
+        if self.throughput is not None:
+            summary["throughput"] = self.throughput
+        return summary
+
+    def __repr__(self) -> str:
+        summary = [f"count={len(self.samples)}"]
+        for name in ["mean", "p50", "p90", "p99"]:
+            summary.append(f"{name}={self.to_dict()[name] * 1000:.2f}ms")
+        if self.throughput is not None:
+            summary.append(f"throughput={self.throughput:.2f}/s")
+        return " ".join(summary)
+
+def measure(request: Callable[[], Any], iterations: int, warmup: int = 0) -> LatencyStats:
+    """Time `iterations` calls of `request`, after `warmup` untimed calls."""
+    for _ in range(warmup):
+        request()
+    samples = []
+    run_start = time.perf_counter()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        request()
+        samples.append(time.perf_counter() - start)
+    return LatencyStats(samples, time.perf_counter() - run_start)
+
+class BenchmarkRecorder:
+    """Class collecting the results of a benchmark run."""
+
+    name: str
+    started_at: str
+    results: Dict[str, Dict[str, Any]]
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.results = {}
+
+    def record(self, case: str, stats: LatencyStats, **tags: Any) -> None:
+        """Record the statistics of a benchmark case, with its tags."""
+        self.results[case] = {"tags": tags, "stats": stats.to_dict()}
+        print(f"{case}: {stats}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Content of the run."""
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "results": self.results,
+        }
+
+    def write(self) -> Path:
+        """Write the results as JSON in the benchmarks directory."""
+        BENCHMARKS_DIR.mkdir(parents=True, exist_ok=True)
+        path = BENCHMARKS_DIR / f"{self.name}.json"
+        path.write_text(json.dumps(self.to_dict(), indent=2, sort_keys=True) + "\n")
+        return path
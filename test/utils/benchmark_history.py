@@ -0,0 +1,266 @@
+# Copyright 2024 Functori <contact@functori.com>
+# Copyright 2024 Trilitech <contact@trili.tech>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module providing the history of the benchmark results.
+
+Each benchmark run is stored in a local SQLite database, each result
+being tagged with the version and the git commit reported by the app.
+
+Usage, from the test directory:
+  - `python -m utils.benchmark_history list`: list the benchmarked commits
+  - `python -m utils.benchmark_history compare <commit> <commit>`:
+    flag the regressions of the second commit against the first one,
+    in latency, throughput and memory
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Generator, List, Optional, Tuple
+
+from utils.benchmark import BENCHMARKS_DIR, BenchmarkRecorder
+
+HISTORY_PATH = BENCHMARKS_DIR / "history.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    started_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    case_name TEXT NOT NULL,
+    app_version TEXT NOT NULL,
+    app_commit TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    mean REAL NOT NULL,
+    min REAL NOT NULL,
+    p50 REAL NOT NULL,
+    p90 REAL NOT NULL,
+    p99 REAL NOT NULL,
+    max REAL NOT NULL,
+    throughput REAL,
+    PRIMARY KEY (run_id, case_name)
+);
+CREATE INDEX IF NOT EXISTS results_commit ON results (app_commit);
+"""
+
+LATENCY_METRICS = ["mean", "p50", "p90", "p99"]
+# Tags of the results measuring memory, in bytes
+MEMORY_TAGS = ["static_ram", "globals_size", "stack_peak"]
+
+class Regression:
+    """Class representing the comparison of a metric between two commits."""
+
+    case: str
+    metric: str
+    base: float
+    head: float
+    # Relative degradation in percent, positive when head is worse
+    degradation: float
+
+    def __init__(self, case: str, metric: str, base: float, head: float, degradation: float):
+        self.case = case
+        self.metric = metric
+        self.base = base
+        self.head = head
+        self.degradation = degradation
+
+    def __repr__(self) -> str:
+        return f"{self.case} {self.metric}: {self.base:.6g} -> {self.head:.6g} " \
+            f"({self.degradation:+.1f}%)"
+
+class BenchmarkHistory:
+    """Class representing the SQLite store of the benchmark runs."""
+
+    path: Path
+
+    def __init__(self, path: Path = HISTORY_PATH):
+        self.path = path
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Generator[sqlite3.Connection, None, None]:
+        """Open a connection, committed on success, and close it."""
+        connection = sqlite3.connect(self.path)
+        connection.row_factory = sqlite3.Row
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def add_run(self, recorder: BenchmarkRecorder) -> int:
+        """Store a benchmark run, return its identifier.
+
+        Each result must be tagged with its `app_commit`, and with its
+        `app_version` when the app was benchmarked.
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "INSERT INTO runs (name, started_at) VALUES (?, ?)",
+                (recorder.name, recorder.started_at)
+            )
+            run_id = cursor.lastrowid
+            assert run_id is not None
+            for case, result in recorder.results.items():
+                tags = dict(result["tags"])
+                stats = result["stats"]
+                connection.execute(
+                    "INSERT INTO results VALUES "
+                    "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        run_id,
+                        case,
+                        tags.pop("app_version", ""),
+                        tags.pop("app_commit"),
+                        json.dumps(tags, sort_keys=True),
+                        stats["count"],
+                        stats["mean"],
+                        stats["min"],
+                        stats["p50"],
+                        stats["p90"],
+                        stats["p99"],
+                        stats["max"],
+                        stats.get("throughput"),
+                    )
+                )
+        return run_id
+
+    def commits(self) -> List[Tuple[str, str, int, str]]:
+        """Return the benchmarked (commit, version, number of results, last run date)."""
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT app_commit, app_version, COUNT(*), MAX(started_at) "
+                "FROM results JOIN runs ON runs.id = results.run_id "
+                "GROUP BY app_commit, app_version ORDER BY MAX(runs.id)"
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def latest_results(self, commit: str) -> Dict[str, Dict[str, Any]]:
+        """Return the latest result of each case benchmarked on `commit`.
+
+        `commit` can be any part of the commit reported by the app. The
+        commit reported exactly is preferred over the ones containing it,
+        e.g. over the builds with options, reported as `<commit>+<option>`.
+        """
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT results.* FROM results JOIN runs ON runs.id = results.run_id "
+                "WHERE instr(app_commit, ?) > 0 ORDER BY runs.id",
+                (commit,)
+            ).fetchall()
+        exact_rows = [row for row in rows if row["app_commit"] == commit]
+        if exact_rows:
+            rows = exact_rows
+        # Later runs override earlier ones
+        return {row["case_name"]: dict(row) for row in rows}
+
+    def compare(self,
+                base_commit: str,
+                head_commit: str,
+                latency_threshold: float,
+                throughput_threshold: float,
+                memory_threshold: float = 0.0) -> Tuple[List[Regression], List[str]]:
+        """Compare the results of `head_commit` against `base_commit`.
+
+        Thresholds are relative degradations in percent. The memory is
+        compared on the `MEMORY_TAGS` of the results. Return the
+        regressions and the cases missing in one of the commits.
+        """
+        base = self.latest_results(base_commit)
+        head = self.latest_results(head_commit)
+        assert base, f"No benchmark result for commit {base_commit}"
+        assert head, f"No benchmark result for commit {head_commit}"
+
+        regressions = []
+        for case in sorted(base.keys() & head.keys()):
+            for metric in LATENCY_METRICS:
+                degradation = (head[case][metric] - base[case][metric]) \
+                    / base[case][metric] * 100
+                if degradation > latency_threshold:
+                    regressions.append(Regression(
+                        case, metric, base[case][metric], head[case][metric], degradation
+                    ))
+            base_throughput: Optional[float] = base[case]["throughput"]
+            head_throughput: Optional[float] = head[case]["throughput"]
+            if base_throughput and head_throughput is not None:
+                degradation = (base_throughput - head_throughput) / base_throughput * 100
+                if degradation > throughput_threshold:
+                    regressions.append(Regression(
+                        case, "throughput", base_throughput, head_throughput, degradation
+                    ))
+            base_tags = json.loads(base[case]["tags"])
+            head_tags = json.loads(head[case]["tags"])
+            for tag in MEMORY_TAGS:
+                if not base_tags.get(tag) or head_tags.get(tag) is None:
+                    continue
+                degradation = (head_tags[tag] - base_tags[tag]) / base_tags[tag] * 100
+                if degradation > memory_threshold:
+                    regressions.append(Regression(
+                        case, tag, base_tags[tag], head_tags[tag], degradation
+                    ))
+        missing = sorted(base.keys() ^ head.keys())
+        return regressions, missing
+
+def main() -> None:
+    """Command line interface of the benchmark history."""
+    parser = argparse.ArgumentParser(description="Inspect the benchmark history.")
+    parser.add_argument("--db", type=Path, default=HISTORY_PATH,
+                        help="Path of the history database")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="List the benchmarked commits")
+    compare_parser = subparsers.add_parser(
+        "compare", help="Flag the regressions of a commit against a base commit")
+    compare_parser.add_argument("base", help="Base commit")
+    compare_parser.add_argument("head", help="Compared commit")
+    compare_parser.add_argument("--latency-threshold", type=float, default=10.0,
+                                help="Tolerated latency increase, in percent")
+    compare_parser.add_argument("--throughput-threshold", type=float, default=10.0,
+                                help="Tolerated throughput decrease, in percent")
+    compare_parser.add_argument("--memory-threshold", type=float, default=0.0,
+                                help="Tolerated memory increase, in percent")
+    args = parser.parse_args()
+
+    history = BenchmarkHistory(args.db)
+    if args.command == "list":
+        for commit, version, count, last_run in history.commits():
+            print(f"{commit} (version {version}): {count} results, last run {last_run}")
+        return
+
+    regressions, missing = history.compare(
+        args.base,
+        args.head,
+        args.latency_threshold,
+        args.throughput_threshold,
+        args.memory_threshold
+    )
+    for case in missing:
+        print(f"Not benchmarked on both commits: {case}")
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+    print("No regression")
+
+if __name__ == "__main__":
+    main()
@@ -15,17 +15,22 @@
 
 """Module providing a tezos client."""
 
-from typing import Tuple, Optional, Generator
+import time
+from typing import Dict, Tuple, Optional, Generator
 from enum import IntEnum
 from contextlib import contextmanager
 
 from ragger.utils import RAPDU
 from ragger.backend import BackendInterface
 from ragger.error import ExceptionRAPDU
-from pytezos.michelson import forge
 from utils.account import Account, SigScheme, BipPath, Signature
-from utils.helper import BytesReader
+from utils.apdu_trace import ApduTracer, NO_RESPONSE
+from utils.helper import BytesReader, LazyImport
+from utils.latency import is_profiling, phase
 from utils.message import Message
+from utils.metrics import ClientMetrics
+
+forge = LazyImport("pytezos.michelson.forge")
 
 class Version:
     """Class representing the version."""
@@ -118,6 +123,38 @@ class Hwm:
 
         return Hwm(highest_level, highest_round)
 
+class NvramStats:
+    """Class representing the NVRAM writes of an instruction."""
+
+    writes: int
+    bytes: int
+
+    def __init__(self, writes: int, bytes_written: int):
+        self.writes = writes
+        self.bytes = bytes_written
+
+    def __repr__(self) -> str:
+        return f"(Writes={self.writes}, Bytes={self.bytes})"
+
+    def __eq__(self, other: object):
+        if not isinstance(other, NvramStats):
+            return NotImplemented
+        return self.writes == other.writes and self.bytes == other.bytes
+
+class StackStats:
+    """Class representing the peak stack usage of the instructions."""
+
+    size: int
+    # instruction code -> peak stack usage, in bytes
+    peaks: Dict[int, int]
+
+    def __init__(self, size: int, peaks: Dict[int, int]):
+        self.size = size
+        self.peaks = peaks
+
+    def __repr__(self) -> str:
+        return f"(Size={self.size}, Peaks={self.peaks})"
+
 class Cla(IntEnum):
     """Class representing APDU class."""
 
@@ -143,14 +180,37 @@ class Ins(IntEnum):
     RESET                     = 0x06
     SETUP                     = 0x0a
     SIGN_WITH_HASH            = 0x0f
+    QUERY_DEBUG_STATS         = 0x10
+
+
+class DebugStats(IntEnum):
+    """Class representing the kinds of debug statistics."""
+
+    NVRAM = 0x00
+    STACK = 0x01
+    SIGN  = 0x02
+
+
+class SignPhase(IntEnum):
+    """Class representing the phases of the SIGN instruction, in order."""
+
+    NONE    = 0x00
+    RECEIVE = 0x01
+    PARSE   = 0x02
+    HASH    = 0x03
+    NVRAM   = 0x04
+    SIGN    = 0x05
+    UI      = 0x06
 
 
 class Index(IntEnum):
     """Class representing packet index."""
 
-    FIRST = 0x00
-    OTHER = 0x01
-    LAST  = 0x81
+    FIRST          = 0x00
+    OTHER          = 0x01
+    OTHER_WITH_HWM = 0x41  # Rejected: the HWM is only sent with the last packet
+    LAST           = 0x81
+    LAST_WITH_HWM  = 0xc1
 
 
 class StatusCode(IntEnum):
@@ -186,36 +246,128 @@ class StatusCode(IntEnum):
                 f"Expect fail with { self.name } but fail with {name}"
 
 
+def _status_name(status: int) -> str:
+    if status == NO_RESPONSE:
+        return "NO_RESPONSE"
+    try:
+        return StatusCode(status).name
+    except ValueError:
+        return f"0x{status:04x}"
+
 MAX_APDU_SIZE: int = 235
 
 class TezosClient:
-    """Class representing the tezos app client."""
+    """Class representing the tezos app client.
+
+    When a tracer is given, each exchange is recorded in it. When
+    metrics are given, each exchange is counted in them.
+    """
 
     backend: BackendInterface
+    tracer: Optional[ApduTracer]
+    metrics: Optional[ClientMetrics]
 
 
-    def __init__(self, backend) -> None:
+    def __init__(self,
+                 backend,
+                 tracer: Optional[ApduTracer] = None,
+                 metrics: Optional[ClientMetrics] = None) -> None:
         self.backend = backend
+        self.tracer = tracer
+        self.metrics = metrics
+
+    def _send_apdu(self,
+                   ins: Ins,
+                   index: int,
+                   sig_scheme: int,
+                   payload: bytes) -> RAPDU:
+        if not is_profiling():
+            return self.backend.exchange(Cla.DEFAULT,
+                                         ins,
+                                         p1=index,
+                                         p2=sig_scheme,
+                                         data=payload)
+
+        # The exchange is split to separate the transport from the
+        # time the device takes to respond
+        with phase(ins.name):
+            with phase("transport"):
+                self.backend.send(Cla.DEFAULT,
+                                  ins,
+                                  p1=index,
+                                  p2=sig_scheme,
+                                  data=payload)
+            with phase("device"):
+                return self.backend.receive()
 
     def _exchange(self,
                   ins: Ins,
-                  index: Index = Index.FIRST,
-                  sig_scheme: SigScheme = SigScheme.DEFAULT,
+                  index: int = Index.FIRST,
+                  sig_scheme: int = SigScheme.DEFAULT,
                   payload: bytes = b'') -> bytes:
 
         assert len(payload) <= MAX_APDU_SIZE, "Apdu too large"
 
-        rapdu: RAPDU = self.backend.exchange(Cla.DEFAULT,
-                                             ins,
-                                             p1=index,
-                                             p2=sig_scheme,
-                                             data=payload)
+        if self.tracer is None and self.metrics is None:
+            rapdu = self._send_apdu(ins, index, sig_scheme, payload)
+        else:
+            start_ns = time.monotonic_ns()
+            status = NO_RESPONSE
+            response_length = 0
+            try:
+                rapdu = self._send_apdu(ins, index, sig_scheme, payload)
+                status = rapdu.status
+                response_length = len(rapdu.data)
+            finally:
+                end_ns = time.monotonic_ns()
+                if self.tracer is not None:
+                    self.tracer.record(
+                        start_ns,
+                        end_ns,
+                        ins,
+                        index,
+                        sig_scheme,
+                        status,
+                        len(payload),
+                        response_length
+                    )
+                if self.metrics is not None:
+                    self.metrics.observe(
+                        ins.name,
+                        None if status == StatusCode.OK else _status_name(status),
+                        (end_ns - start_ns) / 1e9
+                    )
 
         if rapdu.status != StatusCode.OK:
             raise ExceptionRAPDU(rapdu.status, rapdu.data)
 
         return rapdu.data
 
+    def _send_message(self,
+                      ins: Ins,
+                      message: Message,
+                      last_index: Index,
+                      chunk_size: int = MAX_APDU_SIZE,
+                      other_index: Index = Index.OTHER) -> bytes:
+        """Send `message` in packets of at most `chunk_size` bytes.
+
+        All packets are sent with `other_index` but the last one, sent
+        with `last_index`, whose response is returned.
+        """
+
+        assert 0 < chunk_size <= MAX_APDU_SIZE, "Invalid chunk size"
+
+        raw_message = bytes(message)
+        chunks = [
+            raw_message[offset:offset + chunk_size]
+            for offset in range(0, len(raw_message), chunk_size)
+        ] or [b'']
+
+        for chunk in chunks[:-1]:
+            self._exchange(ins=ins, index=other_index, payload=chunk)
+
+        return self._exchange(ins=ins, index=last_index, payload=chunks[-1])
+
     def version(self) -> Version:
         """Send the VERSION instruction."""
         return Version.from_bytes(self._exchange(ins=Ins.VERSION))
@@ -320,20 +472,99 @@ class TezosClient:
 
         return (main_chain_id, main_hwm, test_hwm)
 
-    def sign_message(self,
-                     account: Account,
-                     message: Message) -> Signature:
-        """Send the SIGN instruction."""
+    def nvram_stats(self, reset: bool = False) -> Dict[int, NvramStats]:
+        """Send the QUERY_DEBUG_STATS instruction for the NVRAM writes.
+
+        Return the NVRAM writes of each instruction code since the
+        start of the app or the last reset. Only available in the
+        builds with `DEBUG_STATS=1`.
+        """
+        raw_data = self._exchange(
+            ins=Ins.QUERY_DEBUG_STATS,
+            index=DebugStats.NVRAM,
+            sig_scheme=int(reset))
+
+        reader = BytesReader(raw_data)
+        stats: Dict[int, NvramStats] = {}
+        while not reader.has_finished():
+            ins = reader.read_int(1)
+            writes = reader.read_int(4)
+            bytes_written = reader.read_int(4)
+            stats[ins] = NvramStats(writes, bytes_written)
+
+        return stats
+
+    def stack_stats(self, reset: bool = False) -> StackStats:
+        """Send the QUERY_DEBUG_STATS instruction for the peak stack usage.
+
+        Return the size of the stack and the peak stack usage of each
+        instruction code since the start of the app or the last
+        reset. The usage of an instruction is only known once the
+        next instruction starts. Only available in the builds with
+        `DEBUG_STATS=1`.
+        """
+        raw_data = self._exchange(
+            ins=Ins.QUERY_DEBUG_STATS,
+            index=DebugStats.STACK,
+            sig_scheme=int(reset))
+
+        reader = BytesReader(raw_data)
+        size = reader.read_int(2)
+        peaks: Dict[int, int] = {}
+        while not reader.has_finished():
+            ins = reader.read_int(1)
+            peaks[ins] = reader.read_int(2)
+
+        return StackStats(size, peaks)
+
+    def sign_phases(self, stop_phase: SignPhase = SignPhase.NONE) -> SignPhase:
+        """Send the QUERY_DEBUG_STATS instruction for the SIGN phases.
+
+        Return the last phase done by the last SIGN instruction. The
+        next SIGN instructions stop after `stop_phase`, answering
+        without data when stopped before the signature. Only available
+        in the builds with `DEBUG_STATS=1`.
+        """
+        raw_data = self._exchange(
+            ins=Ins.QUERY_DEBUG_STATS,
+            index=DebugStats.SIGN,
+            sig_scheme=stop_phase)
+
+        reader = BytesReader(raw_data)
+        phase = SignPhase(reader.read_int(1))
+        reader.assert_finished()
+
+        return phase
+
+    def sign_message_raw(self,
+                         account: Account,
+                         message: Message,
+                         chunk_size: int = MAX_APDU_SIZE,
+                         last_index: Index = Index.LAST,
+                         other_index: Index = Index.OTHER) -> bytes:
+        """Send the SIGN instruction, return the undecoded response.
+
+        The message is sent in packets of at most `chunk_size` bytes,
+        sent with `other_index` but the last one, sent with `last_index`.
+        """
 
         self._exchange(
             ins=Ins.SIGN,
             sig_scheme=account.sig_scheme,
             payload=bytes(account.path))
 
-        signature = self._exchange(
-            ins=Ins.SIGN,
-            index=Index.LAST,
-            payload=bytes(message))
+        return self._send_message(Ins.SIGN, message, last_index, chunk_size, other_index)
+
+    def sign_message(self,
+                     account: Account,
+                     message: Message,
+                     chunk_size: int = MAX_APDU_SIZE) -> Signature:
+        """Send the SIGN instruction.
+
+        The message is sent in packets of at most `chunk_size` bytes.
+        """
+
+        signature = self.sign_message_raw(account, message, chunk_size)
 
         return Signature.from_bytes(signature, account.sig_scheme)
 
@@ -347,10 +578,7 @@ class TezosClient:
             sig_scheme=account.sig_scheme,
             payload=bytes(account.path))
 
-        data = self._exchange(
-            ins=Ins.SIGN_WITH_HASH,
-            index=Index.LAST,
-            payload=bytes(message))
+        data = self._send_message(Ins.SIGN_WITH_HASH, message, Index.LAST)
 
         return (
             data[:Message.HASH_SIZE],
@@ -360,6 +588,46 @@ class TezosClient:
             )
         )
 
+    def sign_message_with_hwm(self,
+                              account: Account,
+                              message: Message) -> Tuple[Signature, Hwm]:
+        """Send the SIGN instruction, requesting the main HWM after the signature."""
+
+        self._exchange(
+            ins=Ins.SIGN,
+            sig_scheme=account.sig_scheme,
+            payload=bytes(account.path))
+
+        data = self._send_message(Ins.SIGN, message, Index.LAST_WITH_HWM)
+
+        hwm_length = Hwm.raw_length(migrated=True)
+        return (
+            Signature.from_bytes(data[:-hwm_length], account.sig_scheme),
+            Hwm.from_bytes(data[-hwm_length:])
+        )
+
+    def sign_message_with_hash_and_hwm(self,
+                                       account: Account,
+                                       message: Message) -> Tuple[bytes, Signature, Hwm]:
+        """Send the SIGN_WITH_HASH instruction, requesting the main HWM after the signature."""
+
+        self._exchange(
+            ins=Ins.SIGN_WITH_HASH,
+            sig_scheme=account.sig_scheme,
+            payload=bytes(account.path))
+
+        data = self._send_message(Ins.SIGN_WITH_HASH, message, Index.LAST_WITH_HWM)
+
+        hwm_length = Hwm.raw_length(migrated=True)
+        return (
+            data[:Message.HASH_SIZE],
+            Signature.from_bytes(
+                data[Message.HASH_SIZE:-hwm_length],
+                account.sig_scheme
+            ),
+            Hwm.from_bytes(data[-hwm_length:])
+        )
+
     def hmac(self,
              account: Account,
              message: bytes) -> bytes:
@@ -15,7 +15,39 @@
 
 """Module of test helper functions."""
 
-import git
+import importlib
+from typing import Any, Optional
+
+class LazyImport:
+    """Class representing a module, or one of its attributes, imported on first use.
+
+    Heavy dependencies are imported this way so that importing the
+    test helpers, and collecting the tests, stays fast.
+    """
+
+    _module_name: str
+    _attribute: Optional[str]
+    _imported: Any
+
+    def __init__(self, module_name: str, attribute: Optional[str] = None):
+        self._module_name = module_name
+        self._attribute = attribute
+        self._imported = None
+
+    def _resolve(self) -> Any:
+        if self._imported is None:
+            module = importlib.import_module(self._module_name)
+            self._imported = module if self._attribute is None else \
+                getattr(module, self._attribute)
+        return self._imported
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._resolve(), name)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self._resolve()(*args, **kwargs)
+
+git = LazyImport("git")
 
 class BytesReader:
     """Class representing a bytes reader."""
@@ -0,0 +1,135 @@
+# Copyright 2024 Functori <contact@functori.com>
+# Copyright 2024 Trilitech <contact@trili.tech>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module building and running the host programs of `test/host`.
+
+The host programs run parts of the application sources on the host
+machine, with stubs of the SDK, see `test/host/Makefile`.
+"""
+
+import shutil
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+
+from utils.unsafe_op_model import SigningKey
+
+HOST_DIR = Path(__file__).parent.parent / "host"
+
+# Mirrors `MAX_OPERATION_SIZE` of `test/host/parse_operations.c`
+MAX_HOST_OPERATION_SIZE = 4096
+
+# Tags of the forged implicit addresses, by `signature_type_t` of `src/types.h`
+_ADDRESS_TAGS = {1: 1, 2: 2, 3: 0}
+
+def build_host_program(name: str) -> Path:
+    """Build the host program `name`, skip the test if no compiler is available."""
+    if shutil.which("make") is None or shutil.which("cc") is None:
+        pytest.skip("Building the host programs requires make and cc")
+    subprocess.run(
+        ["make", "--no-print-directory", "-C", str(HOST_DIR), f"build/{name}"],
+        check=True,
+        capture_output=True
+    )
+    return HOST_DIR / "build" / name
+
+def run_hwm_journal(program: Path, commands: List[str]) -> List[Dict[str, str]]:
+    """Run the HWM journal `commands`, return the state printed by each `boot`."""
+    result = subprocess.run(
+        [str(program)],
+        input="\n".join(commands) + "\n",
+        check=True,
+        capture_output=True,
+        text=True
+    )
+    return [
+        dict(field.split("=", 1) for field in line.split())
+        for line in result.stdout.splitlines()
+    ]
+
+class HostParsedOperation:
+    """Class representing an unsafe operation parsed by a host parser."""
+
+    exception: int
+    completed: bool
+    tag: int
+    total_fee: int
+    total_storage_limit: int
+    has_reveal: bool
+    # Forged delegate of the delegation, None when not present
+    delegate: Optional[bytes]
+
+    def __init__(self, line: str):
+        fields = line.split()
+        self.exception = int(fields[0], 16)
+        self.completed = fields[1] == "1"
+        self.tag = int(fields[2])
+        self.total_fee = int(fields[3])
+        self.total_storage_limit = int(fields[4])
+        self.has_reveal = fields[5] == "1"
+        signature_type = int(fields[6])
+        self.delegate = None if signature_type == 0 else \
+            bytes([_ADDRESS_TAGS[signature_type]]) + bytes.fromhex(fields[8])
+
+    @property
+    def is_valid(self) -> bool:
+        """Whether the operation was parsed entirely without error."""
+        return self.exception == 0x9000 and self.completed
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, HostParsedOperation) and vars(self) == vars(other)
+
+    def __repr__(self) -> str:
+        return f"HostParsedOperation({vars(self)})"
+
+def _run_parse_operations(program: Path,
+                          key: SigningKey,
+                          operations: List[bytes],
+                          args: List[str]) -> subprocess.CompletedProcess:
+    """Run the host parser `program` on the `operations` signed by `key`."""
+    signer = f"{key.address[1:].hex()} {key.public_key[1:].hex()} {key.address[0]}"
+    return subprocess.run(
+        [str(program)] + args,
+        input="".join(f"{signer} {raw[1:].hex()}\n" for raw in operations),
+        check=True,
+        capture_output=True,
+        text=True
+    )
+
+def parse_operations_on_host(program: Path,
+                             key: SigningKey,
+                             operations: List[bytes],
+                             chunk_size: int = 0) -> List[HostParsedOperation]:
+    """Parse the `operations` signed by `key`, given to the parser in chunks of `chunk_size` bytes.
+
+    The operations are forged with their magic byte. The whole
+    operation is given at once if `chunk_size` is 0.
+    """
+    result = _run_parse_operations(program, key, operations, [str(chunk_size)])
+    return [HostParsedOperation(line) for line in result.stdout.splitlines()]
+
+def time_parse_operations_on_host(program: Path,
+                                  key: SigningKey,
+                                  operations: List[bytes],
+                                  repetitions: int) -> Tuple[int, float]:
+    """Parse the `operations` signed by `key` `repetitions` times.
+
+    Return the number of bytes parsed and the parsing time, in seconds.
+    """
+    result = _run_parse_operations(program, key, operations, ["0", str(repetitions)])
+    timing = dict(field.split("=", 1) for field in result.stderr.split())
+    return int(timing["bytes"]), int(timing["ns"]) / 1e9
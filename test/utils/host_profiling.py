@@ -0,0 +1,65 @@
+# Copyright 2024 Functori <contact@functori.com>
+# Copyright 2024 Trilitech <contact@trili.tech>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module profiling the host side of the tests.
+
+  - `cpu_profile` runs cProfile and writes the statistics in a .pstats
+    file, readable with `python -m pstats` or snakeviz,
+  - `memory_profile` runs tracemalloc and writes the allocations grown
+    in the context, by line, in a text file.
+"""
+
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Generator
+
+@contextmanager
+def cpu_profile(path: Path) -> Generator[None, None, None]:
+    """Profile the CPU time of the context in `path`."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(path)
+
+@contextmanager
+def memory_profile(path: Path, limit: int = 50) -> Generator[None, None, None]:
+    """Write the `limit` largest allocation growths of the context in `path`."""
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    try:
+        yield
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+        if not was_tracing:
+            tracemalloc.stop()
+        differences = after.compare_to(before, "lineno")
+        lines = [
+            f"Total growth: {sum(diff.size_diff for diff in differences) / 1024:.1f} KiB "
+            f"in {sum(diff.count_diff for diff in differences)} blocks, "
+            f"peak traced memory: {peak / 1024:.1f} KiB",
+        ]
+        lines += [str(diff) for diff in differences[:limit]]
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("\n".join(lines) + "\n")
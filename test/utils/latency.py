@@ -0,0 +1,183 @@
+# Copyright 2024 Functori <contact@functori.com>
+# Copyright 2024 Trilitech <contact@trili.tech>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module decomposing the latency of the requests into phases.
+
+The client and message layers open phases with `phase`, which does
+nothing unless a `LatencyProfiler` is active on the current thread
+(see `profiling`):
+  - `forge`: forging of a message on the host,
+  - `<INS>`: an APDU exchange, made of:
+    - `transport`: sending the APDU to the device,
+    - `device`: waiting for the device response.
+
+The backend and the navigator also open `startup`, `snapshot` and
+`navigation` phases, used by the test time breakdown.
+
+Phases nest, each one being identified by its stack of phase names.
+The profiler aggregates the duration of each stack into a histogram
+and exports the self time of each stack in the folded format read by
+flamegraph.pl, inferno or speedscope.
+"""
+
+import math
+import threading
+import time
+from contextlib import ExitStack, contextmanager, nullcontext
+from pathlib import Path
+from typing import ContextManager, Dict, Generator, List, Tuple
+
+from utils.benchmark import LatencyStats
+
+Stack = Tuple[str, ...]
+
+class Histogram:
+    """Class representing a histogram of durations, in seconds.
+
+    Buckets are powers of two of microseconds: the bucket `n` counts
+    the durations in [2^(n-1), 2^n[ microseconds.
+    """
+
+    counts: Dict[int, int]
+
+    def __init__(self, samples: List[float]):
+        self.counts = {}
+        for sample in samples:
+            bucket = max(0, math.ceil(math.log2(max(sample * 1e6, 1))))
+            self.counts[bucket] = self.counts.get(bucket, 0) + 1
+
+    @staticmethod
+    def _bound(bucket: int) -> str:
+        bound = 2 ** bucket
+        if bound >= 1000:
+            return f"{bound / 1000:.3g}ms"
+        return f"{bound}us"
+
+    def render(self, width: int = 40) -> List[str]:
+        """Return the lines of a text rendering of the histogram."""
+        if not self.counts:
+            return []
+        highest = max(self.counts.values())
+        lines = []
+        for bucket in range(min(self.counts), max(self.counts) + 1):
+            count = self.counts.get(bucket, 0)
+            bar = "#" * math.ceil(count * width / highest)
+            lines.append(f"  < {self._bound(bucket):>9} {count:6} {bar}")
+        return lines
+
+class LatencyProfiler:
+    """Class collecting the time spent in nested phases."""
+
+    durations: Dict[Stack, List[float]]
+    # Time spent in each stack, excluding its sub-phases
+    self_times: Dict[Stack, float]
+    # Frames of the opened phases: name, start, time spent in sub-phases
+    _frames: List[List]
+
+    def __init__(self):
+        self.durations = {}
+        self.self_times = {}
+        self._frames = []
+
+    @contextmanager
+    def phase(self, name: str) -> Generator[None, None, None]:
+        """Time the phase `name`, nested in the current phase."""
+        frame = [name, time.perf_counter(), 0.0]
+        self._frames.append(frame)
+        stack = tuple(opened[0] for opened in self._frames)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - frame[1]
+            self._frames.pop()
+            if self._frames:
+                self._frames[-1][2] += elapsed
+            self.durations.setdefault(stack, []).append(elapsed)
+            self.self_times[stack] = self.self_times.get(stack, 0.0) + elapsed - frame[2]
+
+    def phase_durations(self, name: str) -> List[float]:
+        """Return the durations of the phases `name`, whatever their stack."""
+        return [
+            duration
+            for stack, durations in self.durations.items()
+            if stack[-1] == name
+            for duration in durations
+        ]
+
+    def stats(self) -> Dict[Stack, LatencyStats]:
+        """Return the latency statistics of each stack."""
+        return {stack: LatencyStats(durations) for stack, durations in self.durations.items()}
+
+    def report(self) -> str:
+        """Return the statistics and histogram of each stack."""
+        lines = []
+        for stack, stats in sorted(self.stats().items()):
+            lines.append(f"{';'.join(stack)}: {stats}")
+            lines += Histogram(self.durations[stack]).render()
+        return "\n".join(lines)
+
+    def folded(self) -> str:
+        """Return the self time of each stack, in microseconds, in the folded format."""
+        return "".join(
+            f"{';'.join(stack)} {round(self_time * 1e6)}\n"
+            for stack, self_time in sorted(self.self_times.items())
+        )
+
+    def write_folded(self, path: Path) -> None:
+        """Write the folded stacks in `path`."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(self.folded())
+
+# Active profilers, with the thread they profile
+_active_profilers: List[Tuple[LatencyProfiler, int]] = []
+
+def _thread_profilers() -> List[LatencyProfiler]:
+    thread = threading.get_ident()
+    return [profiler for profiler, owner in _active_profilers if owner == thread]
+
+def is_profiling() -> bool:
+    """Return if a profiler is active on the current thread."""
+    return bool(_thread_profilers())
+
+@contextmanager
+def _phases(profilers: List[LatencyProfiler], name: str) -> Generator[None, None, None]:
+    with ExitStack() as stack:
+        for profiler in profilers:
+            stack.enter_context(profiler.phase(name))
+        yield
+
+def phase(name: str) -> ContextManager[None]:
+    """Time the phase `name` on the profilers active on the current thread."""
+    profilers = _thread_profilers()
+    if not profilers:
+        return nullcontext()
+    if len(profilers) == 1:
+        return profilers[0].phase(name)
+    return _phases(profilers, name)
+
+@contextmanager
+def profiling(profiler: LatencyProfiler) -> Generator[LatencyProfiler, None, None]:
+    """Activate `profiler` on the current thread within the context.
+
+    Phases opened by other threads, e.g. by a navigation running
+    alongside a request, are ignored: their time is accounted to the
+    phase the current thread waits in.
+    """
+    entry = (profiler, threading.get_ident())
+    _active_profilers.append(entry)
+    try:
+        yield profiler
+    finally:
+        _active_profilers.remove(entry)
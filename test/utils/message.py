@@ -17,12 +17,15 @@
 
 from abc import ABC, abstractmethod
 from enum import IntEnum
-from hashlib import blake2b
-from typing import Optional, Union
-from pytezos import pytezos
-from pytezos.operation.group import OperationGroup
-from pytezos.block.forge import forge_int_fixed, forge_fitness
-from pytezos.michelson import forge
+from functools import lru_cache
+from hashlib import blake2b, sha256
+from typing import Dict, List, Optional, Union
+from utils.helper import LazyImport
+from utils.latency import phase
+
+forge_int_fixed = LazyImport("pytezos.block.forge", "forge_int_fixed")
+forge_fitness = LazyImport("pytezos.block.forge", "forge_fitness")
+forge = LazyImport("pytezos.michelson.forge")
 
 class Message(ABC):
     """Class representing a message."""
@@ -105,44 +108,157 @@ DEFAULT_TIMESTAMP = "1970-01-01T00:00:00-00:00"
 # Context_hash.zero
 DEFAULT_CONTEXT_HASH = "CoUeJrcPBj3T3iJL3PY4jZHnmZa5rRZ87VQPdSBNBcwZRMWJGh9j"
 
+_BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+_BASE58_INDEX: Dict[str, int] = {char: index for index, char in enumerate(_BASE58_ALPHABET)}
+
+_IMPLICIT_ADDRESS_TAGS: Dict[str, int] = {"tz1": 0, "tz2": 1, "tz3": 2, "tz4": 3}
+_PUBLIC_KEY_TAGS: Dict[str, int] = {"edpk": 0, "sppk": 1, "p2pk": 2}
+
+# The same few addresses and keys are forged over and over
+@lru_cache(maxsize=1024)
+def _base58check_decode(value: str, prefix: str, prefix_length: int) -> bytes:
+    """Decode a base58check `value` and drop its `prefix_length` bytes of prefix."""
+    if not value.startswith(prefix):
+        raise ValueError(f"Expected {prefix} prefix in {value}")
+    number = 0
+    try:
+        for char in value:
+            number = number * 58 + _BASE58_INDEX[char]
+    except KeyError as e:
+        raise ValueError(f"Invalid base58 character in {value}") from e
+    leading_zeros = len(value) - len(value.lstrip("1"))
+    data = bytes(leading_zeros) + number.to_bytes((number.bit_length() + 7) // 8, "big")
+    payload, checksum = data[:-4], data[-4:]
+    if sha256(sha256(payload).digest()).digest()[:4] != checksum:
+        raise ValueError(f"Invalid base58 checksum in {value}")
+    return payload[prefix_length:]
+
+def _write_nat(buffer: bytearray, value: int) -> None:
+    """Write a natural number in the zarith encoding."""
+    if value < 0:
+        raise ValueError(f"Expected a natural number, got {value}")
+    while value >= 0x80:
+        buffer.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+def _write_implicit_address(buffer: bytearray, address: str) -> None:
+    """Write an implicit account address, i.e. a public key hash."""
+    prefix = address[:3]
+    if prefix not in _IMPLICIT_ADDRESS_TAGS:
+        raise ValueError(f"Unsupported implicit address prefix {prefix}")
+    buffer.append(_IMPLICIT_ADDRESS_TAGS[prefix])
+    buffer += _base58check_decode(address, prefix, 3)
+
+def _write_public_key(buffer: bytearray, public_key: str) -> None:
+    """Write a public key."""
+    prefix = public_key[:4]
+    if prefix not in _PUBLIC_KEY_TAGS:
+        raise ValueError(f"Unsupported public key prefix {prefix}")
+    buffer.append(_PUBLIC_KEY_TAGS[prefix])
+    buffer += _base58check_decode(public_key, prefix, 4)
+
+def forge_implicit_address(address: str) -> bytes:
+    """Forge an implicit account address, i.e. a public key hash."""
+    buffer = bytearray()
+    _write_implicit_address(buffer, address)
+    return bytes(buffer)
+
+def forge_public_key(public_key: str) -> bytes:
+    """Forge a public key."""
+    buffer = bytearray()
+    _write_public_key(buffer, public_key)
+    return bytes(buffer)
+
 class UnsafeOp:
-    """Class representing an unsafe operation."""
+    """Class representing an unsafe operation.
 
-    operation: OperationGroup
+    The contents are forged natively, straight into a single buffer.
+    """
 
-    def __init__(self, operation: OperationGroup):
-        self.operation = operation
+    contents: List['ManagerOperation']
+
+    def __init__(self, contents: List['ManagerOperation']):
+        self.contents = contents
 
     def forge(self, branch: str = DEFAULT_BLOCK_HASH) -> Message:
         """Forge the operation."""
-        watermark = forge_int_fixed(MagicByte.UNSAFE_OP, 1)
-        self.operation.branch = branch
-        raw = watermark + bytes.fromhex(self.operation.forge())
-        return RawMessage(raw)
+        with phase("forge"):
+            raw = bytearray()
+            raw.append(MagicByte.UNSAFE_OP)
+            raw += _base58check_decode(branch, "B", 2)
+            for content in self.contents:
+                content.write(raw)
+            return RawMessage(bytes(raw))
 
     def merge(self, unsafe_op: 'UnsafeOp') -> 'UnsafeOp':
-        res = self.operation
-        for content in unsafe_op.operation.contents:
-            res = res.operation(content)
-        return UnsafeOp(res)
+        """Return the operation made of the contents of both operations."""
+        return UnsafeOp(self.contents + unsafe_op.contents)
 
-class Delegation(UnsafeOp):
-    """Class representing a delegation."""
+class ManagerOperation(UnsafeOp, ABC):
+    """Class representing a manager operation, forming an unsafe operation alone."""
+
+    source: str
+    counter: int
+    fee: int
+    gas_limit: int
+    storage_limit: int
 
     def __init__(self,
-                 delegate: str,
                  source: str,
                  counter: int = 0,
                  fee: int = 0,
                  gas_limit: int = 0,
                  storage_limit: int = 0):
-        ctxt = pytezos.using()
-        delegation = ctxt.delegation(delegate, source, counter, fee, gas_limit, storage_limit)
-        super().__init__(delegation)
+        self.source        = source
+        self.counter       = counter
+        self.fee           = fee
+        self.gas_limit     = gas_limit
+        self.storage_limit = storage_limit
+        super().__init__([self])
+
+    def write_header(self, buffer: bytearray, tag: OperationTag) -> None:
+        """Write the tag and the fields common to the manager operations."""
+        buffer.append(tag)
+        _write_implicit_address(buffer, self.source)
+        _write_nat(buffer, self.fee)
+        _write_nat(buffer, self.counter)
+        _write_nat(buffer, self.gas_limit)
+        _write_nat(buffer, self.storage_limit)
+
+    @abstractmethod
+    def write(self, buffer: bytearray) -> None:
+        """Write the content in `buffer`."""
+        raise NotImplementedError
+
+class Delegation(ManagerOperation):
+    """Class representing a delegation."""
+
+    delegate: Optional[str]
 
-class Reveal(UnsafeOp):
+    def __init__(self,
+                 delegate: Optional[str],
+                 source: str,
+                 counter: int = 0,
+                 fee: int = 0,
+                 gas_limit: int = 0,
+                 storage_limit: int = 0):
+        self.delegate = delegate
+        super().__init__(source, counter, fee, gas_limit, storage_limit)
+
+    def write(self, buffer: bytearray) -> None:
+        self.write_header(buffer, OperationTag.BABYLON_DELEGATION)
+        if self.delegate:
+            buffer.append(0xff)
+            _write_implicit_address(buffer, self.delegate)
+        else:
+            buffer.append(0x00)
+
+class Reveal(ManagerOperation):
     """Class representing a reveal."""
 
+    public_key: str
+
     def __init__(self,
                  public_key: str,
                  source: str,
@@ -150,9 +266,43 @@ class Reveal(UnsafeOp):
                  fee: int = 0,
                  gas_limit: int = 0,
                  storage_limit: int = 0):
-        ctxt = pytezos.using()
-        reveal = ctxt.reveal(public_key, source, counter, fee, gas_limit, storage_limit)
-        super().__init__(reveal)
+        self.public_key = public_key
+        super().__init__(source, counter, fee, gas_limit, storage_limit)
+
+    def write(self, buffer: bytearray) -> None:
+        self.write_header(buffer, OperationTag.BABYLON_REVEAL)
+        _write_public_key(buffer, self.public_key)
+
+class Transaction(ManagerOperation):
+    """Class representing a transaction, without parameters."""
+
+    destination: str
+    amount: int
+
+    def __init__(self,
+                 destination: str,
+                 source: str,
+                 amount: int = 0,
+                 counter: int = 0,
+                 fee: int = 0,
+                 gas_limit: int = 0,
+                 storage_limit: int = 0):
+        self.destination = destination
+        self.amount      = amount
+        super().__init__(source, counter, fee, gas_limit, storage_limit)
+
+    def write(self, buffer: bytearray) -> None:
+        self.write_header(buffer, OperationTag.BABYLON_TRANSACTION)
+        _write_nat(buffer, self.amount)
+        if self.destination.startswith("KT1"):
+            buffer.append(0x01)
+            buffer += _base58check_decode(self.destination, "KT1", 3)
+            buffer.append(0x00)
+        else:
+            buffer.append(0x00)
+            _write_implicit_address(buffer, self.destination)
+        # No parameters
+        buffer.append(0x00)
 
 class Preattestation:
     """Class representing a preattestation."""
@@ -185,14 +335,15 @@ class Preattestation:
               chain_id: str = DEFAULT_CHAIN_ID,
               branch: str = DEFAULT_BLOCK_HASH) -> Message:
         """Forge the preattestation."""
-        raw_operation = \
-            forge.forge_base58(branch) + \
-            bytes(self)
-        watermark = \
-            forge_int_fixed(MagicByte.TENDERBAKE_PREATTESTATION, 1) + \
-            forge.forge_base58(chain_id)
-        raw = watermark + raw_operation
-        return RawMessage(raw)
+        with phase("forge"):
+            raw_operation = \
+                forge.forge_base58(branch) + \
+                bytes(self)
+            watermark = \
+                forge_int_fixed(MagicByte.TENDERBAKE_PREATTESTATION, 1) + \
+                forge.forge_base58(chain_id)
+            raw = watermark + raw_operation
+            return RawMessage(raw)
 
 class Attestation:
     """Class representing an attestation."""
@@ -225,14 +376,15 @@ class Attestation:
               chain_id: str = DEFAULT_CHAIN_ID,
               branch: str = DEFAULT_BLOCK_HASH) -> Message:
         """Forge the attestation."""
-        raw_operation = \
-            forge.forge_base58(branch) + \
-            bytes(self)
-        watermark = \
-            forge_int_fixed(MagicByte.TENDERBAKE_ATTESTATION, 1) + \
-            forge.forge_base58(chain_id)
-        raw = watermark + raw_operation
-        return RawMessage(raw)
+        with phase("forge"):
+            raw_operation = \
+                forge.forge_base58(branch) + \
+                bytes(self)
+            watermark = \
+                forge_int_fixed(MagicByte.TENDERBAKE_ATTESTATION, 1) + \
+                forge.forge_base58(chain_id)
+            raw = watermark + raw_operation
+            return RawMessage(raw)
 
 class AttestationDal:
     """Class representing an attestation + DAL."""
@@ -269,14 +421,15 @@ class AttestationDal:
               chain_id: str = DEFAULT_CHAIN_ID,
               branch: str = DEFAULT_BLOCK_HASH) -> Message:
         """Forge the attestation + DAL."""
-        raw_operation = \
-            forge.forge_base58(branch) + \
-            bytes(self)
-        watermark = \
-            forge_int_fixed(MagicByte.TENDERBAKE_ATTESTATION, 1) + \
-            forge.forge_base58(chain_id)
-        raw = watermark + raw_operation
-        return RawMessage(raw)
+        with phase("forge"):
+            raw_operation = \
+                forge.forge_base58(branch) + \
+                bytes(self)
+            watermark = \
+                forge_int_fixed(MagicByte.TENDERBAKE_ATTESTATION, 1) + \
+                forge.forge_base58(chain_id)
+            raw = watermark + raw_operation
+            return RawMessage(raw)
 
 class Fitness:
     """Class representing a fitness."""
@@ -372,8 +525,9 @@ class Block:
 
     def forge(self, chain_id: str = DEFAULT_CHAIN_ID) -> Message:
         """Forge the block."""
-        watermark = \
-            forge_int_fixed(MagicByte.TENDERBAKE_BLOCK, 1) + \
-            forge.forge_base58(chain_id)
-        raw = watermark + bytes(self)
-        return RawMessage(raw)
+        with phase("forge"):
+            watermark = \
+                forge_int_fixed(MagicByte.TENDERBAKE_BLOCK, 1) + \
+                forge.forge_base58(chain_id)
+            raw = watermark + bytes(self)
+            return RawMessage(raw)
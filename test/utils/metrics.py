@@ -0,0 +1,152 @@
+# Copyright 2024 Functori <contact@functori.com>
+# Copyright 2024 Trilitech <contact@trili.tech>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module providing the metrics of a tezos client.
+
+The metrics are exposed in the Prometheus text format, written in a
+file (e.g. for the node exporter textfile collector) or served on
+localhost:
+  - `tezos_client_requests_total{ins}`: number of exchanges,
+  - `tezos_client_request_duration_seconds{ins}`: latency histogram,
+  - `tezos_client_errors_total{ins,status}`: number of exchanges
+    failing with `status`, e.g. `WRONG_VALUES` for the SIGN requests
+    rejected by the high watermark.
+"""
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS: List[float] = [
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+]
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+class ClientMetrics:
+    """Class collecting the request counts, latencies and errors of a client.
+
+    `labels` are added to every metric, e.g. to identify the baker.
+    """
+
+    labels: Dict[str, str]
+    requests: Dict[str, int]
+    # ins -> count of each bucket, the last one being +Inf
+    latency_buckets: Dict[str, List[int]]
+    latency_sums: Dict[str, float]
+    errors: Dict[Tuple[str, str], int]
+    _lock: threading.Lock
+
+    def __init__(self, labels: Optional[Dict[str, str]] = None):
+        self.labels = labels or {}
+        self.requests = {}
+        self.latency_buckets = {}
+        self.latency_sums = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def observe(self, ins: str, status: Optional[str], duration: float) -> None:
+        """Count an exchange of `ins`, `status` being None on success."""
+        with self._lock:
+            self.requests[ins] = self.requests.get(ins, 0) + 1
+            buckets = self.latency_buckets.setdefault(ins, [0] * (len(LATENCY_BUCKETS) + 1))
+            bucket = 0
+            while bucket < len(LATENCY_BUCKETS) and duration > LATENCY_BUCKETS[bucket]:
+                bucket += 1
+            buckets[bucket] += 1
+            self.latency_sums[ins] = self.latency_sums.get(ins, 0.0) + duration
+            if status is not None:
+                self.errors[(ins, status)] = self.errors.get((ins, status), 0) + 1
+
+    def to_prometheus(self) -> str:
+        """Return the metrics in the Prometheus text format."""
+        lines = []
+        with self._lock:
+            lines.append("# HELP tezos_client_requests_total Number of APDU exchanges.")
+            lines.append("# TYPE tezos_client_requests_total counter")
+            for ins, count in sorted(self.requests.items()):
+                labels = _format_labels({**self.labels, "ins": ins})
+                lines.append(f"tezos_client_requests_total{labels} {count}")
+
+            lines.append("# HELP tezos_client_request_duration_seconds "
+                         "Latency of the APDU exchanges.")
+            lines.append("# TYPE tezos_client_request_duration_seconds histogram")
+            for ins, buckets in sorted(self.latency_buckets.items()):
+                cumulated = 0
+                bounds = [repr(bound) for bound in LATENCY_BUCKETS] + ["+Inf"]
+                for bound, count in zip(bounds, buckets):
+                    cumulated += count
+                    labels = _format_labels({**self.labels, "ins": ins, "le": bound})
+                    lines.append(f"tezos_client_request_duration_seconds_bucket{labels} "
+                                 f"{cumulated}")
+                labels = _format_labels({**self.labels, "ins": ins})
+                lines.append(f"tezos_client_request_duration_seconds_sum{labels} "
+                             f"{self.latency_sums[ins]!r}")
+                lines.append(f"tezos_client_request_duration_seconds_count{labels} "
+                             f"{cumulated}")
+
+            lines.append("# HELP tezos_client_errors_total "
+                         "Number of APDU exchanges failing, by status.")
+            lines.append("# TYPE tezos_client_errors_total counter")
+            for (ins, status), count in sorted(self.errors.items()):
+                labels = _format_labels({**self.labels, "ins": ins, "status": status})
+                lines.append(f"tezos_client_errors_total{labels} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path) -> None:
+        """Write the metrics in `path`, atomically for the scrapers."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_text(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve the metrics on `http://host:port/metrics` in a background thread.
+
+        Stop the server with its `shutdown` method.
+        """
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            """Handler answering the scrapes."""
+
+            def do_GET(self) -> None:
+                """Answer the metrics."""
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.to_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                """Do not log the scrapes."""
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
@@ -43,11 +43,14 @@ from ragger.firmware.touch.positions import (
     FLEX_BUTTON_LOWER_LEFT,
     FLEX_BUTTON_ABOVE_LOWER_MIDDLE
 )
-from ragger.navigator import Navigator, NavInsID, NavIns
+from ragger.navigator import Navigator, NanoNavigator, TouchNavigator, NavInsID, NavIns
 
 from common import TESTS_ROOT_DIR, EMPTY_PATH
+from utils.backend import TezosSpeculosBackend
 from utils.client import TezosClient, Hwm
+from utils.latency import phase
 from utils.account import Account, Signature
+from utils.snapshot_store import SnapshotStore
 from utils.message import (
     Delegation,
     DEFAULT_BLOCK_HASH
@@ -58,7 +61,7 @@ RESPONSE = TypeVar('RESPONSE')
 def send_and_navigate(send: Callable[[], RESPONSE], navigate: Callable[[], None]) -> RESPONSE:
     """Sends a request and navigates before receiving a response."""
 
-    with ThreadPool(processes=2) as pool:
+    with phase("navigation"), ThreadPool(processes=2) as pool:
 
         send_res = pool.apply_async(send)
         navigate_res = pool.apply_async(navigate)
@@ -157,6 +160,33 @@ class UseCaseSettings(OriginalUseCaseSettings):
         self.multi_page_exit()
 
 
+class StoredSnapshotsNavigator(Navigator):
+    """Navigator checking the golden directories in the snapshot store."""
+
+    _snapshot_store: Optional[SnapshotStore]
+
+    def __init__(self, backend: BackendInterface, firmware: Firmware, golden_run: bool = False):
+        super().__init__(backend, firmware, golden_run=golden_run)
+        self._snapshot_store = None
+        if isinstance(backend, TezosSpeculosBackend):
+            self._snapshot_store = backend.snapshot_store
+
+    def _check_snaps_dir_path(self, path: Path, test_case_name: Path, is_golden: bool) -> Path:
+        dir_path = self._get_snaps_dir_path(path, test_case_name, is_golden)
+        store = self._snapshot_store
+        if not is_golden or store is None or not store.owns(dir_path):
+            return super()._check_snaps_dir_path(path, test_case_name, is_golden)
+        # Goldens are written through the store: no directory to create
+        if not self._golden_run and not store.has_dir(dir_path):
+            raise ValueError(f"Golden snapshots directory ({dir_path}) does not exist.")
+        return dir_path
+
+class TezosNanoNavigator(StoredSnapshotsNavigator, NanoNavigator):
+    """Nano navigator using the snapshot store."""
+
+class TezosTouchNavigator(StoredSnapshotsNavigator, TouchNavigator):
+    """Touch navigator using the snapshot store."""
+
 class TezosNavigator(metaclass=MetaScreen):
     """Class representing the tezos app navigator."""
 
@@ -209,19 +239,36 @@ class TezosNavigator(metaclass=MetaScreen):
         """Same as navigator.navigate_and_compare"""
         if snap_path is not None:
             snap_path = Path(self._test_name) / snap_path
-        if 'instructions' in kwargs:
-            self.navigator.navigate_and_compare(
-                path=self._root_dir,
-                test_case_name=snap_path,
-                **kwargs
-            )
+        with phase("navigation"), self._deferred_comparisons():
+            if 'instructions' in kwargs:
+                self.navigator.navigate_and_compare(
+                    path=self._root_dir,
+                    test_case_name=snap_path,
+                    **kwargs
+                )
+            else:
+                # Need 'navigate_instruction', 'validation_instructions' and 'text' in kwargs
+                self.navigator.navigate_until_text_and_compare(
+                    path=self._root_dir,
+                    test_case_name=snap_path,
+                    **kwargs
+                )
+
+    def _is_stored(self, golden_path: Path) -> bool:
+        """Return if the golden is resolved through the snapshot store."""
+        if not isinstance(self.backend, TezosSpeculosBackend):
+            return False
+        store = self.backend.snapshot_store
+        return store is not None and store.owns(golden_path)
+
+    @contextmanager
+    def _deferred_comparisons(self) -> Generator[None, None, None]:
+        """Defer the asserted screen comparisons when the backend allows it."""
+        if isinstance(self.backend, TezosSpeculosBackend):
+            with self.backend.deferred_comparisons():
+                yield
         else:
-            # Need 'navigate_instruction', 'validation_instructions' and 'text' in kwargs
-            self.navigator.navigate_until_text_and_compare(
-                path=self._root_dir,
-                test_case_name=snap_path,
-                **kwargs
-            )
+            yield
 
     @staticmethod
     def _can_navigate(**kwargs) -> bool:
@@ -244,17 +291,19 @@ class TezosNavigator(metaclass=MetaScreen):
 
         snap_path = snap_path / f"{screen}.png"
         golden_path = self._snapshots_dir / snap_path
-        if not golden_path.parent.is_dir() and self._golden_run:
+        if not golden_path.parent.is_dir() and self._golden_run \
+           and not self._is_stored(golden_path):
             golden_path.parent.mkdir(parents=True)
         tmp_path = self._tmp_snapshots_dir / snap_path
         if not tmp_path.parent.is_dir():
             tmp_path.parent.mkdir(parents=True)
 
-        assert self.backend.compare_screen_with_snapshot(
-            golden_path,
-            tmp_snap_path=tmp_path,
-            golden_run=self._golden_run
-        ), f"Screen does not match golden {snap_path}."
+        with self._deferred_comparisons():
+            assert self.backend.compare_screen_with_snapshot(
+                golden_path,
+                tmp_snap_path=tmp_path,
+                golden_run=self._golden_run
+            ), f"Screen does not match golden {snap_path}."
 
     def check_app_context(self,
                           account: Optional[Account],
@@ -543,6 +592,16 @@ class TezosNavigator(metaclass=MetaScreen):
             navigate=lambda: navigate(**kwargs)
         )
 
+    def advance_clock(self, seconds: float) -> None:
+        """Let `seconds` elapse on the device.
+
+        On speculos, the device clock is fast-forwarded, otherwise wait.
+        """
+        if isinstance(self.backend, TezosSpeculosBackend):
+            self.backend.advance_clock(seconds)
+        else:
+            time.sleep(seconds)
+
     def right(self):
         """Move to right screen"""
         self.backend.right_click()
@@ -560,28 +619,42 @@ class TezosNavigator(metaclass=MetaScreen):
 
     def disable_hwm(self) -> None:
         """Disables HWM settings by navigating on the screen starting from home_screen"""
+        self._toggle_hwm(enabled=True)
+
+    def enable_hwm(self) -> None:
+        """Enables HWM settings by navigating on the screen starting from home_screen"""
+        self._toggle_hwm(enabled=False)
+
+    def _toggle_hwm(self, enabled: bool) -> None:
+        """Toggles HWM settings, `enabled` beforehand, starting from home_screen"""
         if self.firmware.is_nano:
+            screens = [NanoFixedScreen.SETTINGS_HMW_ENABLED, NanoFixedScreen.SETTINGS_HMW_DISABLED]
+            if not enabled:
+                screens.reverse()
             self.assert_screen(NanoFixedScreen.HOME_WELCOME)
             self.left()
             self.assert_screen(NanoFixedScreen.HOME_QUIT)
             self.left()
             self.assert_screen(NanoFixedScreen.HOME_SETTINGS)
             self.press_both_buttons()
-            self.assert_screen(NanoFixedScreen.SETTINGS_HMW_ENABLED)
+            self.assert_screen(screens[0])
             self.press_both_buttons()
-            self.assert_screen(NanoFixedScreen.SETTINGS_HMW_DISABLED)
+            self.assert_screen(screens[1])
             self.right()
             self.assert_screen(NanoFixedScreen.SETTINGS_BACK)
             self.press_both_buttons()
             self.assert_screen(NanoFixedScreen.HOME_WELCOME)
         else:
+            screens = [TouchFixedScreen.SETTINGS_HMW_ENABLED, TouchFixedScreen.SETTINGS_HMW_DISABLED]
+            if not enabled:
+                screens.reverse()
             self.backend.wait_for_home_screen()
             self.home.settings()
             self.backend.wait_for_screen_change()
-            self.assert_screen(TouchFixedScreen.SETTINGS_HMW_ENABLED)
+            self.assert_screen(screens[0])
             self.settings.toggle_hwm_status()
             self.backend.wait_for_screen_change()
-            self.assert_screen(TouchFixedScreen.SETTINGS_HMW_DISABLED)
+            self.assert_screen(screens[1])
             self.settings.exit()
             self.backend.wait_for_screen_change()
             self.assert_screen(TouchFixedScreen.HOME)
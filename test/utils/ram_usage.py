@@ -0,0 +1,70 @@
+# Copyright 2024 Functori <contact@functori.com>
+# Copyright 2024 Trilitech <contact@trili.tech>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module reading the static RAM used by the app in its ELF.
+
+The static RAM is made of the writable sections loaded in RAM: the
+globals, in `.data` and `.bss`, and the stack. The stack usage of
+each instruction is counted by the app built with `DEBUG_STATS=1`, see
+`TezosClient.stack_stats`.
+"""
+
+from pathlib import Path
+from typing import Dict, Optional
+
+from utils.helper import LazyImport
+
+ELFFile = LazyImport("elftools.elf.elffile", "ELFFile")
+
+SHF_WRITE = 0x1
+SHF_ALLOC = 0x2
+
+class StaticRam:
+    """Class representing the static RAM of the app."""
+
+    # section name -> size in bytes, the stack excluded
+    sections: Dict[str, int]
+    # size of the `global` structure, None if not found
+    globals_size: Optional[int]
+
+    def __init__(self, sections: Dict[str, int], globals_size: Optional[int]):
+        self.sections = sections
+        self.globals_size = globals_size
+
+    @property
+    def total(self) -> int:
+        """Static RAM used, the stack excluded."""
+        return sum(self.sections.values())
+
+    def __repr__(self) -> str:
+        return f"(Total={self.total}, Globals={self.globals_size}, Sections={self.sections})"
+
+def read_static_ram(elf_path: Path) -> StaticRam:
+    """Read the static RAM used by the app of ELF `elf_path`."""
+    with open(elf_path, "rb") as elf_file:
+        elf = ELFFile(elf_file)
+        sections = {
+            section.name: section["sh_size"]
+            for section in elf.iter_sections()
+            if section["sh_flags"] & (SHF_WRITE | SHF_ALLOC) == SHF_WRITE | SHF_ALLOC
+            and "stack" not in section.name
+        }
+        globals_size = None
+        symbol_table = elf.get_section_by_name(".symtab")
+        if symbol_table is not None:
+            symbols = symbol_table.get_symbol_by_name("global")
+            if symbols:
+                globals_size = symbols[0]["st_size"]
+    return StaticRam(sections, globals_size)
@@ -0,0 +1,143 @@
+# Copyright 2024 Functori <contact@functori.com>
+# Copyright 2024 Trilitech <contact@trili.tech>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module regenerating the golden snapshots of all firmwares in parallel.
+
+Each firmware suite runs with `--golden_run` in its own pytest process,
+against its own speculos and a staged copy of the snapshot store. Once
+all runs are done, the goldens of the successful runs are merged into
+test/snapshots with a single manifest replacement, and the changed
+goldens are reported.
+
+Usage, from the test directory:
+  `python -m utils.regenerate_goldens [--device nanos ...] [-- <pytest args>]`
+"""
+
+import argparse
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+from utils.snapshot_store import SnapshotStore
+
+TESTS_ROOT_DIR = Path(__file__).parent.parent
+SNAPSHOTS_DIR = TESTS_ROOT_DIR / "snapshots"
+LOGS_DIR = TESTS_ROOT_DIR / "snapshots-tmp"
+
+FIRMWARES = ["nanos", "nanosp", "nanox", "stax", "flex"]
+
+# First speculos port tried, each run uses two consecutive ports
+FIRST_PORT = 15000
+
+def _is_port_free(port: int) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        return s.connect_ex(('localhost', port)) != 0
+
+def _allocate_ports(count: int) -> List[int]:
+    ports: List[int] = []
+    port = FIRST_PORT
+    while len(ports) < count:
+        if _is_port_free(port) and _is_port_free(port + 1):
+            ports.append(port)
+        port += 2
+    return ports
+
+def _run_golden(firmware: str,
+                store_root: Path,
+                port: int,
+                pytest_args: List[str]) -> int:
+    """Run the golden run of a firmware, return the pytest exit code."""
+    log_path = LOGS_DIR / f"golden_run_{firmware}.log"
+    command = [
+        sys.executable, "-m", "pytest", str(TESTS_ROOT_DIR),
+        "--device", firmware,
+        "--golden_run",
+        "--snapshots_root", str(store_root),
+        "--speculos_port", str(port),
+        *pytest_args
+    ]
+    with log_path.open("w") as log:
+        return subprocess.run(
+            command,
+            cwd=TESTS_ROOT_DIR,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            check=False
+        ).returncode
+
+def regenerate(firmwares: List[str], pytest_args: List[str], jobs: int) -> bool:
+    """Regenerate the goldens of `firmwares`, return if all runs succeeded."""
+    LOGS_DIR.mkdir(parents=True, exist_ok=True)
+    ports = _allocate_ports(len(firmwares))
+
+    with tempfile.TemporaryDirectory(prefix="goldens-") as staging_dir:
+        store_roots = {}
+        for firmware in firmwares:
+            store_roots[firmware] = Path(staging_dir) / firmware
+            shutil.copytree(SNAPSHOTS_DIR, store_roots[firmware])
+
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            runs = {
+                firmware: executor.submit(
+                    _run_golden, firmware, store_roots[firmware], port, pytest_args
+                )
+                for firmware, port in zip(firmwares, ports)
+            }
+            exit_codes = {firmware: run.result() for firmware, run in runs.items()}
+
+        store = SnapshotStore(SNAPSHOTS_DIR)
+        changes: Dict[str, Dict[str, str]] = {}
+        for firmware in firmwares:
+            if exit_codes[firmware] == 0:
+                staged = SnapshotStore(store_roots[firmware], SNAPSHOTS_DIR)
+                changes[firmware] = store.merge(staged, firmware)
+        # The manifest is replaced at once with the goldens of all runs
+        store.flush()
+        store.prune()
+
+    for firmware in firmwares:
+        log_path = LOGS_DIR / f"golden_run_{firmware}.log"
+        if exit_codes[firmware] != 0:
+            print(f"{firmware}: FAILED (exit code {exit_codes[firmware]}), "
+                  f"goldens not updated, see {log_path}")
+            continue
+        print(f"{firmware}: {len(changes[firmware])} snapshots changed")
+        for key, change in sorted(changes[firmware].items()):
+            print(f"  {change:7} {key}")
+
+    return all(exit_code == 0 for exit_code in exit_codes.values())
+
+def main() -> None:
+    """Command line interface of the golden regeneration."""
+    parser = argparse.ArgumentParser(
+        description="Regenerate the golden snapshots of several firmwares in parallel.")
+    parser.add_argument("--device", choices=FIRMWARES, action="append",
+                        help="Firmware to regenerate, can be repeated (default: all)")
+    parser.add_argument("--jobs", type=int, default=len(FIRMWARES),
+                        help="Maximum number of firmwares run at the same time")
+    parser.add_argument("pytest_args", nargs="*",
+                        help="Extra pytest arguments, after '--'")
+    args = parser.parse_args()
+
+    succeeded = regenerate(args.device or FIRMWARES, args.pytest_args, args.jobs)
+    sys.exit(0 if succeeded else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+# Copyright 2024 Functori <contact@functori.com>
+# Copyright 2024 Trilitech <contact@trili.tech>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module providing decoded snapshots and a session-wide snapshot cache."""
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from hashlib import blake2b
+from io import BytesIO
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
+
+from PIL import Image, ImageChops
+from ragger.utils import Crop
+
+if TYPE_CHECKING:
+    from utils.snapshot_store import SnapshotStore
+
+DIGEST_SIZE: int = 32
+
+def pixels_digest(size: Tuple[int, int], pixels: bytes) -> bytes:
+    """Content hash of a raw RGB pixel buffer."""
+    hasher = blake2b(digest_size=DIGEST_SIZE)
+    hasher.update(size[0].to_bytes(2, 'big'))
+    hasher.update(size[1].to_bytes(2, 'big'))
+    hasher.update(pixels)
+    return hasher.digest()
+
+class Snapshot:
+    """Class representing a decoded screen: a RGB pixel buffer and its hash."""
+
+    size: Tuple[int, int]
+    pixels: bytes
+    digest: bytes
+
+    def __init__(self, size: Tuple[int, int], pixels: bytes):
+        self.size   = size
+        self.pixels = pixels
+        self.digest = pixels_digest(size, pixels)
+
+    @classmethod
+    def from_image(cls, image: Image.Image) -> 'Snapshot':
+        """Decode a PIL image."""
+        rgb = image.convert("RGB")
+        return cls(rgb.size, rgb.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data: Union[bytes, BytesIO]) -> 'Snapshot':
+        """Decode an encoded image."""
+        if isinstance(data, bytes):
+            data = BytesIO(data)
+        with Image.open(data) as image:
+            return cls.from_image(image)
+
+    @classmethod
+    def from_file(cls, path: Path) -> 'Snapshot':
+        """Decode an image file."""
+        with Image.open(path) as image:
+            return cls.from_image(image)
+
+    def to_image(self) -> Image.Image:
+        """Re-build the PIL image."""
+        return Image.frombytes("RGB", self.size, self.pixels)
+
+    def crop(self, crop: Crop) -> 'Snapshot':
+        """Return the cropped snapshot, with the same semantic as speculos."""
+        width, height = self.size
+        box = (crop.left, crop.upper, width - crop.right, height - crop.lower)
+        return Snapshot.from_image(self.to_image().crop(box))
+
+    def diff_bbox(self, other: 'Snapshot') -> Optional[Tuple[int, int, int, int]]:
+        """Return the bounding box of the differing pixels, None if equal."""
+        if self.size != other.size:
+            return (0, 0, max(self.size[0], other.size[0]), max(self.size[1], other.size[1]))
+        return ImageChops.difference(self.to_image(), other.to_image()).getbbox()
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Snapshot):
+            return NotImplemented
+        return self.digest == other.digest
+
+    def __hash__(self) -> int:
+        return hash(self.digest)
+
+class SnapshotCache:
+    """Class representing a session-wide cache of decoded snapshots.
+
+    Each golden file is decoded once and indexed by the content hash
+    of its pixels, so identical screens share the same buffer and are
+    compared by hash. A pixel diff is only computed on mismatch.
+
+    Goldens held by the snapshot store are compared with the hash
+    recorded in its manifest, without being decoded.
+    """
+
+    store: Optional['SnapshotStore']
+
+    # path -> (file signature, snapshot)
+    _by_path: Dict[Path, Tuple[Tuple[int, int], Snapshot]]
+    _by_digest: Dict[bytes, Snapshot]
+    # hash of the encoded screenshot -> snapshot
+    _by_encoding: Dict[bytes, Snapshot]
+
+    def __init__(self, store: Optional['SnapshotStore'] = None):
+        self.store        = store
+        self._by_path     = {}
+        self._by_digest   = {}
+        self._by_encoding = {}
+
+    def _intern(self, snapshot: Snapshot) -> Snapshot:
+        return self._by_digest.setdefault(snapshot.digest, snapshot)
+
+    @staticmethod
+    def _signature(path: Path) -> Tuple[int, int]:
+        stat = path.stat()
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def decode(self, data: bytes) -> Snapshot:
+        """Decode an encoded screenshot, skipping already seen encodings."""
+        key = blake2b(data, digest_size=DIGEST_SIZE).digest()
+        snapshot = self._by_encoding.get(key)
+        if snapshot is None:
+            snapshot = self._intern(Snapshot.from_bytes(data))
+            self._by_encoding[key] = snapshot
+        return snapshot
+
+    def load(self, path: Path) -> Snapshot:
+        """Return the decoded golden snapshot of `path`."""
+        if self.store is not None and self.store.contains(path):
+            snapshot = self._by_digest.get(self.store.digest(path))
+            if snapshot is None:
+                snapshot = self._intern(self.store.load(path))
+            return snapshot
+        path = Path(path).resolve()
+        signature = self._signature(path)
+        cached = self._by_path.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        snapshot = self._intern(Snapshot.from_file(path))
+        self._by_path[path] = (signature, snapshot)
+        return snapshot
+
+    def record(self, path: Path, snapshot: Snapshot) -> None:
+        """Register `snapshot` as the content just written to `path`."""
+        path = Path(path).resolve()
+        self._by_path[path] = (self._signature(path), self._intern(snapshot))
+
+    def compare(self,
+                golden_path: Path,
+                snapshot: Snapshot,
+                crop: Optional[Crop] = None) -> Optional[Tuple[int, int, int, int]]:
+        """Compare a snapshot with a golden.
+
+        Return the bounding box of the differing pixels, None if equal.
+        """
+        if crop is None \
+           and self.store is not None \
+           and self.store.contains(golden_path) \
+           and self.store.digest(golden_path) == snapshot.digest:
+            return None
+        golden = self.load(golden_path)
+        if crop is not None:
+            golden = golden.crop(crop)
+            snapshot = snapshot.crop(crop)
+        if golden == snapshot:
+            return None
+        return golden.diff_bbox(snapshot)
+
+# Cache of the current worker process of a SnapshotPipeline
+_worker_cache: Optional[SnapshotCache] = None
+
+def _init_worker(store_root: Optional[Path], golden_root: Optional[Path]) -> None:
+    global _worker_cache
+    store = None
+    if store_root is not None:
+        # Imported here as the store depends on this module
+        from utils.snapshot_store import SnapshotStore
+        store = SnapshotStore(store_root, golden_root)
+    _worker_cache = SnapshotCache(store)
+
+def _compare_in_worker(golden_path: Path,
+                       data: bytes,
+                       tmp_snap_path: Optional[Path]) -> Optional[Tuple[int, int, int, int]]:
+    assert _worker_cache is not None
+    if tmp_snap_path is not None:
+        with Image.open(BytesIO(data)) as image:
+            image.save(tmp_snap_path)
+    return _worker_cache.compare(golden_path, _worker_cache.decode(data))
+
+class SnapshotPipeline:
+    """Class representing deferred comparisons run in a process pool.
+
+    Screenshots are captured by the test thread and compared with
+    their golden in the background. The failures are collected when
+    the comparisons are joined.
+    """
+
+    _executor: ProcessPoolExecutor
+    _pending: List[Tuple[Path, Future]]
+
+    def __init__(self,
+                 store_root: Optional[Path] = None,
+                 golden_root: Optional[Path] = None,
+                 processes: Optional[int] = None):
+        self._executor = ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=_init_worker,
+            initargs=(store_root, golden_root)
+        )
+        self._pending  = []
+
+    def submit(self,
+               golden_path: Path,
+               data: bytes,
+               tmp_snap_path: Optional[Path] = None) -> None:
+        """Enqueue the comparison of an encoded screenshot with a golden."""
+        future = self._executor.submit(_compare_in_worker, golden_path, data, tmp_snap_path)
+        self._pending.append((golden_path, future))
+
+    def join(self) -> List[str]:
+        """Wait for all pending comparisons and return the failures."""
+        failures = []
+        pending, self._pending = self._pending, []
+        for golden_path, future in pending:
+            try:
+                bbox = future.result()
+            except Exception as e:
+                failures.append(f"Could not compare with golden {golden_path}: {e!r}")
+                continue
+            if bbox is not None:
+                failures.append(f"Screen does not match golden {golden_path} in area {bbox}.")
+        return failures
+
+    def shutdown(self) -> None:
+        """Stop the worker processes, dropping pending comparisons."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
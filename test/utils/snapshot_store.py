@@ -0,0 +1,311 @@
+# Copyright 2024 Functori <contact@functori.com>
+# Copyright 2024 Trilitech <contact@trili.tech>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module providing a content-addressed golden snapshot store.
+
+The store replaces the tree of golden PNGs:
+  - `manifest.json` maps each golden path (`<firmware>/<test>/<step>.png`,
+    relative to the store root) to a blob,
+  - `blobs/` holds each distinct screen once, named after the hash of
+    its pixels. Screens with at most two colors, i.e. all nano
+    screens, are stored as deflated 1-bit packed bitmaps (`.bits`),
+    others are kept as PNG (`.png`).
+
+Usage, from the test directory:
+  - `python -m utils.snapshot_store pack`: move the golden PNGs into the store
+  - `python -m utils.snapshot_store unpack <dir>`: export the goldens as PNGs
+  - `python -m utils.snapshot_store prune`: remove the unreferenced blobs
+
+A store can be located away from the golden directory it serves, as
+done by `utils.regenerate_goldens` to stage the goldens of a run before
+merging them.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import struct
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+from PIL import Image, ImageChops
+
+from utils.snapshot import Snapshot
+
+BITS_MAGIC: bytes = b"TZ1B"
+# magic, width, height, background color, foreground color
+BITS_HEADER = struct.Struct(">4sHH3s3s")
+
+def pack_bits(snapshot: Snapshot) -> Optional[bytes]:
+    """Encode a snapshot of at most two colors as a 1-bit packed bitmap."""
+    image = snapshot.to_image()
+    colors = image.getcolors(maxcolors=2)
+    if colors is None:
+        return None
+    # Most frequent color first, then by value, for determinism
+    colors.sort(key=lambda color: (-color[0], color[1]))
+    background = colors[0][1]
+    foreground = colors[1][1] if len(colors) > 1 else background
+    mask = ImageChops.difference(image, Image.new("RGB", image.size, background)) \
+        .convert("L") \
+        .point(lambda value: 255 if value else 0, "1")
+    header = BITS_HEADER.pack(
+        BITS_MAGIC,
+        snapshot.size[0],
+        snapshot.size[1],
+        bytes(background),
+        bytes(foreground)
+    )
+    return header + zlib.compress(mask.tobytes(), 9)
+
+def unpack_bits(data: bytes) -> Snapshot:
+    """Decode a 1-bit packed bitmap."""
+    magic, width, height, background, foreground = BITS_HEADER.unpack_from(data)
+    assert magic == BITS_MAGIC, f"Invalid bitmap magic {magic.hex()}"
+    mask = Image.frombytes("1", (width, height), zlib.decompress(data[BITS_HEADER.size:]))
+    image = Image.new("RGB", (width, height), tuple(background))
+    image.paste(tuple(foreground), (0, 0, width, height), mask)
+    return Snapshot.from_image(image)
+
+def _write_atomically(path: Path, data: bytes) -> None:
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+class SnapshotStore:
+    """Class representing a content-addressed store of golden snapshots."""
+
+    MANIFEST: str = "manifest.json"
+    BLOBS: str = "blobs"
+
+    root: Path
+    golden_root: Path
+    # golden path relative to golden_root -> blob name
+    _entries: Dict[str, str]
+    _dirs: Set[str]
+    _dirty: bool
+
+    def __init__(self, root: Path, golden_root: Optional[Path] = None):
+        self.root = Path(root).resolve()
+        self.golden_root = self.root if golden_root is None else Path(golden_root).resolve()
+        manifest_path = self.root / self.MANIFEST
+        if manifest_path.is_file():
+            self._entries = json.loads(manifest_path.read_text())
+        else:
+            self._entries = {}
+        self._dirs = set()
+        self._dirty = False
+        for key in self._entries:
+            self._add_dirs(key)
+
+    @property
+    def blobs_dir(self) -> Path:
+        """Directory containing the blobs."""
+        return self.root / self.BLOBS
+
+    def _add_dirs(self, key: str) -> None:
+        parent = Path(key).parent
+        while parent != Path("."):
+            self._dirs.add(parent.as_posix())
+            parent = parent.parent
+
+    def _key(self, path: Path) -> Optional[str]:
+        try:
+            key = Path(path).resolve().relative_to(self.golden_root)
+        except ValueError:
+            return None
+        if not key.parts:
+            return None
+        if self.golden_root == self.root and key.parts[0] in (self.BLOBS, self.MANIFEST):
+            return None
+        return key.as_posix()
+
+    def owns(self, path: Path) -> bool:
+        """Return if `path` is a golden location handled by the store."""
+        return self._key(path) is not None
+
+    def contains(self, path: Path) -> bool:
+        """Return if the store has a golden for `path`."""
+        key = self._key(path)
+        return key is not None and key in self._entries
+
+    def has_dir(self, path: Path) -> bool:
+        """Return if the store has goldens under the directory `path`."""
+        key = self._key(path)
+        return key is not None and key in self._dirs
+
+    def keys(self) -> List[str]:
+        """Return the golden paths of the store, relative to its root."""
+        return sorted(self._entries)
+
+    def digest(self, path: Path) -> bytes:
+        """Return the pixel hash of the golden `path`."""
+        key = self._key(path)
+        assert key is not None, f"{path} is not in the snapshot store {self.root}"
+        return bytes.fromhex(Path(self._entries[key]).stem)
+
+    def _load_blob(self, blob: str) -> Snapshot:
+        blob_path = self.blobs_dir / blob
+        if blob_path.suffix == ".bits":
+            return unpack_bits(blob_path.read_bytes())
+        return Snapshot.from_file(blob_path)
+
+    def load(self, path: Path) -> Snapshot:
+        """Decode the golden `path`."""
+        key = self._key(path)
+        if key is None or key not in self._entries:
+            raise FileNotFoundError(f"No golden snapshot {path} in {self.root}")
+        return self._load_blob(self._entries[key])
+
+    def _write_blob(self, snapshot: Snapshot, png: Optional[bytes] = None) -> str:
+        bits = pack_bits(snapshot)
+        name = snapshot.digest.hex() + (".png" if bits is None else ".bits")
+        blob_path = self.blobs_dir / name
+        if not blob_path.exists():
+            self.blobs_dir.mkdir(parents=True, exist_ok=True)
+            if bits is not None:
+                _write_atomically(blob_path, bits)
+            elif png is not None:
+                _write_atomically(blob_path, png)
+            else:
+                snapshot.to_image().save(blob_path)
+        return name
+
+    def save_manifest(self) -> None:
+        """Write the manifest."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        data = json.dumps(self._entries, indent=1, sort_keys=True) + "\n"
+        _write_atomically(self.root / self.MANIFEST, data.encode())
+        self._dirty = False
+
+    def flush(self) -> None:
+        """Write the manifest if goldens were written since the last save."""
+        if self._dirty:
+            self.save_manifest()
+
+    def write(self, path: Path, snapshot: Snapshot, png: Optional[bytes] = None) -> bool:
+        """Set the golden `path`, return if it changed.
+
+        `png` is an optional PNG encoding of the snapshot, stored as-is
+        when the screen cannot be packed. The manifest is only written
+        on `flush`.
+        """
+        key = self._key(path)
+        assert key is not None, f"{path} is not in the snapshot store {self.root}"
+        blob = self._write_blob(snapshot, png)
+        if self._entries.get(key) == blob:
+            return False
+        self._entries[key] = blob
+        self._add_dirs(key)
+        self._dirty = True
+        return True
+
+    def merge(self, other: 'SnapshotStore', firmware: str) -> Dict[str, str]:
+        """Import the goldens of `firmware` from `other`.
+
+        Return the golden paths added or changed, with the change. The
+        manifest is only written on `flush`.
+        """
+        changes = {}
+        for key, blob in other._entries.items():
+            if Path(key).parts[0] != firmware or self._entries.get(key) == blob:
+                continue
+            blob_path = self.blobs_dir / blob
+            if not blob_path.exists():
+                self.blobs_dir.mkdir(parents=True, exist_ok=True)
+                tmp_path = blob_path.with_name(f".{blob}.tmp")
+                shutil.copyfile(other.blobs_dir / blob, tmp_path)
+                os.replace(tmp_path, blob_path)
+            changes[key] = "changed" if key in self._entries else "added"
+            self._entries[key] = blob
+            self._add_dirs(key)
+            self._dirty = True
+        return changes
+
+    def prune(self) -> List[str]:
+        """Remove the blobs no longer referenced, return their names."""
+        if not self.blobs_dir.is_dir():
+            return []
+        referenced = set(self._entries.values())
+        removed = []
+        for blob_path in sorted(self.blobs_dir.iterdir()):
+            if blob_path.name not in referenced:
+                blob_path.unlink()
+                removed.append(blob_path.name)
+        return removed
+
+    def pack(self) -> List[Path]:
+        """Move the golden PNGs found under the root into the store.
+
+        Each PNG is only removed once its blob is checked to decode to
+        the same pixels.
+        """
+        packed = []
+        for png_path in sorted(self.root.rglob("*.png")):
+            if not self.owns(png_path):
+                continue
+            png = png_path.read_bytes()
+            snapshot = Snapshot.from_file(png_path)
+            key = self._key(png_path)
+            assert key is not None
+            blob = self._write_blob(snapshot, png)
+            assert self._load_blob(blob).pixels == snapshot.pixels, \
+                f"Blob {blob} does not round-trip {png_path}"
+            self._entries[key] = blob
+            self._add_dirs(key)
+            packed.append(png_path)
+        self.save_manifest()
+        for png_path in packed:
+            png_path.unlink()
+        for directory in sorted(self.root.rglob("*"), reverse=True):
+            if directory.is_dir() and self.owns(directory) and not any(directory.iterdir()):
+                directory.rmdir()
+        return packed
+
+    def unpack(self, destination: Path) -> None:
+        """Export every golden as a PNG under `destination`."""
+        for key, blob in self._entries.items():
+            png_path = Path(destination) / key
+            png_path.parent.mkdir(parents=True, exist_ok=True)
+            self._load_blob(blob).to_image().save(png_path)
+
+def main() -> None:
+    """Command line interface of the snapshot store."""
+    parser = argparse.ArgumentParser(description="Manage the golden snapshot store.")
+    parser.add_argument("--root", type=Path,
+                        default=Path(__file__).parent.parent / "snapshots",
+                        help="Root of the snapshot store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("pack", help="Move the golden PNGs into the store")
+    unpack_parser = subparsers.add_parser("unpack", help="Export the goldens as PNGs")
+    unpack_parser.add_argument("destination", type=Path)
+    subparsers.add_parser("prune", help="Remove the unreferenced blobs")
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.root)
+    if args.command == "pack":
+        packed = store.pack()
+        print(f"Packed {len(packed)} snapshots")
+    elif args.command == "unpack":
+        store.unpack(args.destination)
+        print(f"Exported {len(store.keys())} snapshots to {args.destination}")
+    elif args.command == "prune":
+        removed = store.prune()
+        print(f"Removed {len(removed)} blobs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Copyright 2024 Functori <contact@functori.com>
+# Copyright 2024 Trilitech <contact@trili.tech>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module attributing the wall time of the tests to buckets.
+
+The phases collected by a `LatencyProfiler` during a test are mapped
+to the buckets:
+  - `startup`: speculos startup,
+  - `navigation`: approval navigation, including the requests sent
+    alongside,
+  - `snapshot`: screen comparisons,
+  - `apdu`: APDU exchanges,
+  - `forge`: forging of the messages,
+  - `other`: the remaining time.
+
+Each part of the wall time goes to the bucket of the innermost phase
+it was spent in, so the buckets of a test add up to its wall time.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, List
+
+from utils.client import Ins
+from utils.latency import LatencyProfiler, Stack
+
+BUCKETS: List[str] = ["startup", "navigation", "snapshot", "apdu", "forge", "other"]
+
+_PHASE_BUCKETS: Dict[str, str] = {
+    "startup": "startup",
+    "navigation": "navigation",
+    "snapshot": "snapshot",
+    "forge": "forge",
+    "transport": "apdu",
+    "device": "apdu",
+    **{ins.name: "apdu" for ins in Ins},
+}
+
+def bucket_of(stack: Stack) -> str:
+    """Return the bucket of the innermost phase of `stack` having one."""
+    for name in reversed(stack):
+        if name in _PHASE_BUCKETS:
+            return _PHASE_BUCKETS[name]
+    return "other"
+
+class TimeBreakdown:
+    """Class collecting the time breakdown of the tests."""
+
+    # test -> bucket -> seconds, with the wall time in `wall`
+    tests: Dict[str, Dict[str, float]]
+
+    def __init__(self):
+        self.tests = {}
+
+    def add(self, test: str, wall: float, profiler: LatencyProfiler) -> None:
+        """Attribute the `wall` time of `test` using its profiled phases."""
+        buckets = {bucket: 0.0 for bucket in BUCKETS}
+        for stack, self_time in profiler.self_times.items():
+            buckets[bucket_of(stack)] += self_time
+        # The time spent out of any phase is not profiled
+        buckets["other"] += max(0.0, wall - sum(buckets.values()))
+        self.tests[test] = {"wall": wall, **buckets}
+
+    def totals(self) -> Dict[str, float]:
+        """Return the time spent in each bucket over all tests."""
+        return {
+            key: sum(breakdown[key] for breakdown in self.tests.values())
+            for key in ["wall"] + BUCKETS
+        }
+
+    def report(self, limit: int = 20) -> List[str]:
+        """Return the lines of the breakdown of the `limit` slowest tests."""
+        header = f"{'wall':>8} " + " ".join(f"{bucket:>10}" for bucket in BUCKETS) + "  test"
+
+        def row(name: str, breakdown: Dict[str, float]) -> str:
+            return f"{breakdown['wall']:7.2f}s " + " ".join(
+                f"{breakdown[bucket]:9.2f}s" for bucket in BUCKETS
+            ) + f"  {name}"
+
+        slowest = sorted(self.tests.items(), key=lambda item: item[1]["wall"], reverse=True)
+        lines = [header]
+        lines += [row(test, breakdown) for test, breakdown in slowest[:limit]]
+        lines.append(row(f"total ({len(self.tests)} tests)", self.totals()))
+        return lines
+
+    def write(self, path: Path) -> None:
+        """Write the breakdown as JSON in `path`."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        content = {"totals": self.totals(), "tests": self.tests}
+        path.write_text(json.dumps(content, indent=2, sort_keys=True) + "\n")
@@ -0,0 +1,267 @@
+# Copyright 2024 Functori <contact@functori.com>
+# Copyright 2024 Trilitech <contact@trili.tech>
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Reference model of the parsing of the unsafe operations by the app.
+
+`parse_unsafe_op` accepts the same unsafe operations as the parser of
+`src/operations.c` and `expected_outcome` predicts how the app answers
+a SIGN request of them. `generate_corpus` builds the unsafe operations
+the app is checked against: valid groups and their mutations.
+"""
+
+import random
+from enum import Enum
+from typing import Iterator, List, Optional
+
+from utils.message import (
+    Delegation,
+    MagicByte,
+    OperationTag,
+    Reveal,
+    UnsafeOp,
+    DEFAULT_BLOCK_HASH,
+    forge_implicit_address,
+    forge_public_key,
+)
+
+BRANCH_SIZE = 32
+IMPLICIT_ADDRESS_SIZE = 21
+SIGNATURE_TYPES = (0, 1, 2)
+UINT64_MASK = (1 << 64) - 1
+
+class SigningKey:
+    """Class representing the key signing the unsafe operations, as forged."""
+
+    address: bytes
+    public_key: bytes
+
+    def __init__(self, address: str, public_key: str):
+        self.address = forge_implicit_address(address)
+        self.public_key = forge_public_key(public_key)
+
+class ParsedOperationGroup:
+    """Class representing the unsafe operation parsed by the app."""
+
+    total_fee: int
+    total_storage_limit: int
+    has_reveal: bool
+    # Tag of the only operation other than the reveals
+    tag: Optional[OperationTag]
+    # Forged delegate of the delegation, None when not present
+    delegate: Optional[bytes]
+
+    def __init__(self):
+        self.total_fee = 0
+        self.total_storage_limit = 0
+        self.has_reveal = False
+        self.tag = None
+        self.delegate = None
+
+class _Truncated(Exception):
+    """The unsafe operation ends in the middle of a field."""
+
+class _Reader:
+    """Reader failing on the truncated fields."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offset = 0
+
+    def has_finished(self) -> bool:
+        """Return if all the data has been read."""
+        return self.offset == len(self.data)
+
+    def read_bytes(self, size: int) -> bytes:
+        """Read `size` bytes."""
+        if self.offset + size > len(self.data):
+            raise _Truncated()
+        res = self.data[self.offset : self.offset + size]
+        self.offset += size
+        return res
+
+    def read_u8(self) -> int:
+        """Read a byte."""
+        return self.read_bytes(1)[0]
+
+    def read_z(self) -> Optional[int]:
+        """Read a Z number as the app does, None when it overflows 64 bits."""
+        value = 0
+        shift = 0
+        while True:
+            byte = self.read_u8()
+            if shift > 63 or (shift == 63 and byte != 1):
+                return None
+            value |= (byte & 0x7f) << shift
+            shift += 7
+            if byte & 0x80 == 0:
+                return value
+
+def parse_unsafe_op(raw: bytes, key: SigningKey) -> Optional[ParsedOperationGroup]:
+    """Parse the unsafe operation `raw`, with its magic byte, as the app does.
+
+    Return None when the app rejects it with a parse error.
+    """
+    reader = _Reader(raw)
+    parsed = ParsedOperationGroup()
+    try:
+        if reader.read_u8() != MagicByte.UNSAFE_OP:
+            return None
+        reader.read_bytes(BRANCH_SIZE)
+        while not reader.has_finished():
+            tag = reader.read_u8()
+            if tag == OperationTag.BABYLON_DELEGATION:
+                if parsed.tag is not None:
+                    return None
+                parsed.tag = OperationTag.BABYLON_DELEGATION
+            elif tag != OperationTag.BABYLON_REVEAL:
+                return None
+
+            source = reader.read_bytes(IMPLICIT_ADDRESS_SIZE)
+            if source[0] not in SIGNATURE_TYPES or source != key.address:
+                return None
+            fee = reader.read_z()
+            counter = reader.read_z()
+            gas_limit = reader.read_z()
+            storage_limit = reader.read_z()
+            if None in (fee, counter, gas_limit, storage_limit):
+                return None
+            parsed.total_fee = (parsed.total_fee + fee) & UINT64_MASK
+            parsed.total_storage_limit = \
+                (parsed.total_storage_limit + storage_limit) & UINT64_MASK
+
+            if tag == OperationTag.BABYLON_REVEAL:
+                public_key_type = reader.read_u8()
+                if public_key_type not in SIGNATURE_TYPES or \
+                   public_key_type != key.public_key[0]:
+                    return None
+                if reader.read_bytes(len(key.public_key) - 1) != key.public_key[1:]:
+                    return None
+                parsed.has_reveal = True
+            elif reader.read_u8() != 0:
+                delegate = reader.read_bytes(IMPLICIT_ADDRESS_SIZE)
+                if delegate[0] not in SIGNATURE_TYPES:
+                    return None
+                parsed.delegate = delegate
+            else:
+                parsed.delegate = None
+    except _Truncated:
+        return None
+    if parsed.tag is None and not parsed.has_reveal:
+        return None
+    return parsed
+
+class Outcome(Enum):
+    """Class representing how the app answers the SIGN request of an unsafe operation."""
+
+    SIGNED      = "signed"
+    PROMPTED    = "prompted"
+    PARSE_ERROR = "parse_error"
+    SECURITY    = "security"
+
+def expected_outcome(raw: bytes, key: SigningKey) -> Outcome:
+    """Predict the answer of the app to the SIGN request of `raw` by the authorized `key`."""
+    parsed = parse_unsafe_op(raw, key)
+    if parsed is None:
+        return Outcome.PARSE_ERROR
+    if parsed.tag is None:
+        return Outcome.SIGNED
+    # Only the self-delegations are prompted
+    return Outcome.PROMPTED if parsed.delegate == key.address else Outcome.SECURITY
+
+def _random_nat(rng: random.Random) -> int:
+    """Return a natural number of a random number of zarith bytes."""
+    return rng.getrandbits(rng.choice([0, 6, 7, 13, 14, 30, 63, 64]))
+
+def _valid_unsafe_ops(rng: random.Random,
+                      address: str,
+                      public_key: str,
+                      other_address: str) -> List[UnsafeOp]:
+    """Build random operation groups of reveals and at most one delegation."""
+
+    def manager_fields():
+        return {
+            "source": address,
+            "counter": _random_nat(rng),
+            "fee": _random_nat(rng),
+            "gas_limit": _random_nat(rng),
+            "storage_limit": _random_nat(rng),
+        }
+
+    operations: List[UnsafeOp] = []
+    for _ in range(16):
+        contents: List[UnsafeOp] = [
+            Reveal(public_key=public_key, **manager_fields())
+            for _ in range(rng.randint(0, 2))
+        ]
+        if rng.random() < 0.5:
+            delegate = rng.choice([address, other_address, None])
+            contents.insert(rng.randint(0, len(contents)),
+                            Delegation(delegate=delegate, **manager_fields()))
+        if not contents:
+            contents.append(Reveal(public_key=public_key, **manager_fields()))
+        operation = contents[0]
+        for content in contents[1:]:
+            operation = operation.merge(content)
+        operations.append(operation)
+    return operations
+
+def _mutate(rng: random.Random, raw: bytes) -> bytes:
+    """Apply a random mutation to `raw`, keeping its magic byte."""
+    if len(raw) < 2:
+        return raw
+    data = bytearray(raw)
+    position = rng.randint(1, len(data) - 1)
+    mutation = rng.choice(["truncate", "flip", "insert", "delete", "append", "overflow"])
+    if mutation == "truncate":
+        del data[position:]
+    elif mutation == "flip":
+        data[position] ^= 1 << rng.randint(0, 7)
+    elif mutation == "insert":
+        data.insert(position, rng.randint(0, 255))
+    elif mutation == "delete":
+        del data[position]
+    elif mutation == "append":
+        data += bytes(rng.randint(0, 255) for _ in range(rng.randint(1, 40)))
+    else:
+        data[position:position] = bytes([0xff] * 9 + [rng.randint(0, 3)])
+    return bytes(data)
+
+def generate_corpus(seed: int,
+                    address: str,
+                    public_key: str,
+                    other_address: str,
+                    size: int,
+                    max_size: int) -> Iterator[bytes]:
+    """Generate `size` unsafe operations, valid or not, of at most `max_size` bytes.
+
+    The operations are signed by `address` of public key `public_key`,
+    `other_address` being used as delegate of the foreign delegations.
+    """
+    rng = random.Random(seed)
+    valid = [
+        raw for raw in (
+            operation.forge(DEFAULT_BLOCK_HASH).raw()
+            for operation in _valid_unsafe_ops(rng, address, public_key, other_address)
+        )
+        if len(raw) <= max_size
+    ]
+    count = 0
+    while count < size:
+        raw = rng.choice(valid)
+        for _ in range(rng.choice([0, 1, 1, 2, 3])):
+            raw = _mutate(rng, raw)
+        if len(raw) <= max_size:
+            yield raw
+            count += 1